@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # premiere requete de chaque worker: attente du replica set (MONGODB_SETTINGS['startup_wait'])
+    'movies.middleware.ReplicaSetReadinessMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -81,6 +84,17 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cineexplorer',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -127,5 +141,86 @@ MONGODB_SETTINGS = {
     'host': 'localhost:27017,localhost:27018,localhost:27019',
     'replica_set': 'rs0',
     'database': 'imdb',
-    'timeout': 5000
+    'timeout': 5000,
+    # duree de cache du catalogue des collections (secondes)
+    'catalog_ttl': 60,
+    # verification des index (manage.py check --deploy, movies/checks.py): timeout en ms,
+    # et creation automatique des index manquants au lieu d'un simple avertissement
+    'check_timeout': 2000,
+    'auto_create_indexes': False,
+    # seuil de votes du classement top_rated (python manage.py build_leaderboard)
+    'leaderboard_min_votes': 1000,
+    # pool de films aleatoires de la page d'accueil: films pre-tires et duree de vie (secondes)
+    'random_pool_size': 120,
+    'random_pool_ttl': 300,
+    # preference de lecture par type d'operation (movies/services/read_routing.py)
+    # max_staleness: secondes de retard de replication tolerees (90 minimum);
+    # tag_sets: membres etiquetes par init_replica_set.py, {} = n'importe quel membre a defaut
+    'read_routing': {
+        'default': {'mode': 'primary'},
+        'write': {'mode': 'primary'},
+        'detail': {'mode': 'primaryPreferred'},
+        'listing': {'mode': 'secondaryPreferred', 'max_staleness': 120},
+        'search': {'mode': 'secondaryPreferred', 'max_staleness': 120},
+        'stats': {'mode': 'secondaryPreferred', 'max_staleness': 120},
+        'analytics': {'mode': 'nearest', 'tag_sets': [{'workload': 'analytics'}, {}]},
+        # catalogue des collections: lisible tant qu'un membre repond
+        'catalog': {'mode': 'primaryPreferred'},
+    },
+    # attente d'un membre lisible a la premiere requete de chaque worker (secondes, 0: sans attente)
+    'startup_wait': 10,
+    # disjoncteur (movies/services/circuit_breaker.py): echecs de selection consecutifs
+    # avant ouverture, et secondes avant une sonde si aucun evenement de topologie n'arrive
+    'circuit_breaker': {
+        'failure_threshold': 3,
+        'reset_timeout': 30,
+    }
 }
+
+# sqlite configuration (pool de connexions read-only)
+SQLITE_SETTINGS = {
+    'pool_size': 8,
+    'pool_timeout': 5,
+    'max_age': 600,
+    'mmap_size': 268435456,
+    'cache_size': -65536
+}
+
+# cache des resultats des services (lru par processus + cache django partage)
+SERVICE_CACHE = {
+    'enabled': True,
+    'max_entries': 512,
+    'default_ttl': 300,
+    # alias de CACHES utilise comme tier partage (None pour le desactiver)
+    'shared_cache': 'default',
+    # ttl par methode (secondes), prioritaire sur la valeur du decorateur
+    # ex: {'MongoService.get_top_movies': 600}
+    'ttl': {}
+}
+
+# appels de services en parallele dans les vues (movies/services/orchestrator.py)
+SERVICE_ORCHESTRATION = {
+    # threads du pool partage par toutes les requetes du processus (run_parallel, vues async
+    # sur sqlite); l'attente dans sa file compte dans le timeout de l'appel
+    'max_workers': int(os.environ.get('SERVICE_POOL_SIZE', '16')),
+    # timeout par defaut d'un appel (secondes) avant rendu partiel de la page
+    'timeout': 3.0
+}
+
+# lectures routees entre mongodb et sqlite (movies/services/repository.py)
+MOVIE_REPOSITORY = {
+    # base essayee en premier, tant que sa latence moyenne reste comparable a l'autre
+    'preferred': 'mongodb',
+    # poids d'une nouvelle mesure dans la moyenne mobile des latences
+    'alpha': 0.2,
+    # facteur de latence a partir duquel l'autre base est preferee
+    'margin': 1.2,
+    # part des lectures envoyees a l'autre base pour garder sa latence a jour
+    'explore': 0.05,
+    # delai d'une lecture mongodb (secondes) avant bascule sur sqlite
+    'timeout': 1.0
+}
+
+# vues async (movies/views_async.py) a la place des vues sync, pour un deploiement asgi
+# ex: MOVIES_ASYNC_VIEWS=1 uvicorn config.asgi:application --workers 4
+MOVIES_ASYNC_VIEWS = os.environ.get('MOVIES_ASYNC_VIEWS', '0') == '1'
@@ -0,0 +1,13 @@
+"""
+configuration de l'application movies
+"""
+
+from django.apps import AppConfig
+
+
+class MoviesConfig(AppConfig):
+    name = 'movies'
+
+    def ready(self):
+        # enregistre les verifications de demarrage (index mongodb)
+        from . import checks  # noqa: F401
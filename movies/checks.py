@@ -0,0 +1,60 @@
+"""
+verifications django au demarrage (runserver, check)
+la verification des index interroge le replica set: enregistree en deploy, elle ne tourne
+qu'avec manage.py check --deploy (pas a chaque migrate, makemigrations...)
+"""
+
+from django.conf import settings
+from django.core import checks
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from .services.mongo_indexes import ensure_indexes, missing_indexes
+from .services.read_routing import ReadRouter
+
+
+@checks.register('mongodb', deploy=True)
+def check_mongo_indexes(app_configs, **kwargs):
+    """signale (ou cree si auto_create_indexes) les index mongodb manquants"""
+    mongo_settings = settings.MONGODB_SETTINGS
+    # client dedie avec un timeout court: un replica set arrete ne bloque pas manage.py
+    client = MongoClient(
+        mongo_settings['host'],
+        replicaSet=mongo_settings['replica_set'],
+        serverSelectionTimeoutMS=mongo_settings.get('check_timeout', 2000)
+    )
+    try:
+        db = client[mongo_settings['database']]
+        if mongo_settings.get('auto_create_indexes', False):
+            ensure_indexes(db)
+        missing = missing_indexes(db)
+    except PyMongoError as e:
+        return [checks.Warning(
+            f"mongodb injoignable ({type(e).__name__}), index non verifies",
+            id='movies.W001',
+        )]
+    finally:
+        client.close()
+
+    return [
+        checks.Warning(
+            f"index manquants sur {collection}: {', '.join(names)}",
+            hint="python manage.py mongo_indexes",
+            id='movies.W002',
+        )
+        for collection, names in missing.items()
+    ]
+
+
+@checks.register('mongodb')
+def check_read_routing(app_configs, **kwargs):
+    """valide MONGODB_SETTINGS['read_routing'] (mode connu, options compatibles)"""
+    try:
+        ReadRouter(settings.MONGODB_SETTINGS.get('read_routing'))
+    except (ValueError, TypeError, PyMongoError) as e:
+        return [checks.Error(
+            f"read_routing invalide: {e}",
+            hint="modes: primary, primaryPreferred, secondary, secondaryPreferred, nearest",
+            id='movies.E001',
+        )]
+    return []
@@ -0,0 +1,31 @@
+"""
+commande de construction du classement des films les mieux notes
+usage: python manage.py build_leaderboard [--min-votes N] [--size N]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from movies.services.leaderboard import DEFAULT_SIZE, build_leaderboard, configured_min_votes
+from movies.services.mongo_service import MongoService
+
+
+class Command(BaseCommand):
+    help = "reconstruit la collection top_rated (films les mieux notes au-dessus d'un seuil de votes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-votes', type=int,
+                            default=configured_min_votes(),
+                            help='nombre minimum de votes pour etre classe')
+        parser.add_argument('--size', type=int, default=DEFAULT_SIZE,
+                            help='nombre de films conserves dans le classement')
+
+    def handle(self, *args, **options):
+        try:
+            count = build_leaderboard(MongoService.get_database(), options['min_votes'], options['size'])
+        except PyMongoError as e:
+            raise CommandError(f"construction du classement impossible: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} films classes (au moins {options['min_votes']} votes)"
+        ))
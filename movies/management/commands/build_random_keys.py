@@ -0,0 +1,32 @@
+"""
+commande de pose des cles de tirage aleatoire de movies_complete
+usage: python manage.py build_random_keys [--redraw]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from movies.services.mongo_indexes import MONGO_INDEXES, ensure_collection_indexes
+from movies.services.mongo_service import MongoService
+from movies.services.sampling import assign_random_keys
+
+
+class Command(BaseCommand):
+    help = "pose le champ rand (et ses index) sur movies_complete, pour les tirages sans $sample"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--redraw', action='store_true',
+                            help="retire une cle pour tous les films, pas seulement ceux qui n'en ont pas")
+
+    def handle(self, *args, **options):
+        collection = MongoService.get_database()['movies_complete']
+        try:
+            modified = assign_random_keys(collection, redraw=options['redraw'])
+            created = ensure_collection_indexes(collection, MONGO_INDEXES['movies_complete'])
+        except PyMongoError as e:
+            raise CommandError(f"pose des cles aleatoires impossible: {e}")
+
+        MongoService.get_sample_pool().clear()
+        for name in created:
+            self.stdout.write(f"  index cree: {name}")
+        self.stdout.write(self.style.SUCCESS(f"{modified} films avec une nouvelle cle rand"))
@@ -0,0 +1,57 @@
+"""
+commande de construction de l'index de recherche plein texte
+usage: python manage.py build_search_index [--rebuild] [--check]
+a relancer apres un VACUUM de la base (rowids renumerotes: index reconstruit)
+"""
+
+import sqlite3
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.services.search_index import build_search_index, misaligned_tables
+from movies.services.sqlite_service import SQLiteService
+
+
+class Command(BaseCommand):
+    help = "construit l'index fts5 de recherche des films et personnes (tenu a jour ensuite par des triggers)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help="reconstruit entierement l'index meme s'il est a jour")
+        parser.add_argument('--check', action='store_true',
+                            help="verifie seulement que l'index suit les rowids des tables (apres un VACUUM)")
+        parser.add_argument('--db', default=str(SQLiteService.DB_PATH),
+                            help='chemin de la base sqlite')
+
+    def handle(self, *args, **options):
+        if not Path(options['db']).exists():
+            raise CommandError(f"base sqlite introuvable: {options['db']}")
+
+        try:
+            conn = sqlite3.connect(options['db'])
+        except sqlite3.Error as e:
+            raise CommandError(f"connexion sqlite impossible: {e}")
+
+        try:
+            if options['check']:
+                misaligned = misaligned_tables(conn)
+            else:
+                results = build_search_index(conn, rebuild=options['rebuild'])
+        except sqlite3.Error as e:
+            raise CommandError(f"construction de l'index impossible: {e}")
+        finally:
+            conn.close()
+
+        if options['check']:
+            if misaligned:
+                raise CommandError(
+                    f"rowids renumerotes (VACUUM?) pour {', '.join(sorted(misaligned))}: "
+                    f"relancer python manage.py build_search_index"
+                )
+            self.stdout.write(self.style.SUCCESS("index de recherche aligne sur les tables"))
+            return
+
+        for name, (indexed, elapsed) in results.items():
+            self.stdout.write(f"  {name}: {indexed} lignes indexees en {elapsed:.2f}s")
+        self.stdout.write(self.style.SUCCESS("index de recherche a jour"))
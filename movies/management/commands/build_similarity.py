@@ -0,0 +1,73 @@
+"""
+commande de construction de l'index de similarite des films (collection similar_movies)
+usage: python manage.py build_similarity [--top-k N] [--postings-cap N] [--json]
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from movies.services.cache import bump_dataset_version
+from movies.services.mongo_service import MongoService
+from movies.services.similarity import (
+    DEFAULT_BATCH_SIZE, DEFAULT_POSTINGS_CAP, DEFAULT_TOP_K, build_similarity
+)
+from movies.services.sqlite_service import SQLiteService
+
+
+class Command(BaseCommand):
+    help = "precalcule les films similaires de chaque film et mesure le temps et la memoire de construction"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--db', default=str(SQLiteService.DB_PATH),
+                            help='chemin de la base sqlite')
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K,
+                            help='nombre de voisins stockes par film')
+        parser.add_argument('--postings-cap', type=int, default=DEFAULT_POSTINGS_CAP,
+                            help='films candidats retenus au plus par personne ou genres+decennie')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help="documents par lot d'insertion")
+        parser.add_argument('--json', action='store_true',
+                            help='affiche le rapport de construction en json')
+
+    def handle(self, *args, **options):
+        if not Path(options['db']).exists():
+            raise CommandError(f"base sqlite introuvable: {options['db']}")
+
+        conn = sqlite3.connect(options['db'])
+        progress = None if options['json'] else (
+            lambda done: self.stdout.write(f"  {done} films traites", ending='\r')
+        )
+        try:
+            report = build_similarity(
+                MongoService.get_database(), conn,
+                top_k=options['top_k'],
+                postings_cap=options['postings_cap'],
+                batch_size=options['batch_size'],
+                progress=progress,
+            )
+        except (sqlite3.Error, PyMongoError) as e:
+            raise CommandError(f"construction de l'index de similarite impossible: {e}")
+        finally:
+            conn.close()
+        # nouvelle version du jeu de donnees: catalogue et resultats en cache de tous les
+        # processus (pas seulement celui-ci) relus
+        bump_dataset_version()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write("")
+        self.stdout.write(f"  films: {report['movies']}  caracteristiques: {report['features']}")
+        self.stdout.write(f"  chargement sqlite: {report['load_seconds']:.2f}s")
+        self.stdout.write(f"  calcul des voisins: {report['compute_seconds']:.2f}s")
+        self.stdout.write(f"  ecriture mongodb: {report['write_seconds']:.2f}s")
+        if report['peak_rss_mb'] is not None:
+            self.stdout.write(f"  pic memoire: {report['peak_rss_mb']:.0f} mo")
+        self.stdout.write(self.style.SUCCESS(
+            f"similar_movies construit ({report['top_k']} voisins par film)"
+        ))
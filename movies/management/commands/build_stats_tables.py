@@ -0,0 +1,60 @@
+"""
+commande de construction des tables de synthese de la page statistiques
+usage: python manage.py build_stats_tables [--check]
+"""
+
+import sqlite3
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.services.sqlite_service import SQLiteService
+from movies.services.stats_tables import build_stats_tables, check_stats_tables
+
+
+class Command(BaseCommand):
+    help = "recalcule les tables de synthese (genres, decennies, realisateurs, notes) ou les compare aux aggregations en direct"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="verifie les tables existantes contre les aggregations en direct sans rien reconstruire")
+        parser.add_argument('--db', default=str(SQLiteService.DB_PATH),
+                            help='chemin de la base sqlite')
+
+    def handle(self, *args, **options):
+        if not Path(options['db']).exists():
+            raise CommandError(f"base sqlite introuvable: {options['db']}")
+
+        conn = sqlite3.connect(options['db'])
+        try:
+            if options['check']:
+                self.check(conn)
+                return
+            results = build_stats_tables(conn)
+        except sqlite3.Error as e:
+            raise CommandError(f"construction des tables de synthese impossible: {e}")
+        finally:
+            conn.close()
+
+        for name, (rows, elapsed) in results.items():
+            self.stdout.write(f"  {name}: {rows} lignes en {elapsed:.2f}s")
+        self.stdout.write(self.style.SUCCESS("tables de synthese a jour"))
+
+    def check(self, conn):
+        """affiche les ecarts entre tables stockees et aggregations en direct"""
+        stale = 0
+        for name, differences in check_stats_tables(conn).items():
+            if differences is None:
+                stale += 1
+                self.stdout.write(self.style.WARNING(f"  {name}: absente"))
+            elif differences:
+                stale += 1
+                self.stdout.write(self.style.WARNING(f"  {name}: {len(differences)} lignes divergentes"))
+                for stored, live in differences[:5]:
+                    self.stdout.write(f"    stockee {stored}  en direct {live}")
+            else:
+                self.stdout.write(f"  {name}: ok")
+
+        if stale:
+            raise CommandError(f"{stale} tables de synthese a reconstruire (python manage.py build_stats_tables)")
+        self.stdout.write(self.style.SUCCESS("tables de synthese coherentes"))
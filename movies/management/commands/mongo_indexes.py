@@ -0,0 +1,56 @@
+"""
+commande de creation et de controle des index mongodb
+usage: python manage.py mongo_indexes [--dry-run] [--report]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from movies.services.mongo_indexes import ensure_indexes, index_report, missing_indexes
+from movies.services.mongo_service import MongoService
+
+
+class Command(BaseCommand):
+    help = ("cree les index mongodb declares dans movies/services/mongo_indexes.py "
+            "et signale les index manquants ou inutilises ($indexStats)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='liste les index manquants sans les creer')
+        parser.add_argument('--report', action='store_true',
+                            help="affiche l'utilisation de chaque index ($indexStats)")
+
+    def handle(self, *args, **options):
+        try:
+            db = MongoService.get_database()
+
+            if options['dry_run']:
+                missing = missing_indexes(db)
+                for collection, names in missing.items():
+                    for name in names:
+                        self.stdout.write(f"  index manquant: {collection}.{name}")
+                if not missing:
+                    self.stdout.write(self.style.SUCCESS("aucun index manquant"))
+                return
+
+            created = ensure_indexes(db)
+            for collection, names in created.items():
+                for name in names:
+                    self.stdout.write(f"  index cree: {collection}.{name}")
+
+            report = index_report(db) if options['report'] else None
+        except PyMongoError as e:
+            raise CommandError(f"gestion des index mongodb impossible: {e}")
+
+        if report:
+            self.stdout.write("\nutilisation depuis le demarrage du membre interroge:")
+            for collection, state in report.items():
+                for name, ops in sorted(state['usage'].items()):
+                    self.stdout.write(f"  {collection}.{name}: {ops} utilisations")
+                for name in state['unused']:
+                    self.stdout.write(self.style.WARNING(f"  inutilise: {collection}.{name}"))
+                for name in state['undeclared']:
+                    self.stdout.write(self.style.WARNING(f"  non declare: {collection}.{name}"))
+
+        total = sum(len(names) for names in created.values())
+        self.stdout.write(self.style.SUCCESS(f"{total} index crees, index mongodb a jour"))
@@ -0,0 +1,141 @@
+"""
+commande de creation et de verification des index sqlite de la liste des films
+usage: python manage.py sqlite_indexes [--dry-run] [--no-timing]
+"""
+
+import sqlite3
+import statistics
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.services.sqlite_indexes import (
+    create_listing_indexes, explain, listing_combinations, missing_indexes, plan_problems, time_query,
+)
+from movies.services.sqlite_service import SQLiteService
+
+
+# positions de curseur fictives: le plan ne depend pas de la page reelle
+SAMPLE_CURSORS = {
+    'year': 2000,
+    'rating': 7.5,
+    'title': 'M',
+}
+SAMPLE_MID = 'tt0500000'
+
+# offset de l'ancienne pagination page= (page 50)
+LEGACY_OFFSET = 980
+
+
+class Command(BaseCommand):
+    help = ("analyse le plan de chaque combinaison filtre/tri de la liste des films, "
+            "cree les index composites manquants et compare les plans avant/apres")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--db', default=str(SQLiteService.DB_PATH),
+                            help='chemin de la base sqlite')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='affiche les plans et les index manquants sans rien creer')
+        parser.add_argument('--no-timing', action='store_true',
+                            help="n'execute pas les requetes (plans uniquement)")
+        parser.add_argument('--genre', default=None,
+                            help='genre utilise pour le filtre (par defaut le plus frequent)')
+
+    def handle(self, *args, **options):
+        if not Path(options['db']).exists():
+            raise CommandError(f"base sqlite introuvable: {options['db']}")
+
+        conn = sqlite3.connect(options['db'])
+        try:
+            genre = options['genre'] or self.most_common_genre(conn)
+            timing = not options['no_timing']
+
+            before = self.analyse(conn, genre, timing)
+            missing = missing_indexes(conn)
+            for name in missing:
+                self.stdout.write(f"  index manquant: {name}")
+
+            if options['dry_run']:
+                self.report("plans actuels", before)
+                return
+
+            created = create_listing_indexes(conn)
+            for name in created:
+                self.stdout.write(f"  index cree: {name}")
+
+            after = self.analyse(conn, genre, timing)
+        except sqlite3.Error as e:
+            raise CommandError(f"analyse des index impossible: {e}")
+        finally:
+            conn.close()
+
+        self.report("avant", before)
+        self.report("apres", after)
+
+        # detail des combinaisons qui changent de plan ou restent couteuses
+        for name, result in after.items():
+            old = before[name]
+            still_costly = result['scans'] and not result['legacy']
+            if still_costly or (options['verbosity'] >= 2 and result['plan'] != old['plan']):
+                self.stdout.write(f"\n{name}")
+                self.stdout.write(f"  avant ({self.format_ms(old)}): " + ' / '.join(old['plan']))
+                self.stdout.write(f"  apres ({self.format_ms(result)}): " + ' / '.join(result['plan']))
+
+        remaining = sum(1 for r in after.values() if r['scans'] and not r['legacy'])
+        if remaining:
+            self.stdout.write(self.style.WARNING(f"\n{remaining} combinaisons font encore un SCAN"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"\n{len(created)} index crees, aucune combinaison ne fait de SCAN"))
+
+    def most_common_genre(self, conn):
+        """genre le plus frequent (le cas le moins selectif pour le planificateur)"""
+        row = conn.execute("SELECT genre FROM genres GROUP BY genre ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+        return row[0] if row else 'Drama'
+
+    def analyse(self, conn, genre, timing):
+        """plan, etapes couteuses et duree de chaque combinaison"""
+        results = {}
+        for name, filters, sort_by, sort_order, mode in listing_combinations(genre):
+            offset = LEGACY_OFFSET if mode == 'offset' else 0
+            if mode in ('first', 'offset'):
+                cursor = None
+            elif mode == 'cursor':
+                cursor = (SAMPLE_CURSORS[sort_by], SAMPLE_MID, 'next')
+            else:
+                cursor = (None, SAMPLE_MID, 'next')
+
+            segments, _ = SQLiteService.build_filtered_query(filters, sort_by, sort_order, 21, offset, cursor)
+
+            plan = []
+            elapsed = 0.0
+            for sql, params in segments:
+                plan.extend(explain(conn, sql, params))
+                if timing:
+                    elapsed += time_query(conn, sql, params)
+
+            scans, sorts = plan_problems(plan)
+            results[name] = {
+                'legacy': mode == 'offset',
+                'plan': plan,
+                'scans': scans,
+                'sorts': sorts,
+                'ms': elapsed if timing else None,
+            }
+        return results
+
+    def report(self, title, results):
+        """resume d'une passe d'analyse (pagination par curseur puis ancienne pagination page=)"""
+        self.stdout.write(f"\n{title}:")
+        for label, legacy in (('curseur', False), ('offset page=', True)):
+            subset = [r for r in results.values() if r['legacy'] == legacy]
+            scans = sum(1 for r in subset if r['scans'])
+            sorts = sum(1 for r in subset if r['sorts'])
+            line = f"  {label}: {len(subset)} combinaisons, {scans} avec SCAN, {sorts} avec tri temporaire"
+            durations = [r['ms'] for r in subset if r['ms'] is not None]
+            if durations:
+                line += (f", median {statistics.median(durations):.2f} ms"
+                         f", max {max(durations):.2f} ms, total {sum(durations):.0f} ms")
+            self.stdout.write(line)
+
+    def format_ms(self, result):
+        return f"{result['ms']:.2f} ms" if result['ms'] is not None else 'non mesure'
@@ -0,0 +1,60 @@
+"""
+middleware de l'application movies
+"""
+
+import asyncio
+import os
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .services.mongo_service import MongoService
+
+
+# processus dont l'attente du replica set est faite (pid: un worker cree par fork refait l'attente)
+_ready_pid = None
+_ready_lock = threading.Lock()
+
+
+def wait_for_replica_set():
+    """
+    attend le replica set une fois par processus, a la premiere requete
+
+    au plus MONGODB_SETTINGS['startup_wait'] secondes; l'attente a lieu dans le worker et
+    non a l'import de config.wsgi / config.asgi, pour ne pas creer le MongoClient dans le
+    processus maitre avant le fork (gunicorn --preload)
+    """
+    global _ready_pid
+    if _ready_pid == os.getpid():
+        return
+    with _ready_lock:
+        if _ready_pid == os.getpid():
+            return
+        if settings.MONGODB_SETTINGS.get('startup_wait', 10):
+            MongoService.wait_until_ready()
+        _ready_pid = os.getpid()
+
+
+class ReplicaSetReadinessMiddleware:
+    """retient la premiere requete de chaque worker tant que le replica set n'est pas lisible"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        wait_for_replica_set()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # attente bloquante hors de la boucle d'evenements
+        if _ready_pid != os.getpid():
+            await asyncio.to_thread(wait_for_replica_set)
+        return await self.get_response(request)
@@ -0,0 +1,262 @@
+"""
+service d'acces aux donnees mongodb en asynchrone (pymongo AsyncMongoClient)
+memes requetes que MongoService: les pipelines et la mise en forme sont partages
+"""
+
+import asyncio
+import weakref
+
+from pymongo import AsyncMongoClient, ReadPreference
+from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from django.conf import settings
+
+from .cache import cached, get_dataset_version
+from .circuit_breaker import served_degraded, swallowed
+from .leaderboard import LEADERBOARD, leaderboard_cursor
+from .mongo_service import (
+    STAT_COLLECTIONS, UNAVAILABLE, MongoService, _CatalogInvalidator, degraded_movie,
+    degraded_random_movies, degraded_ratings_distribution, degraded_similar_movies,
+    degraded_statistics, degraded_top_movies, mongo_guarded
+)
+from .sampling import sample_cursor, sample_match, sample_queries
+from .similarity import SIMILAR_MOVIES, similar_neighbours, similar_query
+
+
+class AsyncMongoService:
+    """service de requetes mongodb non bloquant, pour les vues async sous asgi"""
+
+    # un client async est lie a sa boucle d'evenements: un client par boucle
+    _clients = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def get_client(cls):
+        """obtient ou cree le client de la boucle courante"""
+        loop = asyncio.get_running_loop()
+        client = cls._clients.get(loop)
+        if client is None:
+            mongo_settings = settings.MONGODB_SETTINGS
+            client = AsyncMongoClient(
+                mongo_settings['host'],
+                replicaSet=mongo_settings['replica_set'],
+                serverSelectionTimeoutMS=mongo_settings['timeout'],
+                event_listeners=[_CatalogInvalidator()]
+            )
+            cls._clients[loop] = client
+        return client
+
+    @classmethod
+    def get_database(cls, operation=None):
+        """obtient la base de donnees imdb (routee comme MongoService.get_database)"""
+        db = cls.get_client()[settings.MONGODB_SETTINGS['database']]
+        if operation is None:
+            return db
+        return MongoService.get_router().route(db, operation)
+
+    @classmethod
+    async def get_collection_names(cls):
+        """noms des collections (catalogue partage avec MongoService)"""
+        catalog = MongoService._fresh_catalog()
+        if catalog is not None:
+            return catalog
+        names = await cls.get_database('catalog').list_collection_names()
+        return MongoService._store_catalog(names)
+
+    @classmethod
+    async def has_collection(cls, name):
+        """indique si une collection existe (via le catalogue en cache)"""
+        return name in await cls.get_collection_names()
+
+    @classmethod
+    async def test_connection(cls):
+        """teste la connexion au replica set"""
+        try:
+            await cls.get_client().admin.command('ping')
+            return True, "connexion reussie"
+        except ConnectionFailure:
+            return False, "echec de connexion au replica set"
+        except ServerSelectionTimeoutError:
+            return False, "timeout de connexion"
+        except Exception as e:
+            return False, f"erreur: {str(e)}"
+
+    @classmethod
+    async def _replica_status(cls):
+        """statut du replica set (None si indisponible)"""
+        try:
+            rs_status = await cls.get_client().admin.command(
+                'replSetGetStatus', read_preference=ReadPreference.PRIMARY_PREFERRED
+            )
+            return MongoService._format_replica_status(rs_status)
+        except Exception:
+            return None
+
+    @classmethod
+    @mongo_guarded(default={'error': 'replica set indisponible'}, fallback=degraded_statistics)
+    async def get_statistics(cls, exact=False):
+        """obtient des statistiques sur les donnees (comptages approches sauf exact=True)"""
+        try:
+            db = cls.get_database('stats')
+            existing = await cls.get_collection_names()
+            names = [name for name in STAT_COLLECTIONS if name in existing]
+
+            # les comptages et le statut du replica set partent ensemble
+            *counts, replica_status = await asyncio.gather(
+                *(
+                    db[name].count_documents({}) if exact else db[name].estimated_document_count()
+                    for name in names
+                ),
+                cls._replica_status()
+            )
+
+            collections = dict(zip(names, counts))
+            return {
+                'collections': collections,
+                'total_documents': collections.get('movies', 0),
+                'replica_status': replica_status,
+                'exact': exact
+            }
+
+        except UNAVAILABLE:
+            raise
+        except Exception as e:
+            return swallowed(e, {'error': str(e)})
+
+    @classmethod
+    async def _aggregate(cls, collection, pipeline, operation=None):
+        """execute une aggregation et renvoie tous les documents"""
+        cursor = await cls.get_database(operation)[collection].aggregate(pipeline)
+        return await cursor.to_list(None)
+
+    @classmethod
+    @cached(ttl=3600)
+    @mongo_guarded(default=[], fallback=degraded_top_movies)
+    async def get_top_movies(cls, limit=20):
+        """obtient les films les mieux notes"""
+        try:
+            if await cls.has_collection(LEADERBOARD):
+                top = await leaderboard_cursor(cls.get_database('listing'), limit).to_list(None)
+                if top:
+                    return top
+
+            return await cls._aggregate('ratings', MongoService._top_movies_pipeline(limit), 'listing')
+        except UNAVAILABLE:
+            raise
+        except Exception as e:
+            return swallowed(e, [])
+
+    @classmethod
+    async def _draw_sample(cls, limit, genre=None, min_rating=None):
+        """tirage par l'index rand de movies_complete (voir sampling.draw_sample)"""
+        collection = cls.get_database('listing')['movies_complete']
+        docs = []
+        for query in sample_queries(genre, min_rating):
+            remaining = limit - len(docs)
+            if remaining <= 0:
+                break
+            docs.extend(await sample_cursor(collection, query, remaining).to_list(None))
+        return docs
+
+    @classmethod
+    @mongo_guarded(default=[], fallback=degraded_random_movies)
+    async def get_random_movies(cls, limit=6, genre=None, min_rating=None):
+        """films aleatoires, eventuellement filtres (pool partage avec MongoService)"""
+        try:
+            match = sample_match(genre, min_rating)
+            pool = MongoService.get_sample_pool()
+            use_pool = not match and limit <= pool.size
+            version = get_dataset_version()
+
+            if use_pool:
+                movies = pool.take(limit, version)
+                if movies is not None:
+                    return movies
+
+            if await cls.has_collection('movies_complete'):
+                movies = await cls._draw_sample(pool.size if use_pool else limit, genre, min_rating)
+                if movies:
+                    return pool.fill(movies, version, limit) if use_pool else movies
+
+            if match:
+                # pas de cle rand: tirage filtre sqlite (voir MongoService.get_random_movies)
+                movies = await asyncio.to_thread(degraded_random_movies, limit, genre, min_rating)
+                return served_degraded(movies)
+
+            return await cls._aggregate('movies', MongoService._random_movies_pipeline(limit), 'listing')
+        except UNAVAILABLE:
+            raise
+        except Exception as e:
+            return swallowed(e, [])
+
+    @classmethod
+    @mongo_guarded(fallback=degraded_movie)
+    async def get_movie_by_id(cls, movie_id):
+        """obtient un film par son id avec details complets"""
+        try:
+            db = cls.get_database('detail')
+
+            # document denormalise si disponible (une seule lecture)
+            if await cls.has_collection('movies_complete'):
+                movie = await db['movies_complete'].find_one(
+                    {'_id': movie_id, 'directors_pids': {'$exists': False}}
+                )
+                if movie:
+                    return movie
+
+            docs = await cls._aggregate('movies', MongoService._detail_pipeline({'_id': movie_id}), 'detail')
+            if not docs:
+                return None
+
+            return MongoService._format_movie_detail(docs[0])
+
+        except UNAVAILABLE:
+            raise
+        except Exception as e:
+            return swallowed(e, None)
+
+    @classmethod
+    @mongo_guarded(default=[], fallback=degraded_similar_movies)
+    async def get_similar_movies(cls, movie_id, limit=6):
+        """films similaires (voisins precalcules, sinon meme genre)"""
+        try:
+            db = cls.get_database('listing')
+
+            if await cls.has_collection(SIMILAR_MOVIES):
+                neighbours = similar_neighbours(await db[SIMILAR_MOVIES].find_one(*similar_query(movie_id, limit)))
+                if neighbours is not None:
+                    return neighbours
+
+            genres = [g['genre'] async for g in db['genres'].find({'mid': movie_id})]
+            if not genres:
+                return []
+
+            similar_mids = await db['genres'].distinct('mid', {'genre': {'$in': genres}, 'mid': {'$ne': movie_id}})
+
+            cursor = db['movies'].find(*MongoService._similar_movies_query(similar_mids, limit)).limit(limit)
+
+            return [MongoService._format_similar_movie(m) async for m in cursor]
+
+        except UNAVAILABLE:
+            raise
+        except Exception as e:
+            return swallowed(e, [])
+
+    @classmethod
+    @cached(ttl=3600)
+    @mongo_guarded(default=[], fallback=degraded_ratings_distribution)
+    async def get_ratings_distribution(cls):
+        """distribution des notes (buckets 0-1, 1-2, ..., 9-10)"""
+        try:
+            results = await cls._aggregate('ratings', MongoService._ratings_distribution_pipeline(), 'analytics')
+            return MongoService._format_ratings_distribution(results)
+        except UNAVAILABLE:
+            raise
+        except Exception as e:
+            return swallowed(e, [])
+
+    @classmethod
+    async def close_connection(cls):
+        """ferme le client de la boucle courante"""
+        client = cls._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+            MongoService.invalidate_catalog()
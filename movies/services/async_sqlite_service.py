@@ -0,0 +1,44 @@
+"""
+facade asynchrone de SQLiteService
+le module sqlite3 est bloquant: chaque appel part dans le pool de threads partage,
+la boucle d'evenements reste libre pendant la requete (les connexions viennent du pool sqlite)
+"""
+
+import asyncio
+import functools
+
+from .orchestrator import get_executor
+from .sqlite_service import SQLiteService
+
+
+def _offload(name):
+    """methode async qui execute SQLiteService.<name> dans le pool de threads"""
+    async def method(cls, *args, **kwargs):
+        func = functools.partial(getattr(SQLiteService, name), *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), func)
+
+    method.__name__ = name
+    method.__qualname__ = f"AsyncSQLiteService.{name}"
+    method.__doc__ = f"version async de SQLiteService.{name}"
+    return classmethod(method)
+
+
+class AsyncSQLiteService:
+    """service sqlite non bloquant pour les vues async"""
+
+    get_movies_filtered = _offload('get_movies_filtered')
+    get_genres = _offload('get_genres')
+    get_top_movies = _offload('get_top_movies')
+    search_movies = _offload('search_movies')
+    search_persons = _offload('search_persons')
+    get_stats_by_genre = _offload('get_stats_by_genre')
+    get_stats_by_decade = _offload('get_stats_by_decade')
+    get_top_actors = _offload('get_top_actors')
+    get_ratings_distribution = _offload('get_ratings_distribution')
+    get_stats_by_genre_decade = _offload('get_stats_by_genre_decade')
+    get_ratings_by_genre = _offload('get_ratings_by_genre')
+    has_stats_table = _offload('has_stats_table')
+
+    # sans entree/sortie: appeles directement
+    encode_cursor = SQLiteService.encode_cursor
+    decode_cursor = SQLiteService.decode_cursor
@@ -0,0 +1,243 @@
+"""
+cache des resultats des services (lru en memoire + cache django partage optionnel)
+les cles incluent la version du jeu de donnees: un import invalide tout en une fois
+"""
+
+import functools
+import hashlib
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from .circuit_breaker import is_degraded, take_degraded
+
+
+# fichier de version ecrit par scripts/import_from_sqlite.py a chaque import
+DATASET_VERSION_FILE = Path(__file__).resolve().parent.parent.parent / 'data' / 'dataset_version'
+
+# relecture du fichier de version au plus une fois par intervalle (secondes)
+VERSION_CHECK_INTERVAL = 5
+
+DEFAULT_SETTINGS = {
+    'enabled': True,
+    'max_entries': 512,
+    'default_ttl': 300,
+    'shared_cache': None,
+    'ttl': {},
+}
+
+_version = {'value': None, 'checked_at': 0.0}
+
+
+def get_dataset_version():
+    """version courante du jeu de donnees ('0' si jamais importe)"""
+    now = time.monotonic()
+    if _version['value'] is None or now - _version['checked_at'] > VERSION_CHECK_INTERVAL:
+        try:
+            _version['value'] = DATASET_VERSION_FILE.read_text().strip() or '0'
+        except OSError:
+            _version['value'] = '0'
+        _version['checked_at'] = now
+    return _version['value']
+
+
+def bump_dataset_version(path=DATASET_VERSION_FILE):
+    """nouvelle version du jeu de donnees (appele a la fin d'un import)"""
+    version = str(time.time_ns())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(version)
+    _version['value'] = None
+    return version
+
+
+class LRUCache:
+    """cache lru borne avec expiration par entree"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(trouve, valeur)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        """ajoute une entree; renvoie le nombre d'entrees evincees"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_local = None
+_stats = {
+    'local_hits': 0,
+    'shared_hits': 0,
+    'misses': 0,
+    'evictions': 0,
+    'stores': 0,
+}
+
+
+def get_settings():
+    """configuration SERVICE_CACHE completee par les valeurs par defaut"""
+    from django.conf import settings
+
+    configured = getattr(settings, 'SERVICE_CACHE', {}) if settings.configured else {}
+    return {**DEFAULT_SETTINGS, **configured}
+
+
+def get_local_cache():
+    """tier lru du processus"""
+    global _local
+    if _local is None:
+        _local = LRUCache(get_settings()['max_entries'])
+    return _local
+
+
+def get_shared_cache(alias):
+    """tier partage via le framework de cache django (None si non configure)"""
+    if not alias:
+        return None
+    from django.core.cache import caches
+    return caches[alias]
+
+
+def make_key(name, args, kwargs):
+    """cle stable et courte (compatible memcached) pour un appel"""
+    digest = hashlib.sha1(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+    return f"svc:{get_dataset_version()}:{name}:{digest}"
+
+
+def is_cacheable(result):
+    """les erreurs avalees par les services (liste vide, dict 'error') ne sont pas gardees"""
+    if not result:
+        return False
+    if isinstance(result, dict) and 'error' in result:
+        return False
+    return True
+
+
+def _lookup(name, args, kwargs, ttl):
+    """
+    recherche d'un appel dans les deux tiers
+
+    returns:
+        (trouve, valeur, contexte) ou contexte sert a _store en cas d'absence
+    """
+    config = get_settings()
+    entry_ttl = config['ttl'].get(name, ttl if ttl is not None else config['default_ttl'])
+    key = make_key(name, args, kwargs)
+
+    local = get_local_cache()
+    found, value = local.get(key)
+    if found:
+        _stats['local_hits'] += 1
+        return True, value, None
+
+    shared = get_shared_cache(config['shared_cache'])
+    if shared is not None:
+        value = shared.get(key)
+        if value is not None:
+            _stats['shared_hits'] += 1
+            _stats['evictions'] += local.set(key, value, entry_ttl)
+            return True, value, None
+
+    _stats['misses'] += 1
+    return False, None, (key, entry_ttl, local, shared)
+
+
+def _store(context, value):
+    """garde le resultat d'un appel manque s'il est valide"""
+    key, entry_ttl, local, shared = context
+    if is_cacheable(value):
+        _stats['stores'] += 1
+        _stats['evictions'] += local.set(key, value, entry_ttl)
+        if shared is not None:
+            shared.set(key, value, entry_ttl)
+
+
+def cached(ttl=None):
+    """
+    decorateur de methode de service (a placer sous @classmethod)
+    fonctionne aussi sur les methodes async (AsyncMongoService)
+
+    args:
+        ttl: duree de vie par defaut en secondes, surchargee par SERVICE_CACHE['ttl'][nom]
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(cls, *args, **kwargs):
+                if not get_settings()['enabled']:
+                    return await func(cls, *args, **kwargs)
+
+                found, value, context = _lookup(f"{cls.__name__}.{func.__name__}", args, kwargs, ttl)
+                if found:
+                    return value
+                take_degraded()
+                value = await func(cls, *args, **kwargs)
+                if not is_degraded():
+                    _store(context, value)
+                return value
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(cls, *args, **kwargs):
+            if not get_settings()['enabled']:
+                return func(cls, *args, **kwargs)
+
+            found, value, context = _lookup(f"{cls.__name__}.{func.__name__}", args, kwargs, ttl)
+            if found:
+                return value
+            # une valeur de secours (disjoncteur ouvert) n'est pas gardee; l'indicateur
+            # reste pose pour l'appelant (MovieRepository)
+            take_degraded()
+            value = func(cls, *args, **kwargs)
+            if not is_degraded():
+                _store(context, value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def cache_stats():
+    """compteurs du cache (hits par tier, misses, evictions)"""
+    stats = dict(_stats)
+    stats['local_entries'] = len(_local) if _local is not None else 0
+    stats['dataset_version'] = get_dataset_version()
+    lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+    stats['hit_ratio'] = round((stats['local_hits'] + stats['shared_hits']) / lookups, 4) if lookups else None
+    return stats
+
+
+def clear_local_cache():
+    """vide le tier en memoire du processus"""
+    if _local is not None:
+        _local.clear()
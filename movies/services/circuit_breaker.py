@@ -0,0 +1,350 @@
+"""
+disjoncteur des appels au replica set
+apres plusieurs echecs consecutifs de selection de serveur, les appels ne sont plus tentes:
+ils renvoient aussitot la derniere valeur connue ou un chemin degrade (sqlite) au lieu
+d'attendre serverSelectionTimeoutMS a chaque appel. le retour se fait par une sonde en
+arriere-plan (apres reset_timeout, ou des que la topologie annonce un membre joignable)
+sans dependance a django
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import copy
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# vrai quand le dernier appel garde a ete servi en mode degrade (lu par cache.cached:
+# une valeur de secours ne doit pas etre mise en cache pour toute la duree du ttl)
+_degraded = contextvars.ContextVar('degraded', default=False)
+
+# erreur avalee par le dernier appel garde (lue par la facade de lecture: un resultat vide
+# renvoye apres une erreur n'est pas un succes)
+_error = contextvars.ContextVar('error', default=None)
+
+# vrai pendant un appel soumis au delai de l'appelant (pymongo.timeout de la facade)
+_caller_deadline = contextvars.ContextVar('caller_deadline', default=False)
+
+
+def is_degraded():
+    """indique si le dernier appel garde a ete degrade (sans remettre l'indicateur a zero)"""
+    return _degraded.get()
+
+
+def take_degraded():
+    """indique si le dernier appel garde a ete degrade, et remet l'indicateur a zero"""
+    degraded = _degraded.get()
+    if degraded:
+        _degraded.set(False)
+    return degraded
+
+
+def served_degraded(value):
+    """valeur d'un chemin degrade choisi par la methode gardee elle-meme (signalee a take_degraded)"""
+    _degraded.set(True)
+    return value
+
+
+def swallowed(error, value):
+    """valeur renvoyee par une methode gardee qui avale une erreur (signalee a take_error)"""
+    _error.set(error)
+    return value
+
+
+def take_error():
+    """erreur avalee par le dernier appel garde (ou None), et remet l'indicateur a zero"""
+    error = _error.get()
+    if error is not None:
+        _error.set(None)
+    return error
+
+
+@contextlib.contextmanager
+def caller_deadline():
+    """
+    appels soumis au delai de l'appelant: un depassement (erreur dont timeout est vrai)
+    remonte a l'appelant au lieu d'etre compte comme echec par le disjoncteur
+    """
+    token = _caller_deadline.set(True)
+    try:
+        yield
+    finally:
+        _caller_deadline.reset(token)
+
+
+def _caller_timeout(error):
+    """depassement du delai de l'appelant (a ne pas compter comme indisponibilite)"""
+    return _caller_deadline.get() and getattr(error, 'timeout', False)
+
+
+class CircuitBreaker:
+    """
+    etats closed (appels tentes), open (appels court-circuites) et half_open (sonde en cours)
+
+    args:
+        name: nom du disjoncteur (journaux, metriques)
+        failure_threshold: echecs consecutifs qui ouvrent le circuit
+        reset_timeout: secondes avant une sonde quand aucun evenement de topologie n'arrive
+        probe: fonction sans argument qui leve une exception si le service est indisponible
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=30.0, probe=None, history_size=50):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._closed.set()
+        self.counters = Counter()
+        self.transitions = Counter()
+        self.history = deque(maxlen=history_size)
+
+    def _transition(self, state, reason):
+        """change d'etat (verrou tenu par l'appelant)"""
+        if state == self.state:
+            return
+        previous, self.state = self.state, state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        if state == CLOSED:
+            self._closed.set()
+        else:
+            self._closed.clear()
+        self.transitions[f"{previous}->{state}"] += 1
+        self.history.append({'at': time.time(), 'from': previous, 'to': state, 'reason': reason})
+        log = logger.info if state == CLOSED else logger.warning
+        log("disjoncteur %s: %s -> %s (%s)", self.name, previous, state, reason)
+
+    def allow(self):
+        """indique si un appel peut etre tente (sinon il est court-circuite)"""
+        with self._lock:
+            self.counters['calls'] += 1
+            if self.state == CLOSED:
+                return True
+            self.counters['short_circuited'] += 1
+            due = self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout
+        if due:
+            self.start_probe('reset_timeout')
+        return False
+
+    def record_success(self):
+        """appel abouti: remet le compteur d'echecs a zero et referme le circuit"""
+        with self._lock:
+            self.counters['successes'] += 1
+            self.consecutive_failures = 0
+            if self.state != CLOSED and not self._probing:
+                self._transition(CLOSED, 'appel abouti')
+
+    def record_failure(self, error=None):
+        """echec de selection de serveur: ouvre le circuit au seuil"""
+        with self._lock:
+            self.counters['failures'] += 1
+            self.consecutive_failures += 1
+            if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                reason = f"{self.consecutive_failures} echecs consecutifs"
+                if error is not None:
+                    reason += f" ({type(error).__name__})"
+                self._transition(OPEN, reason)
+
+    def record_fallback(self):
+        """appel servi par la derniere valeur connue ou le chemin degrade"""
+        with self._lock:
+            self.counters['fallbacks'] += 1
+
+    def start_probe(self, reason):
+        """lance une sonde en arriere-plan (aucune requete utilisateur n'attend la sonde)"""
+        with self._lock:
+            if self.probe is None or self._probing or self.state == CLOSED:
+                return False
+            self._probing = True
+            self._transition(HALF_OPEN, reason)
+        threading.Thread(target=self._run_probe, name=f'{self.name}-probe', daemon=True).start()
+        return True
+
+    def _run_probe(self):
+        """execute la sonde et ferme ou rouvre le circuit"""
+        try:
+            self.probe()
+        except Exception as e:
+            with self._lock:
+                self._probing = False
+                self.counters['probes'] += 1
+                self.counters['probe_failures'] += 1
+                self._transition(OPEN, f"sonde en echec ({type(e).__name__})")
+        else:
+            with self._lock:
+                self._probing = False
+                self.counters['probes'] += 1
+                self.consecutive_failures = 0
+                self._transition(CLOSED, 'sonde reussie')
+
+    def topology_changed(self, available):
+        """evenement de topologie: un membre redevient joignable, on sonde sans attendre"""
+        if available:
+            self.start_probe('topologie')
+
+    def wait_closed(self, timeout=None):
+        """attend la fermeture du circuit (True si ferme avant l'echeance)"""
+        return self._closed.wait(timeout)
+
+    def reset(self):
+        """referme le circuit et remet les compteurs a zero"""
+        with self._lock:
+            self._transition(CLOSED, 'reinitialisation')
+            self.consecutive_failures = 0
+            self.counters.clear()
+
+    def snapshot(self):
+        """etat et metriques (transitions, appels court-circuites, historique recent)"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'open_for': round(time.monotonic() - self.opened_at, 1) if self.state != CLOSED else 0.0,
+                'counters': dict(self.counters),
+                'transitions': dict(self.transitions),
+                'history': list(self.history),
+            }
+
+
+class LastGoodValues:
+    """dernieres valeurs renvoyees par appel (servies pendant une panne), taille bornee"""
+
+    def __init__(self, size=512):
+        self.size = size
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._values:
+                return None
+            self._values.move_to_end(key)
+            return self._values[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.size:
+                self._values.popitem(last=False)
+
+
+def _usable(value):
+    """valeur a conserver pour une panne (pas un resultat vide ni une erreur avalee)"""
+    if not value:
+        return False
+    return not (isinstance(value, dict) and 'error' in value)
+
+
+def guarded(get_breaker, errors, default=None, fallback=None, last_good=None):
+    """
+    decorateur de methode de service protegee par un disjoncteur (sync ou async)
+
+    la methode laisse remonter les erreurs d'indisponibilite (errors) et signale les autres
+    erreurs par swallowed; en cas d'echec ou de circuit ouvert, l'appel renvoie la derniere
+    valeur connue, sinon fallback(*args), sinon default. sous caller_deadline, un
+    depassement du delai de l'appelant remonte sans etre compte
+
+    args:
+        get_breaker: fonction renvoyant le disjoncteur (cree a la demande)
+        errors: exceptions comptees comme indisponibilite
+        fallback: chemin degrade, meme signature que la methode sans cls
+        last_good: LastGoodValues partage (None: pas de derniere valeur)
+    """
+    def decorator(func):
+        name = func.__qualname__
+
+        def key(args, kwargs):
+            """cle de l'appel (None si un argument n'est pas hachable)"""
+            key = (name, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return None
+            return key
+
+        def stale(args, kwargs):
+            """derniere valeur connue de l'appel (None si aucune)"""
+            get_breaker().record_fallback()
+            call_key = key(args, kwargs)
+            if last_good is None or call_key is None:
+                return None
+            return last_good.get(call_key)
+
+        def degraded(value):
+            # pose apres le chemin degrade: un service appele par fallback remet l'indicateur a zero
+            _degraded.set(True)
+            return value
+
+        def remember(args, kwargs, value):
+            call_key = key(args, kwargs)
+            if last_good is not None and call_key is not None and _usable(value):
+                last_good.put(call_key, value)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(cls, *args, **kwargs):
+                breaker = get_breaker()
+                if breaker.allow():
+                    try:
+                        value = await func(cls, *args, **kwargs)
+                    except errors as e:
+                        if _caller_timeout(e):
+                            raise
+                        breaker.record_failure(e)
+                    else:
+                        breaker.record_success()
+                        remember(args, kwargs, value)
+                        return value
+
+                value = stale(args, kwargs)
+                if value is None and fallback is not None:
+                    try:
+                        value = await asyncio.to_thread(fallback, *args, **kwargs)
+                    except Exception:
+                        value = None
+                return degraded(copy.copy(default) if value is None else value)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(cls, *args, **kwargs):
+            breaker = get_breaker()
+            if breaker.allow():
+                try:
+                    value = func(cls, *args, **kwargs)
+                except errors as e:
+                    if _caller_timeout(e):
+                        raise
+                    breaker.record_failure(e)
+                else:
+                    breaker.record_success()
+                    remember(args, kwargs, value)
+                    return value
+
+            value = stale(args, kwargs)
+            if value is None and fallback is not None:
+                try:
+                    value = fallback(*args, **kwargs)
+                except Exception:
+                    value = None
+            return degraded(copy.copy(default) if value is None else value)
+        return wrapper
+    return decorator
@@ -0,0 +1,140 @@
+"""
+classement des films les mieux notes, materialise dans une petite collection mongodb
+construit a l'import depuis ratings (seuil minimum de votes), mis a jour film par film
+quand des notes changent; MongoService.get_top_movies le lit en O(limit)
+sans dependance a django: importable depuis scripts/import_from_sqlite.py
+"""
+
+import time
+
+from .mongo_indexes import MONGO_INDEXES, ensure_collection_indexes
+
+
+LEADERBOARD = 'top_rated'
+DEFAULT_MIN_VOTES = 1000
+DEFAULT_SIZE = 1000
+
+# parametres de construction (seuil et taille) du classement en place
+META_COLLECTION = 'materialized_views'
+
+SORT = [('rating', -1), ('numVotes', -1), ('_id', 1)]
+
+
+def entry_stages(size=None):
+    """etapes ratings -> document du classement (titre et annee depuis movies)"""
+    stages = [{'$sort': {'averageRating': -1, 'numVotes': -1, '_id': 1}}]
+    if size is not None:
+        stages.append({'$limit': size})
+    return stages + [
+        {'$lookup': {'from': 'movies', 'localField': '_id', 'foreignField': '_id', 'as': 'movie'}},
+        {'$unwind': '$movie'},
+        {'$project': {
+            '_id': 1,
+            'title': '$movie.primaryTitle',
+            'year': '$movie.startYear',
+            'rating': '$averageRating',
+            'numVotes': 1,
+        }},
+    ]
+
+
+def configured_min_votes():
+    """
+    seuil de votes de l'application: MONGODB_SETTINGS['leaderboard_min_votes'], lu aussi
+    hors django tant que DJANGO_SETTINGS_MODULE est defini (DEFAULT_MIN_VOTES sinon)
+    """
+    from django.conf import settings
+    from django.core.exceptions import ImproperlyConfigured
+
+    try:
+        return settings.MONGODB_SETTINGS.get('leaderboard_min_votes', DEFAULT_MIN_VOTES)
+    except ImproperlyConfigured:
+        return DEFAULT_MIN_VOTES
+
+
+def ranked_match(min_votes):
+    """filtre des films classables (seuil de votes, note connue)"""
+    return {'numVotes': {'$gte': min_votes}, 'averageRating': {'$ne': None}}
+
+
+def top_pipeline(limit, min_votes=DEFAULT_MIN_VOTES):
+    """premiers films du classement calcules en direct sur ratings (memes regles que top_rated)"""
+    return [{'$match': ranked_match(min_votes)}] + entry_stages(limit)
+
+
+def get_meta(db):
+    """seuil et taille du classement en place (None s'il n'a jamais ete construit)"""
+    return db[META_COLLECTION].find_one({'_id': LEADERBOARD})
+
+
+def build_leaderboard(db, min_votes=DEFAULT_MIN_VOTES, size=DEFAULT_SIZE):
+    """
+    reconstruit entierement le classement ($out remplace la collection de facon atomique)
+
+    returns:
+        nombre de films classes
+    """
+    pipeline = top_pipeline(size, min_votes) + [{'$out': LEADERBOARD}]
+    db.ratings.aggregate(pipeline, allowDiskUse=True)
+
+    # $out conserve les index de la collection remplacee: cree une seule fois
+    ensure_collection_indexes(db[LEADERBOARD], MONGO_INDEXES[LEADERBOARD])
+    db[META_COLLECTION].replace_one(
+        {'_id': LEADERBOARD},
+        {'min_votes': min_votes, 'size': size, 'built_at': time.time()},
+        upsert=True
+    )
+    return db[LEADERBOARD].count_documents({})
+
+
+def refresh_leaderboard(db, mids, min_votes=DEFAULT_MIN_VOTES, size=DEFAULT_SIZE):
+    """
+    met a jour le classement pour des films dont la note ou le titre a change
+
+    les films concernes sont retires puis reclasses s'ils passent le seuil; le classement
+    est ensuite complete (film sorti) ou tronque (film entre) pour garder sa taille
+
+    args:
+        min_votes, size: seuil et taille si le classement n'a jamais ete construit
+            (un classement en place garde ceux de sa construction)
+
+    returns:
+        nombre de films classes
+    """
+    meta = get_meta(db)
+    if meta is None:
+        return build_leaderboard(db, min_votes, size)
+
+    min_votes, size = meta['min_votes'], meta['size']
+    board = db[LEADERBOARD]
+    mids = list(mids)
+
+    board.delete_many({'_id': {'$in': mids}})
+    match = {'_id': {'$in': mids}, **ranked_match(min_votes)}
+    for doc in db.ratings.aggregate([{'$match': match}] + entry_stages()):
+        board.replace_one({'_id': doc['_id']}, doc, upsert=True)
+
+    count = board.count_documents({})
+    if count > size:
+        # films en trop en fin de classement
+        extra = [doc['_id'] for doc in board.find({}, {'_id': 1}).sort(SORT).skip(size)]
+        board.delete_many({'_id': {'$in': extra}})
+    elif count < size:
+        # films sortis du classement: les suivants dans ratings prennent leur place
+        present = [doc['_id'] for doc in board.find({}, {'_id': 1})]
+        match = {**ranked_match(min_votes), '_id': {'$nin': present}}
+        for doc in db.ratings.aggregate([{'$match': match}] + entry_stages(size - count)):
+            board.replace_one({'_id': doc['_id']}, doc, upsert=True)
+
+    db[META_COLLECTION].update_one({'_id': LEADERBOARD}, {'$set': {'built_at': time.time()}})
+    return board.count_documents({})
+
+
+def leaderboard_cursor(db, limit):
+    """curseur des premiers films du classement (base pymongo sync ou async)"""
+    return db[LEADERBOARD].find({}).sort(SORT).limit(limit)
+
+
+def read_leaderboard(db, limit):
+    """premiers films du classement"""
+    return list(leaderboard_cursor(db, limit))
@@ -0,0 +1,149 @@
+"""
+index mongodb utilises par MongoService et par le pipeline d'import
+declaration unique, creation idempotente et rapport d'utilisation ($indexStats)
+sans dependance a django: importable depuis scripts/import_from_sqlite.py
+"""
+
+from pymongo import IndexModel
+
+
+# collection -> liste de cles (champ, sens)
+MONGO_INDEXES = {
+    'movies': [
+        # regex sur le titre: parcours de l'index au lieu de la collection
+        [('primaryTitle', 1)],
+        [('startYear', -1)],
+    ],
+    'movies_complete': [
+        [('year', -1)],
+        [('genres', 1)],
+        [('rating', -1)],
+        [('title', 1)],
+        [('directors.pid', 1)],
+        [('writers.pid', 1)],
+        # tirages aleatoires (sampling.py): point de depart dans rand, note lue dans l'index
+        [('rand', 1), ('rating', 1)],
+        [('genres', 1), ('rand', 1), ('rating', 1)],
+    ],
+    'genres': [
+        # genres d'un film ($lookup, find) et films d'un genre (distinct)
+        [('mid', 1), ('genre', 1)],
+        [('genre', 1), ('mid', 1)],
+    ],
+    'ratings': [
+        # tri du classement (leaderboard.py) et filtres sur la note
+        [('averageRating', -1), ('numVotes', -1), ('_id', 1)],
+    ],
+    'similar_movies': [
+        # films qui ont un film donne pour voisin (similarity.refresh_similarity apres --delta)
+        [('neighbours._id', 1)],
+    ],
+    'top_rated': [
+        [('rating', -1), ('numVotes', -1), ('_id', 1)],
+    ],
+    'directors': [
+        [('mid', 1), ('pid', 1)],
+        [('pid', 1)],
+    ],
+    'writers': [
+        [('mid', 1), ('pid', 1)],
+        [('pid', 1)],
+    ],
+}
+
+
+def index_name(keys):
+    """nom d'index par defaut de mongodb (champ_sens_champ_sens)"""
+    return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+
+def index_keys(index):
+    """cles d'un index existant au format de MONGO_INDEXES (sens renvoyes en float par certains serveurs)"""
+    return tuple(
+        (field, int(direction) if isinstance(direction, float) else direction)
+        for field, direction in index['key'].items()
+    )
+
+
+def missing_collection_indexes(collection, specs):
+    """cles declarees absentes d'une collection"""
+    present = {index_keys(index) for index in collection.list_indexes()}
+    return [keys for keys in specs if tuple(keys) not in present]
+
+
+def ensure_collection_indexes(collection, specs):
+    """
+    cree les index declares manquants d'une collection
+
+    returns:
+        noms des index crees
+    """
+    missing = missing_collection_indexes(collection, specs)
+    if not missing:
+        return []
+    # background est ignore depuis mongodb 4.2 (construction optimisee sans verrou exclusif),
+    # conserve pour les versions plus anciennes
+    models = [IndexModel(keys, name=index_name(keys), background=True) for keys in missing]
+    return collection.create_indexes(models)
+
+
+def ensure_indexes(db, collections=None):
+    """
+    cree les index manquants de toutes les collections declarees (idempotent)
+    les collections absentes sont ignorees (pas de creation de collection vide)
+
+    returns:
+        dictionnaire collection -> noms des index crees
+    """
+    existing = set(db.list_collection_names())
+    created = {}
+    for name, specs in MONGO_INDEXES.items():
+        if collections is not None and name not in collections:
+            continue
+        if name not in existing:
+            continue
+        names = ensure_collection_indexes(db[name], specs)
+        if names:
+            created[name] = names
+    return created
+
+
+def missing_indexes(db):
+    """collection -> noms des index declares absents (collections presentes uniquement)"""
+    existing = set(db.list_collection_names())
+    return {
+        name: [index_name(keys) for keys in missing]
+        for name, specs in MONGO_INDEXES.items()
+        if name in existing
+        for missing in [missing_collection_indexes(db[name], specs)]
+        if missing
+    }
+
+
+def index_report(db):
+    """
+    etat des index de chaque collection declaree
+
+    returns:
+        dictionnaire collection -> {missing, unused, undeclared, usage}
+        usage: nom -> nombre d'utilisations depuis le demarrage du membre interroge
+        ($indexStats est propre a chaque membre du replica set)
+    """
+    existing = set(db.list_collection_names())
+    report = {}
+    for name, specs in MONGO_INDEXES.items():
+        if name not in existing:
+            continue
+
+        declared = {index_name(keys) for keys in specs}
+        usage = {
+            stats['name']: stats['accesses']['ops']
+            for stats in db[name].aggregate([{'$indexStats': {}}])
+        }
+        report[name] = {
+            'missing': [index_name(keys) for keys in missing_collection_indexes(db[name], specs)],
+            'unused': sorted(index for index, ops in usage.items() if ops == 0 and index != '_id_'),
+            'undeclared': sorted(index for index in usage if index not in declared and index != '_id_'),
+            'usage': usage,
+        }
+    return report
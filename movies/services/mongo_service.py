@@ -3,10 +3,162 @@ service d'acces aux donnees mongodb
 gere la connexion au replica set et les requetes
 """
 
-from pymongo import MongoClient
+import logging
+import threading
+import time
+
+from pymongo import MongoClient, ReadPreference, monitoring
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from django.conf import settings
 
+from .cache import cached, get_dataset_version
+from .circuit_breaker import CircuitBreaker, LastGoodValues, guarded, served_degraded, swallowed
+from .leaderboard import LEADERBOARD, configured_min_votes, read_leaderboard, top_pipeline
+from .read_routing import ReadRouter
+from .readiness import ReadinessTimeout, TopologyWatcher, primary_address, readable
+from .sampling import SamplePool, draw_sample, sample_match
+from .similarity import SIMILAR_MOVIES, read_similar
+from .stats_tables import rating_bucket_label
+
+
+logger = logging.getLogger(__name__)
+
+
+class _CatalogInvalidator(monitoring.TopologyListener):
+    """invalide le catalogue des collections quand le primary change (failover)"""
+
+    def opened(self, event):
+        pass
+
+    def closed(self, event):
+        pass
+
+    def description_changed(self, event):
+        if primary_address(event.previous_description) != primary_address(event.new_description):
+            MongoService.invalidate_catalog()
+
+        # un membre redevient joignable: le disjoncteur sonde sans attendre reset_timeout
+        if _breaker is not None:
+            was_available = event.previous_description.has_readable_server(ReadPreference.PRIMARY_PREFERRED)
+            available = event.new_description.has_readable_server(ReadPreference.PRIMARY_PREFERRED)
+            if available and not was_available:
+                _breaker.topology_changed(True)
+
+
+# topologie vue par le client de MongoService (attente au demarrage)
+_watcher = TopologyWatcher()
+
+# erreurs comptees par le disjoncteur (selection de serveur impossible, reseau)
+UNAVAILABLE = (ConnectionFailure,)
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+# dernieres valeurs renvoyees par appel, servies pendant une panne
+_last_good = LastGoodValues()
+
+
+def _probe():
+    """sonde du disjoncteur: un ping sur n'importe quel membre joignable"""
+    MongoService.get_client().admin.command('ping', read_preference=ReadPreference.PRIMARY_PREFERRED)
+
+
+def get_breaker():
+    """disjoncteur partage par MongoService et AsyncMongoService (MONGODB_SETTINGS['circuit_breaker'])"""
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                options = settings.MONGODB_SETTINGS.get('circuit_breaker', {})
+                _breaker = CircuitBreaker(
+                    'mongodb',
+                    failure_threshold=options.get('failure_threshold', 3),
+                    reset_timeout=options.get('reset_timeout', 30),
+                    probe=_probe
+                )
+    return _breaker
+
+
+def mongo_guarded(default=None, fallback=None):
+    """methode protegee par le disjoncteur mongodb (la methode laisse remonter UNAVAILABLE)"""
+    return guarded(get_breaker, UNAVAILABLE, default=default, fallback=fallback, last_good=_last_good)
+
+
+def _sqlite():
+    # import tardif: le service sqlite n'est charge que sur le chemin degrade
+    from .sqlite_service import SQLiteService
+    return SQLiteService
+
+
+def _as_documents(rows):
+    """lignes sqlite (mid) au format des documents mongodb (_id)"""
+    if not isinstance(rows, list):
+        return []
+    return [{'_id': row.pop('mid'), **row} for row in (dict(r) for r in rows)]
+
+
+def degraded_statistics(exact=False):
+    """statistiques lues dans sqlite (replica set indisponible)"""
+    counts = _sqlite().get_statistics(exact)
+    if 'error' in counts:
+        return counts
+    tables = counts['tables']
+    collections = {name: tables[name] for name in STAT_COLLECTIONS if name in tables}
+    return {
+        'collections': collections,
+        'total_documents': collections.get('movies', 0),
+        'replica_status': None,
+        'exact': counts['exact'],
+        'degraded': True
+    }
+
+
+def degraded_movie(movie_id):
+    """detail d'un film lu dans sqlite"""
+    return _sqlite().get_movie_document(movie_id)
+
+
+def degraded_movies(movie_ids):
+    """details de plusieurs films lus dans sqlite (ordre des ids conserve)"""
+    movies = (_sqlite().get_movie_document(mid) for mid in movie_ids)
+    return [movie for movie in movies if movie]
+
+
+def degraded_search(query, limit=50):
+    """recherche par titre dans sqlite"""
+    return _as_documents(_sqlite().search_movies(query, limit))
+
+
+def degraded_top_movies(limit=20):
+    """films les mieux notes lus dans sqlite"""
+    return _as_documents(_sqlite().get_top_movies(limit))
+
+
+def degraded_random_movies(limit=6, genre=None, min_rating=None):
+    """films aleatoires tires dans sqlite"""
+    return _as_documents(_sqlite().get_random_movies(limit, genre, min_rating))
+
+
+def degraded_similar_movies(movie_id, limit=6):
+    """films similaires lus dans sqlite (genres en commun)"""
+    return _as_documents(_sqlite().get_similar_movies(movie_id, limit))
+
+
+def degraded_ratings_distribution():
+    """repartition des notes lue dans sqlite"""
+    return _sqlite().get_ratings_distribution()
+
+
+# collections comptees par get_statistics
+STAT_COLLECTIONS = ['movies', 'persons', 'genres', 'ratings', 'directors', 'writers']
+
+
+def count_collection(collection, exact=False):
+    """nombre de documents: exact (count_documents) ou lu dans les metadonnees"""
+    if exact:
+        return collection.count_documents({})
+    return collection.estimated_document_count()
+
 
 class MongoService:
     """service de connexion et requetes mongodb"""
@@ -14,6 +166,16 @@ class MongoService:
     _client = None
     _db = None
 
+    # catalogue des collections (evite un list_collection_names par requete)
+    _catalog = None
+    _catalog_expires_at = 0.0
+    _catalog_version = None
+    _catalog_lock = threading.Lock()
+    _catalog_stats = {'refreshes': 0, 'commands_avoided': 0, 'invalidations': 0}
+
+    _sample_pool = None
+    _router = None
+
     @classmethod
     def get_client(cls):
         """obtient ou cree la connexion au replica set"""
@@ -22,17 +184,125 @@ class MongoService:
             cls._client = MongoClient(
                 mongo_settings['host'],
                 replicaSet=mongo_settings['replica_set'],
-                serverSelectionTimeoutMS=mongo_settings['timeout']
+                serverSelectionTimeoutMS=mongo_settings['timeout'],
+                event_listeners=[_CatalogInvalidator(), _watcher]
             )
         return cls._client
 
     @classmethod
-    def get_database(cls):
-        """obtient la base de donnees imdb"""
+    def wait_until_ready(cls, timeout=None):
+        """
+        attend qu'un membre du replica set puisse servir les lectures (evenements de topologie)
+
+        args:
+            timeout: echeance en secondes (MONGODB_SETTINGS['startup_wait'] par defaut)
+
+        returns:
+            True si le replica set est pret, False a l'echeance (l'application demarre quand meme)
+        """
+        if timeout is None:
+            timeout = settings.MONGODB_SETTINGS.get('startup_wait', 10)
+        cls.get_client()
+        try:
+            _watcher.wait(readable(ReadPreference.PRIMARY_PREFERRED), timeout)
+        except ReadinessTimeout as e:
+            logger.warning("replica set pas pret au demarrage: %s", e)
+            return False
+        return True
+
+    @classmethod
+    def get_router(cls):
+        """preferences de lecture par operation (MONGODB_SETTINGS['read_routing'])"""
+        if cls._router is None:
+            cls._router = ReadRouter(settings.MONGODB_SETTINGS.get('read_routing'))
+        return cls._router
+
+    @classmethod
+    def get_database(cls, operation=None):
+        """
+        obtient la base de donnees imdb
+
+        args:
+            operation: type de lecture (listing, detail, search, stats, analytics...);
+                les collections de la base renvoyee lisent sur les membres de son routage
+        """
         if cls._db is None:
             client = cls.get_client()
             cls._db = client[settings.MONGODB_SETTINGS['database']]
-        return cls._db
+        if operation is None:
+            return cls._db
+        return cls.get_router().route(cls._db, operation)
+
+    @classmethod
+    def get_collection(cls, name, operation=None):
+        """collection avec la preference de lecture de l'operation"""
+        return cls.get_router().route(cls.get_database()[name], operation)
+
+    @classmethod
+    def _fresh_catalog(cls):
+        """catalogue en cache s'il est encore valide (sinon None)"""
+        # un nouvel import (version du jeu de donnees) invalide aussi le catalogue
+        if cls._catalog is not None and cls._catalog_version != get_dataset_version():
+            cls.invalidate_catalog()
+
+        catalog = cls._catalog
+        if catalog is not None and time.monotonic() < cls._catalog_expires_at:
+            cls._catalog_stats['commands_avoided'] += 1
+            return catalog
+        return None
+
+    @classmethod
+    def _store_catalog(cls, names):
+        """enregistre un catalogue relu (partage avec AsyncMongoService)"""
+        catalog = frozenset(names)
+        ttl = settings.MONGODB_SETTINGS.get('catalog_ttl', 60)
+        cls._catalog = catalog
+        cls._catalog_version = get_dataset_version()
+        cls._catalog_expires_at = time.monotonic() + ttl
+        cls._catalog_stats['refreshes'] += 1
+        return catalog
+
+    @classmethod
+    def get_collection_names(cls):
+        """noms des collections, mis en cache avec un ttl"""
+        catalog = cls._fresh_catalog()
+        if catalog is not None:
+            return catalog
+
+        with cls._catalog_lock:
+            # un autre thread a pu rafraichir le catalogue pendant l'attente
+            catalog = cls._fresh_catalog()
+            if catalog is not None:
+                return catalog
+            return cls._store_catalog(cls.get_database('catalog').list_collection_names())
+
+    @classmethod
+    def has_collection(cls, name):
+        """indique si une collection existe (via le catalogue en cache)"""
+        return name in cls.get_collection_names()
+
+    @classmethod
+    def resolve_movies_collection(cls, operation=None):
+        """collection des films: movies_complete si presente, sinon movies"""
+        name = 'movies_complete' if cls.has_collection('movies_complete') else 'movies'
+        return cls.get_collection(name, operation)
+
+    @classmethod
+    def invalidate_catalog(cls):
+        """force la relecture du catalogue (failover, import)"""
+        cls._catalog = None
+        cls._catalog_expires_at = 0.0
+        cls._catalog_stats['invalidations'] += 1
+
+    @classmethod
+    def get_catalog_stats(cls):
+        """compteurs du cache de catalogue"""
+        return dict(cls._catalog_stats)
+
+    @classmethod
+    def get_breaker_stats(cls):
+        """etat du disjoncteur, transitions et appels servis en mode degrade"""
+        return get_breaker().snapshot()
 
     @classmethod
     def test_connection(cls):
@@ -49,22 +319,44 @@ class MongoService:
             return False, f"erreur: {str(e)}"
 
     @classmethod
-    def get_statistics(cls):
-        """obtient des statistiques sur les donnees"""
+    def _format_replica_status(cls, rs_status):
+        """resume de replSetGetStatus pour la page d'accueil"""
+        return {
+            'set': rs_status['set'],
+            'members': [
+                {
+                    'name': member['name'],
+                    'state': member['stateStr'],
+                    'health': 'ok' if member.get('health', 0) == 1 else 'ko'
+                }
+                for member in rs_status['members']
+            ]
+        }
+
+    @classmethod
+    @mongo_guarded(default={'error': 'replica set indisponible'}, fallback=degraded_statistics)
+    def get_statistics(cls, exact=False):
+        """
+        obtient des statistiques sur les donnees
+
+        args:
+            exact: count_documents (parcours complet) au lieu des metadonnees des collections
+        """
         try:
-            db = cls.get_database()
+            db = cls.get_database('stats')
             stats = {
                 'collections': {},
                 'total_documents': 0,
-                'replica_status': None
+                'replica_status': None,
+                'exact': exact
             }
 
             # nombre de documents par collection
-            collections = ['movies', 'persons', 'genres', 'ratings', 'directors', 'writers']
+            existing = cls.get_collection_names()
 
-            for coll_name in collections:
-                if coll_name in db.list_collection_names():
-                    count = db[coll_name].count_documents({})
+            for coll_name in STAT_COLLECTIONS:
+                if coll_name in existing:
+                    count = count_collection(db[coll_name], exact)
                     stats['collections'][coll_name] = count
                     # compter uniquement movies pour le total (eviter de compter les relations)
                     if coll_name == 'movies':
@@ -73,96 +365,133 @@ class MongoService:
             # statut du replica set
             try:
                 client = cls.get_client()
-                rs_status = client.admin.command('replSetGetStatus')
-                stats['replica_status'] = {
-                    'set': rs_status['set'],
-                    'members': []
-                }
-
-                for member in rs_status['members']:
-                    stats['replica_status']['members'].append({
-                        'name': member['name'],
-                        'state': member['stateStr'],
-                        'health': 'ok' if member.get('health', 0) == 1 else 'ko'
-                    })
-
+                stats['replica_status'] = cls._format_replica_status(
+                    client.admin.command('replSetGetStatus', read_preference=ReadPreference.PRIMARY_PREFERRED)
+                )
             except Exception:
                 stats['replica_status'] = None
 
             return stats
 
+        except UNAVAILABLE:
+            raise
         except Exception as e:
-            return {'error': str(e)}
+            return swallowed(e, {'error': str(e)})
 
     @classmethod
+    @mongo_guarded(default=[])
     def get_movies(cls, limit=100, skip=0, filters=None):
         """obtient une liste de films"""
         try:
-            db = cls.get_database()
-            collection = db['movies_complete'] if 'movies_complete' in db.list_collection_names() else db['movies']
+            collection = cls.resolve_movies_collection('listing')
 
             query = filters if filters else {}
             cursor = collection.find(query).skip(skip).limit(limit)
 
             return list(cursor)
 
+        except UNAVAILABLE:
+            raise
         except Exception as e:
-            return {'error': str(e)}
+            return swallowed(e, {'error': str(e)})
 
     @classmethod
+    def _detail_pipeline(cls, match):
+        """pipeline de detail: film + genres, note, realisateurs et scenaristes en une requete"""
+        return [
+            {'$match': match},
+            {'$lookup': {'from': 'genres', 'localField': '_id', 'foreignField': 'mid', 'as': 'genres_data'}},
+            {'$lookup': {'from': 'ratings', 'localField': '_id', 'foreignField': '_id', 'as': 'rating_data'}},
+            {'$lookup': {'from': 'directors', 'localField': '_id', 'foreignField': 'mid', 'as': 'directors_data'}},
+            {'$lookup': {'from': 'writers', 'localField': '_id', 'foreignField': 'mid', 'as': 'writers_data'}},
+            # noms des personnes resolus par $in sur les pids collectes
+            {'$lookup': {'from': 'persons', 'localField': 'directors_data.pid', 'foreignField': '_id', 'as': 'directors_persons'}},
+            {'$lookup': {'from': 'persons', 'localField': 'writers_data.pid', 'foreignField': '_id', 'as': 'writers_persons'}},
+        ]
+
+    @classmethod
+    def _format_movie_detail(cls, doc):
+        """met en forme un document issu du pipeline de detail"""
+        movie = {
+            k: v for k, v in doc.items()
+            if k not in ('genres_data', 'rating_data', 'directors_data', 'writers_data',
+                         'directors_persons', 'writers_persons')
+        }
+        movie['title'] = doc.get('primaryTitle')
+        movie['year'] = doc.get('startYear')
+        movie['genres'] = [g['genre'] for g in doc.get('genres_data', [])]
+
+        if doc.get('rating_data'):
+            movie['rating'] = doc['rating_data'][0].get('averageRating')
+            movie['numVotes'] = doc['rating_data'][0].get('numVotes')
+
+        for role in ('directors', 'writers'):
+            names = {p['_id']: p.get('primaryName') for p in doc.get(f'{role}_persons', [])}
+            movie[role] = [
+                {'pid': d['pid'], 'name': names[d['pid']]}
+                for d in doc.get(f'{role}_data', [])
+                if d['pid'] in names
+            ]
+
+        return movie
+
+    @classmethod
+    @mongo_guarded(fallback=degraded_movie)
     def get_movie_by_id(cls, movie_id):
         """obtient un film par son id avec details complets"""
         try:
-            db = cls.get_database()
+            db = cls.get_database('detail')
 
-            # chercher le film de base
-            movie = db['movies'].find_one({'_id': movie_id})
-            if not movie:
+            # document denormalise si disponible (une seule lecture)
+            if cls.has_collection('movies_complete'):
+                movie = db['movies_complete'].find_one({'_id': movie_id, 'directors_pids': {'$exists': False}})
+                if movie:
+                    return movie
+
+            # sinon une seule aggregation sur les collections plates
+            docs = list(db['movies'].aggregate(cls._detail_pipeline({'_id': movie_id})))
+            if not docs:
                 return None
 
-            # enrichir avec les details
-            movie['title'] = movie.get('primaryTitle')
-            movie['year'] = movie.get('startYear')
+            return cls._format_movie_detail(docs[0])
 
-            # recuperer les genres
-            genres_docs = db['genres'].find({'mid': movie_id})
-            movie['genres'] = [g['genre'] for g in genres_docs]
-
-            # recuperer la note
-            rating_doc = db['ratings'].find_one({'_id': movie_id})
-            if rating_doc:
-                movie['rating'] = rating_doc.get('averageRating')
-                movie['numVotes'] = rating_doc.get('numVotes')
-
-            # recuperer les realisateurs avec noms
-            directors_docs = db['directors'].find({'mid': movie_id})
-            directors = []
-            for d in directors_docs:
-                person = db['persons'].find_one({'_id': d['pid']}, {'primaryName': 1})
-                if person:
-                    directors.append({'pid': d['pid'], 'name': person.get('primaryName')})
-            movie['directors'] = directors
-
-            # recuperer les scenarists avec noms
-            writers_docs = db['writers'].find({'mid': movie_id})
-            writers = []
-            for w in writers_docs:
-                person = db['persons'].find_one({'_id': w['pid']}, {'primaryName': 1})
-                if person:
-                    writers.append({'pid': w['pid'], 'name': person.get('primaryName')})
-            movie['writers'] = writers
-
-            return movie
+        except UNAVAILABLE:
+            raise
+        except Exception as e:
+            return swallowed(e, None)
+
+    @classmethod
+    @mongo_guarded(default=[], fallback=degraded_movies)
+    def get_movies_by_ids(cls, movie_ids):
+        """obtient plusieurs films avec details complets (ordre des ids conserve)"""
+        try:
+            db = cls.get_database('detail')
+            movie_ids = list(movie_ids)
+            found = {}
+
+            if cls.has_collection('movies_complete'):
+                for doc in db['movies_complete'].find({'_id': {'$in': movie_ids}, 'directors_pids': {'$exists': False}}):
+                    found[doc['_id']] = doc
+
+            missing = [mid for mid in movie_ids if mid not in found]
+            if missing:
+                pipeline = cls._detail_pipeline({'_id': {'$in': missing}})
+                for doc in db['movies'].aggregate(pipeline):
+                    found[doc['_id']] = cls._format_movie_detail(doc)
+
+            return [found[mid] for mid in movie_ids if mid in found]
 
+        except UNAVAILABLE:
+            raise
         except Exception as e:
-            return None
+            return swallowed(e, [])
 
     @classmethod
+    @mongo_guarded(default=[], fallback=degraded_search)
     def search_movies(cls, query, limit=50):
         """recherche des films par titre"""
         try:
-            db = cls.get_database()
-            collection = db['movies_complete'] if 'movies_complete' in db.list_collection_names() else db['movies']
+            collection = cls.resolve_movies_collection('search')
 
             # recherche textuelle simple
             regex = {'$regex': query, '$options': 'i'}
@@ -170,76 +499,123 @@ class MongoService:
 
             return list(cursor)
 
+        except UNAVAILABLE:
+            raise
         except Exception as e:
-            return {'error': str(e)}
+            return swallowed(e, {'error': str(e)})
 
     @classmethod
+    def _top_movies_pipeline(cls, limit):
+        """pipeline des films les mieux notes sur ratings (seuil et tri du classement top_rated)"""
+        return top_pipeline(limit, configured_min_votes())
+
+    @classmethod
+    @cached(ttl=3600)
+    @mongo_guarded(default=[], fallback=degraded_top_movies)
     def get_top_movies(cls, limit=20):
         """obtient les films les mieux notes"""
         try:
-            db = cls.get_database()
+            db = cls.get_database('listing')
 
-            # utiliser aggregation pour joindre movies et ratings
-            pipeline = [
-                # joindre avec ratings
-                {
-                    '$lookup': {
-                        'from': 'ratings',
-                        'localField': '_id',
-                        'foreignField': '_id',
-                        'as': 'rating_data'
-                    }
-                },
-                # filtrer uniquement les films avec note
-                {
-                    '$match': {
-                        'rating_data': {'$ne': []}
-                    }
-                },
-                # projeter les champs necessaires
-                {
-                    '$project': {
-                        '_id': 1,
-                        'title': '$primaryTitle',
-                        'year': '$startYear',
-                        'rating': {'$arrayElemAt': ['$rating_data.averageRating', 0]}
-                    }
-                },
-                # trier par note decroissante
-                {'$sort': {'rating': -1}},
-                # limiter
-                {'$limit': limit}
-            ]
+            # classement materialise (lecture de `limit` documents)
+            if cls.has_collection(LEADERBOARD):
+                top = read_leaderboard(db, limit)
+                if top:
+                    return top
 
-            return list(db['movies'].aggregate(pipeline))
+            # sinon meme classement calcule en direct depuis ratings
+            return list(db['ratings'].aggregate(cls._top_movies_pipeline(limit)))
 
+        except UNAVAILABLE:
+            raise
         except Exception as e:
-            return []
+            return swallowed(e, [])
 
     @classmethod
-    def get_random_movies(cls, limit=6):
-        """films aleatoires via aggregation sample"""
-        try:
-            db = cls.get_database()
-            pipeline = [
-                {'$sample': {'size': limit}},
-                {
-                    '$project': {
-                        '_id': 1,
-                        'title': '$primaryTitle',
-                        'year': '$startYear'
-                    }
+    def _random_movies_pipeline(cls, limit):
+        """pipeline de tirage aleatoire sans filtre sur la collection plate movies"""
+        return [
+            {'$sample': {'size': limit}},
+            {
+                '$project': {
+                    '_id': 1,
+                    'title': '$primaryTitle',
+                    'year': '$startYear'
                 }
-            ]
-            return list(db['movies'].aggregate(pipeline))
+            }
+        ]
+
+    @classmethod
+    def get_sample_pool(cls):
+        """pool des films aleatoires de la page d'accueil (un par processus)"""
+        if cls._sample_pool is None:
+            mongo_settings = settings.MONGODB_SETTINGS
+            cls._sample_pool = SamplePool(
+                size=mongo_settings.get('random_pool_size', 120),
+                ttl=mongo_settings.get('random_pool_ttl', 300)
+            )
+        return cls._sample_pool
+
+    @classmethod
+    @mongo_guarded(default=[], fallback=degraded_random_movies)
+    def get_random_movies(cls, limit=6, genre=None, min_rating=None):
+        """
+        films aleatoires, eventuellement filtres (genre, note minimale)
+
+        sans filtre, les films viennent du pool pre-tire; les tirages passent par l'index
+        rand de movies_complete. sans cle rand, un tirage sans filtre passe par $sample sur
+        movies et un tirage filtre est servi en mode degrade par sqlite (recherches par cle)
+        plutot que par un $sample qui parcourt tous les films du filtre
+        """
+        try:
+            db = cls.get_database('listing')
+            match = sample_match(genre, min_rating)
+            pool = cls.get_sample_pool()
+            use_pool = not match and limit <= pool.size
+            version = get_dataset_version()
+
+            if use_pool:
+                movies = pool.take(limit, version)
+                if movies is not None:
+                    return movies
+
+            if cls.has_collection('movies_complete'):
+                movies = draw_sample(db['movies_complete'], pool.size if use_pool else limit, genre, min_rating)
+                if movies:
+                    return pool.fill(movies, version, limit) if use_pool else movies
+
+            if match:
+                return served_degraded(degraded_random_movies(limit, genre, min_rating))
+
+            # collections plates seules: $sample sur movies
+            return list(db['movies'].aggregate(cls._random_movies_pipeline(limit)))
+        except UNAVAILABLE:
+            raise
         except Exception as e:
-            return []
+            return swallowed(e, [])
+
+    @classmethod
+    def _similar_movies_query(cls, similar_mids, limit):
+        """filtre et projection des films de meme genre"""
+        return {'_id': {'$in': similar_mids[:limit]}}, {'_id': 1, 'primaryTitle': 1, 'startYear': 1}
 
     @classmethod
+    def _format_similar_movie(cls, movie):
+        """film de meme genre au format des voisins precalcules"""
+        return {'_id': movie['_id'], 'title': movie.get('primaryTitle'), 'year': movie.get('startYear')}
+
+    @classmethod
+    @mongo_guarded(default=[], fallback=degraded_similar_movies)
     def get_similar_movies(cls, movie_id, limit=6):
-        """films similaires (meme genre ou realisateur)"""
+        """films similaires (voisins precalcules, sinon meme genre)"""
         try:
-            db = cls.get_database()
+            db = cls.get_database('listing')
+
+            # index de similarite construit hors ligne: une lecture par _id
+            if cls.has_collection(SIMILAR_MOVIES):
+                neighbours = read_similar(db, movie_id, limit)
+                if neighbours is not None:
+                    return neighbours
 
             # recuperer les genres du film actuel
             genres_docs = db['genres'].find({'mid': movie_id})
@@ -252,53 +628,51 @@ class MongoService:
             similar_mids = db['genres'].distinct('mid', {'genre': {'$in': genres}, 'mid': {'$ne': movie_id}})
 
             # recuperer les films correspondants
-            movies = db['movies'].find(
-                {'_id': {'$in': similar_mids[:limit]}},
-                {'_id': 1, 'primaryTitle': 1, 'startYear': 1}
-            ).limit(limit)
-
-            result = []
-            for m in movies:
-                result.append({
-                    '_id': m['_id'],
-                    'title': m.get('primaryTitle'),
-                    'year': m.get('startYear')
-                })
+            movies = db['movies'].find(*cls._similar_movies_query(similar_mids, limit)).limit(limit)
 
-            return result
+            return [cls._format_similar_movie(m) for m in movies]
 
+        except UNAVAILABLE:
+            raise
         except Exception as e:
-            return []
+            return swallowed(e, [])
 
     @classmethod
+    def _ratings_distribution_pipeline(cls):
+        """pipeline de repartition des notes par tranche de 1"""
+        return [
+            {'$match': {'averageRating': {'$exists': True, '$ne': None}}},
+            {'$bucket': {
+                'groupBy': '$averageRating',
+                'boundaries': [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11],
+                'output': {'count': {'$sum': 1}}
+            }}
+        ]
+
+    @classmethod
+    def _format_ratings_distribution(cls, results):
+        """libelles des tranches pour chart.js"""
+        formatted = []
+        for r in results:
+            formatted.append({'label': rating_bucket_label(r['_id']), 'value': r['count']})
+
+        return formatted
+
+    @classmethod
+    @cached(ttl=3600)
+    @mongo_guarded(default=[], fallback=degraded_ratings_distribution)
     def get_ratings_distribution(cls):
         """distribution des notes (buckets 0-1, 1-2, ..., 9-10)"""
         try:
-            db = cls.get_database()
-
-            pipeline = [
-                {'$match': {'averageRating': {'$exists': True, '$ne': None}}},
-                {'$bucket': {
-                    'groupBy': '$averageRating',
-                    'boundaries': [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11],
-                    'output': {'count': {'$sum': 1}}
-                }}
-            ]
-
-            results = list(db['ratings'].aggregate(pipeline))
-            formatted = []
-            for r in results:
-                bucket_id = r['_id']
-                if bucket_id < 10:
-                    label = f"{bucket_id}-{bucket_id+1}"
-                else:
-                    label = "10+"
-                formatted.append({'label': label, 'value': r['count']})
+            db = cls.get_database('analytics')
 
-            return formatted
+            results = db['ratings'].aggregate(cls._ratings_distribution_pipeline())
+            return cls._format_ratings_distribution(results)
 
+        except UNAVAILABLE:
+            raise
         except Exception as e:
-            return []
+            return swallowed(e, [])
 
     @classmethod
     def close_connection(cls):
@@ -307,3 +681,4 @@ class MongoService:
             cls._client.close()
             cls._client = None
             cls._db = None
+            cls.invalidate_catalog()
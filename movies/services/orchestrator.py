@@ -0,0 +1,220 @@
+"""
+execution concurrente d'appels de services independants
+chaque appel a son propre timeout: un backend lent donne un rendu partiel au lieu de bloquer la page
+
+le pool de threads est partage par toutes les requetes du processus (SERVICE_ORCHESTRATION
+['max_workers']); le timeout d'un appel court depuis sa soumission, le temps passe en file
+d'attente du pool compte donc dans le delai de l'appelant. un appel garde ce qui reste du
+delai comme budget (pymongo.timeout) et un appel encore en file a l'expiration est annule,
+pour qu'une page abandonnee n'occupe pas le pool au detriment des suivantes
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pymongo
+from django.conf import settings
+
+from .circuit_breaker import caller_deadline
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'max_workers': 16,
+    'timeout': 3.0,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_settings():
+    """configuration SERVICE_ORCHESTRATION completee par les valeurs par defaut"""
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SERVICE_ORCHESTRATION', {})}
+
+
+def get_executor():
+    """pool de threads partage (les drivers pymongo et sqlite sont synchrones)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_settings()['max_workers'],
+                    thread_name_prefix='service-call'
+                )
+    return _executor
+
+
+def call(func, *args, default=None, timeout=None, **kwargs):
+    """
+    decrit un appel de service
+
+    args:
+        func: fonction a appeler
+        default: valeur utilisee si l'appel echoue ou depasse son timeout
+        timeout: timeout propre a l'appel (secondes), sinon celui de run_parallel
+    """
+    return {'func': func, 'args': args, 'kwargs': kwargs, 'default': default, 'timeout': timeout}
+
+
+class ParallelResult:
+    """resultats d'un run_parallel"""
+
+    def __init__(self):
+        self.values = {}
+        self.timings = {}
+        self.timed_out = []
+        self.failed = []
+
+    @property
+    def partial(self):
+        """vrai si au moins un appel a ete remplace par sa valeur par defaut"""
+        return bool(self.timed_out or self.failed)
+
+    @property
+    def unavailable(self):
+        """noms des appels remplaces par leur valeur par defaut"""
+        return self.timed_out + self.failed
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+
+def _timed(func, args, kwargs, timings, name, deadline):
+    """
+    execute l'appel en enregistrant sa duree, meme si l'appelant a cesse d'attendre
+
+    le reste du delai de l'appelant borne les requetes mongodb de l'appel (un depassement
+    remonte sans etre compte par le disjoncteur); un appel sorti de la file apres
+    l'expiration du delai n'est pas execute
+    """
+    start = time.perf_counter()
+    budget = deadline - start
+    if budget <= 0:
+        return None
+    try:
+        with pymongo.timeout(budget), caller_deadline():
+            return func(*args, **kwargs)
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def run_parallel(calls, timeout=None):
+    """
+    execute des appels independants en parallele
+
+    args:
+        calls: dictionnaire nom -> call(...)
+        timeout: timeout par defaut des appels (secondes), compte depuis le lancement
+            (attente dans la file du pool partage comprise)
+
+    returns:
+        ParallelResult (values, timings en ms, timed_out, failed)
+    """
+    config = get_settings()
+    default_timeout = timeout if timeout is not None else config['timeout']
+    executor = get_executor()
+    result = ParallelResult()
+
+    start = time.perf_counter()
+    deadlines = {
+        name: start + (spec['timeout'] if spec['timeout'] is not None else default_timeout)
+        for name, spec in calls.items()
+    }
+    futures = {
+        name: executor.submit(
+            _timed, spec['func'], spec['args'], spec['kwargs'], result.timings, name, deadlines[name]
+        )
+        for name, spec in calls.items()
+    }
+
+    for name, future in futures.items():
+        spec = calls[name]
+        call_timeout = deadlines[name] - start
+        remaining = max(0.0, deadlines[name] - time.perf_counter())
+
+        try:
+            result.values[name] = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            # encore en file: retire du pool; deja lance: s'arrete a la fin de son budget
+            future.cancel()
+            result.values[name] = spec['default']
+            result.timed_out.append(name)
+            result.timings.setdefault(name, round(call_timeout * 1000, 2))
+        except Exception:
+            logger.exception("appel de service %s en echec", name)
+            result.values[name] = spec['default']
+            result.failed.append(name)
+
+    # copie: un appel hors delai peut encore ecrire sa duree
+    timings = dict(result.timings)
+    logger.debug(
+        "run_parallel %.1f ms: %s",
+        (time.perf_counter() - start) * 1000,
+        ', '.join(f"{name}={ms}ms" for name, ms in timings.items())
+    )
+    if result.timed_out:
+        logger.warning("appels hors delai: %s", ', '.join(result.timed_out))
+
+    return result
+
+
+async def _timed_async(func, args, kwargs, timings, name):
+    """execute une coroutine de service en enregistrant sa duree"""
+    start = time.perf_counter()
+    try:
+        return await func(*args, **kwargs)
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+async def gather_parallel(calls, timeout=None):
+    """
+    equivalent async de run_parallel: les appels sont des fonctions async (services Async*)
+
+    args:
+        calls: dictionnaire nom -> call(...)
+        timeout: timeout par defaut des appels (secondes)
+
+    returns:
+        ParallelResult (values, timings en ms, timed_out, failed)
+    """
+    config = get_settings()
+    default_timeout = timeout if timeout is not None else config['timeout']
+    result = ParallelResult()
+
+    async def run(name, spec):
+        call_timeout = spec['timeout'] if spec['timeout'] is not None else default_timeout
+        try:
+            # hors delai la coroutine est annulee (pas de thread qui continue en arriere-plan)
+            result.values[name] = await asyncio.wait_for(
+                _timed_async(spec['func'], spec['args'], spec['kwargs'], result.timings, name),
+                timeout=call_timeout
+            )
+        except asyncio.TimeoutError:
+            result.values[name] = spec['default']
+            result.timed_out.append(name)
+            result.timings[name] = round(call_timeout * 1000, 2)
+        except Exception:
+            logger.exception("appel de service %s en echec", name)
+            result.values[name] = spec['default']
+            result.failed.append(name)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(name, spec) for name, spec in calls.items()))
+
+    logger.debug(
+        "gather_parallel %.1f ms: %s",
+        (time.perf_counter() - start) * 1000,
+        ', '.join(f"{name}={ms}ms" for name, ms in result.timings.items())
+    )
+    if result.timed_out:
+        logger.warning("appels hors delai: %s", ', '.join(result.timed_out))
+
+    return result
@@ -0,0 +1,71 @@
+"""
+routage des lectures par type d'operation vers les membres du replica set
+chaque operation (liste, detail, recherche, statistiques, analyses, ecriture) a sa
+preference de lecture, declaree dans MONGODB_SETTINGS['read_routing']
+sans dependance a django: importable depuis un script
+"""
+
+from pymongo.read_preferences import (
+    Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+)
+
+
+READ_MODES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+# plus petit max_staleness accepte par mongodb (secondes)
+MIN_MAX_STALENESS = 90
+
+# routage par defaut: tout sur le primary (comportement d'un MongoClient sans option)
+DEFAULT_ROUTING = {
+    'default': {'mode': 'primary'},
+}
+
+
+def read_preference(spec):
+    """
+    preference de lecture pymongo d'une entree de read_routing
+
+    args:
+        spec: {'mode': ..., 'max_staleness': secondes, 'tag_sets': [{...}, {}]}
+
+    returns:
+        instance de pymongo.read_preferences (ValueError si le mode est inconnu)
+    """
+    mode = spec.get('mode', 'primary')
+    if mode not in READ_MODES:
+        raise ValueError(f"mode de lecture inconnu: {mode} (attendu: {', '.join(READ_MODES)})")
+    if mode == 'primary':
+        return Primary()
+
+    options = {}
+    if spec.get('tag_sets'):
+        options['tag_sets'] = spec['tag_sets']
+    max_staleness = spec.get('max_staleness')
+    if max_staleness is not None and max_staleness != -1:
+        # verifie par pymongo seulement a la selection du serveur: refuse des la configuration
+        if max_staleness < MIN_MAX_STALENESS:
+            raise ValueError(f"max_staleness doit valoir au moins {MIN_MAX_STALENESS} secondes")
+        options['max_staleness'] = max_staleness
+    return READ_MODES[mode](**options)
+
+
+class ReadRouter:
+    """preferences de lecture par operation, construites une fois"""
+
+    def __init__(self, routing=None):
+        routing = {**DEFAULT_ROUTING, **(routing or {})}
+        self.preferences = {operation: read_preference(spec) for operation, spec in routing.items()}
+
+    def preference(self, operation=None):
+        """preference d'une operation (celle de 'default' si l'operation n'est pas declaree)"""
+        return self.preferences.get(operation) or self.preferences['default']
+
+    def route(self, target, operation=None):
+        """base ou collection avec la preference de l'operation (with_options)"""
+        return target.with_options(read_preference=self.preference(operation))
@@ -0,0 +1,227 @@
+"""
+attente de l'etat du replica set par evenements de topologie (sdam) au lieu de pauses fixes
+un observateur recoit les descriptions de topologie et les heartbeats du driver; une attente
+se termine des que sa condition est vraie (primary elu, membres prets, membre joignable,
+secondaires a jour d'un optime), ou leve ReadinessTimeout a l'echeance
+sans dependance a django: importable depuis les scripts
+"""
+
+import threading
+import time
+
+from pymongo import MongoClient, ReadPreference, monitoring
+
+
+# frequence des heartbeats des clients d'attente (minimum accepte par pymongo: 500 ms);
+# les changements d'etat arrivent aussitot (hello en streaming), lastWrite a ce rythme
+HEARTBEAT_MS = 500
+
+PRIMARY = 'RSPrimary'
+SECONDARY = 'RSSecondary'
+
+
+class ReadinessTimeout(Exception):
+    """condition non atteinte avant l'echeance"""
+
+    def __init__(self, condition, timeout, states):
+        self.condition = condition
+        self.timeout = timeout
+        self.states = states
+        members = ', '.join(f"{address}: {state}" for address, state in sorted(states.items())) or 'aucun membre vu'
+        super().__init__(f"{condition}: non atteint apres {timeout:.0f}s ({members})")
+
+
+def primary_address(description):
+    """adresse du primary dans une description de topologie (ou None)"""
+    for server in description.server_descriptions().values():
+        if server.server_type_name == PRIMARY:
+            return server.address
+    return None
+
+
+def format_address(address):
+    """(host, port) -> 'host:port'"""
+    return f"{address[0]}:{address[1]}" if address else None
+
+
+def parse_address(host):
+    """'host:port' -> (host, port)"""
+    name, _, port = host.rpartition(':')
+    return (name, int(port))
+
+
+class TopologyWatcher(monitoring.TopologyListener, monitoring.ServerHeartbeatListener):
+    """
+    derniere topologie et dernier optime ecrit par membre, vus par un client pymongo
+
+    a passer dans event_listeners du client observe (voir watch)
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.description = None
+        self.optimes = {}
+
+    def opened(self, event):
+        pass
+
+    def closed(self, event):
+        pass
+
+    def description_changed(self, event):
+        with self._condition:
+            self.description = event.new_description
+            self._condition.notify_all()
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        # lastWrite.opTime du hello: optime applique par le membre
+        optime = event.reply.document.get('lastWrite', {}).get('opTime', {}).get('ts')
+        if optime is not None:
+            with self._condition:
+                self.optimes[event.connection_id] = optime
+                self._condition.notify_all()
+
+    def failed(self, event):
+        pass
+
+    def states(self):
+        """type de chaque membre connu ('host:port' -> RSPrimary, RSSecondary, Unknown...)"""
+        if self.description is None:
+            return {}
+        return {
+            format_address(address): server.server_type_name
+            for address, server in self.description.server_descriptions().items()
+        }
+
+    def wait(self, condition, timeout):
+        """
+        attend qu'une condition soit vraie
+
+        args:
+            condition: predicat (observateur -> bool) construit par les fonctions de ce module
+            timeout: echeance en secondes
+
+        returns:
+            description de topologie qui satisfait la condition (ReadinessTimeout sinon)
+        """
+        with self._condition:
+            ready = self._condition.wait_for(
+                lambda: self.description is not None and condition(self), timeout
+            )
+            if not ready:
+                raise ReadinessTimeout(getattr(condition, 'label', 'condition'), timeout, self.states())
+            return self.description
+
+
+def _condition(label):
+    """nomme un predicat (message de ReadinessTimeout)"""
+    def decorate(predicate):
+        predicate.label = label
+        return predicate
+    return decorate
+
+
+def has_primary():
+    """un primary est elu"""
+    @_condition("primary elu")
+    def predicate(watcher):
+        return primary_address(watcher.description) is not None
+    return predicate
+
+
+def new_primary(previous):
+    """un primary autre que previous ((host, port) ou None) est elu"""
+    @_condition(f"nouveau primary (precedent: {format_address(previous)})")
+    def predicate(watcher):
+        address = primary_address(watcher.description)
+        return address is not None and address != previous
+    return predicate
+
+
+def primary_lost(previous):
+    """le membre previous ((host, port)) n'est plus primary"""
+    @_condition(f"perte du primary {format_address(previous)}")
+    def predicate(watcher):
+        return primary_address(watcher.description) != previous
+    return predicate
+
+
+def readable(read_preference=ReadPreference.PRIMARY_PREFERRED):
+    """un membre peut servir les lectures de cette preference"""
+    @_condition(f"membre lisible ({read_preference.name})")
+    def predicate(watcher):
+        return watcher.description.has_readable_server(read_preference)
+    return predicate
+
+
+def reachable(address):
+    """le membre (host, port) repond aux heartbeats (quel que soit son etat)"""
+    @_condition(f"{format_address(address)} joignable")
+    def predicate(watcher):
+        server = watcher.description.server_descriptions().get(address)
+        return server is not None and server.is_server_type_known
+    return predicate
+
+
+def members_ready(count):
+    """au moins count membres primary ou secondary, dont un primary"""
+    @_condition(f"{count} membres prets")
+    def predicate(watcher):
+        types = [s.server_type_name for s in watcher.description.server_descriptions().values()]
+        return PRIMARY in types and sum(t in (PRIMARY, SECONDARY) for t in types) >= count
+    return predicate
+
+
+def caught_up(optime, addresses=None):
+    """
+    les secondaires (ou les membres donnes) ont applique l'optime
+
+    args:
+        optime: bson.Timestamp d'une ecriture (session.operation_time)
+        addresses: membres (host, port) attendus; par defaut tous les secondaires connus
+    """
+    @_condition(f"secondaires a jour de l'optime {optime}")
+    def predicate(watcher):
+        members = addresses or [
+            address for address, server in watcher.description.server_descriptions().items()
+            if server.server_type_name == SECONDARY
+        ]
+        return bool(members) and all(
+            watcher.optimes.get(address) is not None and watcher.optimes[address] >= optime
+            for address in members
+        )
+    return predicate
+
+
+def watch(hosts, replica_set=None, **options):
+    """
+    client pymongo observe (heartbeats rapides)
+
+    returns:
+        (client, observateur)
+    """
+    watcher = TopologyWatcher()
+    listeners = [watcher, *options.pop('event_listeners', [])]
+    if replica_set:
+        options['replicaSet'] = replica_set
+    client = MongoClient(hosts, heartbeatFrequencyMS=HEARTBEAT_MS, event_listeners=listeners, **options)
+    return client, watcher
+
+
+def wait_for(hosts, condition, timeout, replica_set=None, **options):
+    """
+    ouvre un client observe, attend une condition et ferme le client
+
+    returns:
+        duree de l'attente en secondes (ReadinessTimeout a l'echeance)
+    """
+    start = time.monotonic()
+    client, watcher = watch(hosts, replica_set, **options)
+    try:
+        watcher.wait(condition, timeout)
+    finally:
+        client.close()
+    return time.monotonic() - start
@@ -0,0 +1,273 @@
+"""
+facade de lecture des films sur les deux bases
+chaque lecture existe sur mongodb (replica set) et sur sqlite (data/imdb.db, au format des
+documents mongodb); la facade choisit par lecture la base la plus rapide d'apres une moyenne
+mobile exponentielle (ewma) des latences observees, et bascule sur l'autre base en cas
+d'erreur, de depassement du delai ou de disjoncteur ouvert
+"""
+
+import asyncio
+import functools
+import logging
+import random
+import threading
+import time
+
+import pymongo
+from django.conf import settings
+
+from .async_mongo_service import AsyncMongoService
+from .circuit_breaker import CLOSED, caller_deadline, take_degraded, take_error
+from .mongo_service import (
+    MongoService, degraded_movie, degraded_random_movies, degraded_ratings_distribution,
+    degraded_similar_movies, degraded_top_movies, get_breaker
+)
+from .orchestrator import get_executor
+
+
+logger = logging.getLogger(__name__)
+
+MONGODB = 'mongodb'
+SQLITE = 'sqlite'
+
+DEFAULT_SETTINGS = {
+    # base essayee en premier tant que les latences ne designent pas l'autre
+    'preferred': MONGODB,
+    # poids d'une nouvelle mesure dans la moyenne mobile
+    'alpha': 0.2,
+    # l'autre base est choisie si sa latence moyenne est plus faible d'au moins ce facteur
+    'margin': 1.2,
+    # part des lectures envoyees a l'autre base pour garder sa moyenne a jour
+    'explore': 0.05,
+    # delai d'une lecture mongodb (secondes) avant bascule sur sqlite
+    'timeout': 1.0,
+}
+
+# lecture -> (lecture sqlite au format des documents mongodb, valeur si les deux bases echouent,
+#            routage par latence)
+# la methode mongodb porte le nom de la lecture (MongoService, AsyncMongoService); une lecture
+# hors routage (voisins precalcules mongodb, genres communs cote sqlite) va toujours a mongodb
+# d'abord, sqlite ne servant qu'en secours
+READS = {
+    'get_movie_by_id': (degraded_movie, None, True),
+    'get_top_movies': (degraded_top_movies, [], True),
+    'get_random_movies': (degraded_random_movies, [], True),
+    'get_similar_movies': (degraded_similar_movies, [], False),
+    'get_ratings_distribution': (degraded_ratings_distribution, [], True),
+}
+
+
+def get_settings():
+    """configuration MOVIE_REPOSITORY completee par les valeurs par defaut"""
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'MOVIE_REPOSITORY', {})}
+
+
+def _failed(value):
+    """resultat d'erreur renvoye par un service (les services avalent leurs exceptions)"""
+    return isinstance(value, dict) and 'error' in value
+
+
+def _error_outcome(error):
+    """issue d'une tentative en erreur: 'timeout' (delai client depasse) ou 'error'"""
+    return 'timeout' if getattr(error, 'timeout', False) else 'error'
+
+
+def _outcome(value, degraded, error):
+    """issue d'une tentative: 'ok', 'degraded', 'timeout' ou 'error'"""
+    if degraded:
+        # servi par le disjoncteur: le resultat vient deja de sqlite (ou d'une valeur connue)
+        return 'degraded'
+    if error is not None:
+        # erreur avalee par le service: sa valeur par defaut n'est pas un resultat
+        return _error_outcome(error)
+    if _failed(value):
+        return 'error'
+    return 'ok'
+
+
+def _routed(read, asynchronous=False):
+    """methode de la facade qui execute la lecture du meme nom"""
+    if asynchronous:
+        async def method(cls, *args, **kwargs):
+            return await cls.read(read, *args, **kwargs)
+    else:
+        def method(cls, *args, **kwargs):
+            return cls.read(read, *args, **kwargs)
+
+    owner = 'AsyncMovieRepository' if asynchronous else 'MovieRepository'
+    method.__name__ = read
+    method.__qualname__ = f"{owner}.{read}"
+    method.__doc__ = f"{read} sur mongodb ou sqlite selon la latence observee"
+    return classmethod(method)
+
+
+class LatencyTracker:
+    """moyenne mobile exponentielle des latences (ms) par lecture et par base"""
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._counters = {}
+
+    def record(self, read, backend, ms, outcome='ok'):
+        """
+        ajoute une mesure
+
+        args:
+            outcome: 'ok', ou la raison d'une bascule ('timeout', 'error', 'degraded');
+                une bascule compte pour la duree du delai au moins
+        """
+        key = (read, backend)
+        with self._lock:
+            previous = self._latencies.get(key)
+            self._latencies[key] = ms if previous is None else previous + self.alpha * (ms - previous)
+            counters = self._counters.setdefault(key, {})
+            counters[outcome] = counters.get(outcome, 0) + 1
+
+    def latency(self, read, backend):
+        """latence moyenne (None sans mesure)"""
+        return self._latencies.get((read, backend))
+
+    def snapshot(self):
+        """latences moyennes et issues des lectures, par lecture et par base"""
+        with self._lock:
+            report = {}
+            for (read, backend), ms in sorted(self._latencies.items()):
+                report.setdefault(read, {})[backend] = {
+                    'ewma_ms': round(ms, 2),
+                    **self._counters.get((read, backend), {}),
+                }
+            return report
+
+
+class MovieRepository:
+    """lectures de films routees vers mongodb ou sqlite selon leur latence observee"""
+
+    _tracker = None
+
+    @classmethod
+    def get_tracker(cls):
+        """latences observees (une instance par processus, partagee avec la facade async)"""
+        if MovieRepository._tracker is None:
+            MovieRepository._tracker = LatencyTracker(get_settings()['alpha'])
+        return MovieRepository._tracker
+
+    @classmethod
+    def backends(cls, read):
+        """
+        ordre d'essai des bases pour une lecture
+
+        sqlite seule quand le disjoncteur mongodb est ouvert; mongodb puis sqlite pour une
+        lecture hors routage; sinon la base preferee, sauf si l'autre est nettement plus
+        rapide (ou tiree pour exploration)
+        """
+        if get_breaker().state != CLOSED:
+            return [SQLITE]
+        if not READS[read][2]:
+            return [MONGODB, SQLITE]
+
+        config = get_settings()
+        first = config['preferred']
+        other = SQLITE if first == MONGODB else MONGODB
+        tracker = cls.get_tracker()
+        first_ms = tracker.latency(read, first)
+        other_ms = tracker.latency(read, other)
+
+        faster = first_ms is not None and other_ms is not None and other_ms * config['margin'] < first_ms
+        if faster != (random.random() < config['explore']):
+            return [other, first]
+        return [first, other]
+
+    @classmethod
+    def _measure(cls, read, backend, start, value, timeout):
+        """enregistre la latence d'une tentative et renvoie son issue"""
+        elapsed = time.perf_counter() - start
+        outcome = _outcome(value, take_degraded(), take_error())
+        # une bascule compte au moins pour la duree du delai
+        ms = elapsed * 1000 if outcome == 'ok' else max(elapsed, timeout) * 1000
+        cls.get_tracker().record(read, backend, ms, outcome)
+        return outcome
+
+    @classmethod
+    def _failed_attempt(cls, read, backend, error, timeout):
+        """enregistre une tentative qui a leve une exception"""
+        logger.warning("lecture %s sur %s en echec: %s", read, backend, error)
+        cls.get_tracker().record(read, backend, timeout * 1000, _error_outcome(error))
+
+    @classmethod
+    def read(cls, read, *args, **kwargs):
+        """execute une lecture sur la premiere base qui repond dans les temps"""
+        fallback, default, _ = READS[read]
+        timeout = get_settings()['timeout']
+
+        for backend in cls.backends(read):
+            start = time.perf_counter()
+            take_degraded()
+            take_error()
+            try:
+                if backend == MONGODB:
+                    # delai client (csot): selection du serveur et requetes comprises; un
+                    # depassement remonte ici sans etre compte par le disjoncteur
+                    with pymongo.timeout(timeout), caller_deadline():
+                        value = getattr(MongoService, read)(*args, **kwargs)
+                else:
+                    value = fallback(*args, **kwargs)
+            except Exception as e:
+                cls._failed_attempt(read, backend, e, timeout)
+                continue
+
+            if cls._measure(read, backend, start, value, timeout) in ('ok', 'degraded'):
+                return value
+
+        return default
+
+    @classmethod
+    def get_stats(cls):
+        """latences moyennes par lecture et par base, et etat du disjoncteur"""
+        return {
+            'latencies': cls.get_tracker().snapshot(),
+            'breaker': get_breaker().state,
+        }
+
+    get_movie_by_id = _routed('get_movie_by_id')
+    get_top_movies = _routed('get_top_movies')
+    get_random_movies = _routed('get_random_movies')
+    get_similar_movies = _routed('get_similar_movies')
+    get_ratings_distribution = _routed('get_ratings_distribution')
+
+
+class AsyncMovieRepository(MovieRepository):
+    """meme routage pour les vues async (latences partagees avec MovieRepository)"""
+
+    @classmethod
+    async def read(cls, read, *args, **kwargs):
+        """execute une lecture sur la premiere base qui repond dans les temps"""
+        fallback, default, _ = READS[read]
+        timeout = get_settings()['timeout']
+
+        for backend in cls.backends(read):
+            start = time.perf_counter()
+            take_degraded()
+            take_error()
+            try:
+                if backend == MONGODB:
+                    with pymongo.timeout(timeout), caller_deadline():
+                        value = await getattr(AsyncMongoService, read)(*args, **kwargs)
+                else:
+                    func = functools.partial(fallback, *args, **kwargs)
+                    value = await asyncio.get_running_loop().run_in_executor(get_executor(), func)
+            except Exception as e:
+                cls._failed_attempt(read, backend, e, timeout)
+                continue
+
+            if cls._measure(read, backend, start, value, timeout) in ('ok', 'degraded'):
+                return value
+
+        return default
+
+    get_movie_by_id = _routed('get_movie_by_id', asynchronous=True)
+    get_top_movies = _routed('get_top_movies', asynchronous=True)
+    get_random_movies = _routed('get_random_movies', asynchronous=True)
+    get_similar_movies = _routed('get_similar_movies', asynchronous=True)
+    get_ratings_distribution = _routed('get_ratings_distribution', asynchronous=True)
@@ -0,0 +1,128 @@
+"""
+tirage aleatoire de films par cle aleatoire indexee
+chaque document de movies_complete porte un champ rand (uniforme dans [0, 1), pose par
+$rand a la construction); un tirage choisit un point au hasard et lit les documents
+suivants dans l'index, avec ou sans filtre (genre, note minimale), sans $sample ni parcours
+un pool pre-tire sert la page d'accueil sans lecture en base a chaque affichage
+sans dependance a django: importable depuis scripts/import_from_sqlite.py
+"""
+
+import random
+import threading
+import time
+
+
+RAND_FIELD = 'rand'
+
+# champs renvoyes par un tirage (ceux de la carte film de la page d'accueil)
+SAMPLE_PROJECTION = {'_id': 1, 'title': 1, 'year': 1}
+
+
+def sample_match(genre=None, min_rating=None):
+    """filtre mongodb d'un tirage (l'egalite sur le genre precede rand dans l'index)"""
+    match = {}
+    if genre:
+        match['genres'] = genre
+    if min_rating is not None:
+        match['rating'] = {'$gte': min_rating}
+    return match
+
+
+def sample_queries(genre=None, min_rating=None, point=None):
+    """
+    filtres d'un tirage: depuis un point aleatoire vers la fin de l'index rand,
+    puis depuis le debut si la fin ne suffit pas (a lire tries par rand croissant)
+    """
+    point = random.random() if point is None else point
+    match = sample_match(genre, min_rating)
+    return [
+        {**match, RAND_FIELD: {'$gte': point}},
+        {**match, RAND_FIELD: {'$lt': point}},
+    ]
+
+
+def sample_cursor(collection, query, limit):
+    """lecture d'un intervalle de l'index rand (collection pymongo sync ou async)"""
+    return collection.find(query, SAMPLE_PROJECTION).sort(RAND_FIELD, 1).limit(limit)
+
+
+def draw_sample(collection, limit, genre=None, min_rating=None):
+    """
+    tire jusqu'a limit films au hasard (au plus deux recherches d'intervalle sur l'index)
+
+    returns:
+        liste de documents {_id, title, year} (vide si la collection n'a pas de champ rand)
+    """
+    docs = []
+    for query in sample_queries(genre, min_rating):
+        remaining = limit - len(docs)
+        if remaining <= 0:
+            break
+        docs.extend(sample_cursor(collection, query, remaining))
+    return docs
+
+
+def assign_random_keys(collection, redraw=False):
+    """
+    pose une cle rand sur les documents qui n'en ont pas (ou sur tous avec redraw)
+
+    returns:
+        nombre de documents modifies
+    """
+    query = {} if redraw else {RAND_FIELD: {'$exists': False}}
+    result = collection.update_many(query, [{'$set': {RAND_FIELD: {'$rand': {}}}}])
+    return result.modified_count
+
+
+class SamplePool:
+    """
+    films pre-tires servis par tranches successives
+
+    un seul tirage de size films alimente size / limit affichages; le pool est retire
+    quand il est epuise, trop ancien ou quand le jeu de donnees change de version
+    """
+
+    def __init__(self, size=120, ttl=300):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = []
+        self._position = 0
+        self._version = None
+        self._expires_at = 0.0
+        self.stats = {'served': 0, 'refills': 0}
+
+    def take(self, limit, version):
+        """
+        prochaine tranche de limit films
+
+        returns:
+            liste de films, ou None si le pool doit etre retire (appeler fill)
+        """
+        with self._lock:
+            stale = version != self._version or time.monotonic() >= self._expires_at
+            if stale or self._position + limit > len(self._items):
+                return None
+            items = self._items[self._position:self._position + limit]
+            self._position += limit
+            self.stats['served'] += 1
+            return items
+
+    def fill(self, items, version, limit):
+        """remplace le contenu du pool et renvoie sa premiere tranche"""
+        items = list(items)
+        random.shuffle(items)
+        with self._lock:
+            self._items = items
+            self._position = min(limit, len(items))
+            self._version = version
+            self._expires_at = time.monotonic() + self.ttl
+            self.stats['refills'] += 1
+            self.stats['served'] += 1
+        return items[:limit]
+
+    def clear(self):
+        """vide le pool (le prochain affichage retire)"""
+        with self._lock:
+            self._items = []
+            self._position = 0
@@ -0,0 +1,181 @@
+"""
+index plein texte fts5 (tokenizer trigram) pour la recherche de films et de personnes
+construit dans data/imdb.db a cote des tables sources, puis tenu a jour par des triggers
+(insertion, modification, suppression) sur ces tables
+
+l'index pointe sur le rowid implicite des tables sources (cle primaire TEXT, pas de colonne
+entiere stable): un VACUUM peut renumeroter ces rowids et desaligner l'index. chaque
+construction enregistre des couples (rowid, cle) temoins; si une cle temoin a change de
+rowid, l'index est reconstruit au passage suivant. relancer build_search_index apres un VACUUM
+"""
+
+import json
+import time
+
+
+# tables fts5 a contenu externe: l'index ne duplique pas les titres et noms
+SEARCH_TABLES = {
+    'movies_fts': {'source': 'movies', 'column': 'primaryTitle', 'key': 'mid'},
+    'persons_fts': {'source': 'persons', 'column': 'primaryName', 'key': 'pid'},
+}
+
+# couples (rowid, cle) temoins enregistres par table, repartis sur l'intervalle des rowids
+ROWID_SAMPLES = 32
+
+# longueur minimale d'une requete pour le tokenizer trigram
+MIN_QUERY_LENGTH = 3
+
+
+def fts_phrase(query):
+    """transforme une saisie utilisateur en phrase fts5 (sous-chaine avec trigram)"""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _trigger_statements(name, spec):
+    """triggers de synchronisation d'une table fts a contenu externe: {nom: corps}"""
+    source, column = spec['source'], spec['column']
+    insert = f"INSERT INTO {name}(rowid, {column}) VALUES (new.rowid, new.{column});"
+    delete = f"INSERT INTO {name}({name}, rowid, {column}) VALUES ('delete', old.rowid, old.{column});"
+    return {
+        f"{name}_ai": f"AFTER INSERT ON {source} BEGIN {insert} END",
+        f"{name}_ad": f"AFTER DELETE ON {source} BEGIN {delete} END",
+        # toute modification (titre ou rowid): l'ancienne entree est retiree avant la nouvelle
+        f"{name}_au": f"AFTER UPDATE ON {source} BEGIN {delete} {insert} END",
+    }
+
+
+def create_search_tables(conn):
+    """
+    cree les tables fts5, leurs triggers et la table de suivi si absents
+
+    returns:
+        tables fts dont un trigger manquait (index a reconstruire: les lignes ecrites
+        sans trigger, ou une table source rechargee, n'y sont pas)
+    """
+    stale = set()
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    for name, spec in SEARCH_TABLES.items():
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {name}
+            USING fts5({spec['column']}, content='{spec['source']}', content_rowid='rowid', tokenize='trigram')
+        """)
+        for trigger, body in _trigger_statements(name, spec).items():
+            if trigger not in existing:
+                conn.execute(f"CREATE TRIGGER {trigger} {body}")
+                stale.add(name)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS search_index_state (
+            name TEXT PRIMARY KEY,
+            last_rowid INTEGER NOT NULL,
+            updated_at REAL NOT NULL,
+            rowid_samples TEXT
+        )
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(search_index_state)")}
+    if 'rowid_samples' not in columns:
+        # table de suivi anterieure aux temoins: aucun temoin, index a reconstruire
+        conn.execute("ALTER TABLE search_index_state ADD COLUMN rowid_samples TEXT")
+    return stale
+
+
+def rowid_samples(conn, spec, count=ROWID_SAMPLES):
+    """couples [rowid, cle] de la table source, repartis sur l'intervalle des rowids"""
+    low, high = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {spec['source']}").fetchone()
+    if low is None:
+        return []
+    samples = {}
+    for i in range(count):
+        point = low + (high - low) * i // max(count - 1, 1)
+        row = conn.execute(
+            f"SELECT rowid, {spec['key']} FROM {spec['source']} WHERE rowid >= ? ORDER BY rowid LIMIT 1",
+            (point,)
+        ).fetchone()
+        if row is not None:
+            samples[row[0]] = row[1]
+    return [[rowid, key] for rowid, key in samples.items()]
+
+
+def renumbered(conn, spec, samples):
+    """
+    indique si une ligne temoin a change de rowid (VACUUM, table rechargee)
+
+    une ligne temoin supprimee depuis ne compte pas (retiree de l'index par trigger)
+    """
+    for rowid, key in samples:
+        row = conn.execute(f"SELECT rowid FROM {spec['source']} WHERE {spec['key']} = ?", (key,)).fetchone()
+        if row is not None and row[0] != rowid:
+            return True
+    return False
+
+
+def misaligned_tables(conn):
+    """
+    tables fts dont l'index ne correspond plus aux rowids de la table source
+
+    returns:
+        noms des tables fts a reconstruire (sans temoins ou avec un temoin renumerote)
+    """
+    create_search_tables(conn)
+    misaligned = set()
+    for name, spec in SEARCH_TABLES.items():
+        row = conn.execute("SELECT rowid_samples FROM search_index_state WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            continue
+        if row[0] is None or renumbered(conn, spec, json.loads(row[0])):
+            misaligned.add(name)
+    return misaligned
+
+
+def build_search_index(conn, rebuild=False):
+    """
+    construit l'index de recherche, ou l'optimise s'il est deja tenu a jour par les triggers
+
+    args:
+        conn: connexion sqlite en ecriture
+        rebuild: reconstruit entierement l'index meme s'il est a jour
+
+    returns:
+        dictionnaire {table fts: (lignes indexees, duree en secondes)}
+    """
+    stale = create_search_tables(conn) | misaligned_tables(conn)
+    results = {}
+
+    for name, spec in SEARCH_TABLES.items():
+        start = time.time()
+        max_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {spec['source']}").fetchone()[0]
+
+        row = conn.execute("SELECT last_rowid FROM search_index_state WHERE name = ?", (name,)).fetchone()
+        last_rowid = row[0] if row and not rebuild and name not in stale else None
+
+        if last_rowid is None:
+            # reconstruction complete depuis la table source
+            conn.execute(f"INSERT INTO {name}({name}) VALUES('rebuild')")
+            indexed = conn.execute(f"SELECT COUNT(*) FROM {spec['source']}").fetchone()[0]
+        else:
+            # lignes ajoutees, modifiees et supprimees deja reportees par les triggers:
+            # seules les lignes ajoutees depuis le dernier passage sont comptees
+            indexed = conn.execute(
+                f"SELECT COUNT(*) FROM {spec['source']} WHERE rowid > ?", (last_rowid,)
+            ).fetchone()[0]
+
+        conn.execute(f"INSERT INTO {name}({name}) VALUES('optimize')")
+        conn.execute("""
+            INSERT INTO search_index_state (name, last_rowid, updated_at, rowid_samples) VALUES (?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET last_rowid = excluded.last_rowid,
+                updated_at = excluded.updated_at, rowid_samples = excluded.rowid_samples
+        """, (name, max_rowid, time.time(), json.dumps(rowid_samples(conn, spec))))
+        conn.commit()
+
+        results[name] = (indexed, time.time() - start)
+
+    return results
+
+
+def search_index_tables(conn):
+    """noms des tables fts presentes dans la base"""
+    placeholders = ','.join('?' * len(SEARCH_TABLES))
+    rows = conn.execute(
+        f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+        tuple(SEARCH_TABLES)
+    ).fetchall()
+    return {row[0] for row in rows}
@@ -0,0 +1,333 @@
+"""
+index de similarite des films, construit hors ligne depuis sqlite et servi depuis mongodb
+chaque film est un vecteur creux de caracteristiques (realisateurs, scenaristes, genres,
+decennie) ponderees par idf; ses voisins sont les meilleurs cosinus parmi des candidats
+tires d'un index inverse plafonne (une personne ou une combinaison genres+decennie tres
+frequente ne fournit que ses films les plus votes)
+les k voisins de chaque film sont stockes dans similar_movies: une lecture par _id a l'affichage
+apres une synchronisation --delta, seuls les films touches et leurs voisins sont recalcules
+sans dependance a django ni numpy: importable depuis un script
+"""
+
+import heapq
+import math
+import sys
+import time
+from array import array
+from collections import defaultdict
+
+from pymongo import DeleteOne, ReplaceOne
+
+from .leaderboard import META_COLLECTION
+from .mongo_indexes import MONGO_INDEXES, ensure_collection_indexes
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+SIMILAR_MOVIES = 'similar_movies'
+SIMILAR_MOVIES_STAGING = 'similar_movies_staging'
+
+DEFAULT_TOP_K = 12
+DEFAULT_POSTINGS_CAP = 200
+DEFAULT_BATCH_SIZE = 5000
+
+# poids par type de caracteristique, multiplie par l'idf
+FEATURE_WEIGHTS = {
+    'd': 3.0,    # realisateur
+    'w': 2.0,    # scenariste
+    'g': 1.0,    # genre
+    'y': 0.5,    # decennie
+}
+
+# caracteristiques qui ouvrent leur propre liste de candidats
+PERSON_KINDS = ('d', 'w')
+
+
+def peak_rss_mb():
+    """pic de memoire residente du processus en mo (None si non mesurable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class SimilarityIndex:
+    """vecteurs creux des films et index inverse des candidats, en memoire"""
+
+    def __init__(self, postings_cap=DEFAULT_POSTINGS_CAP):
+        self.postings_cap = postings_cap
+        self.mids = []
+        self.titles = []
+        self.years = []
+        self.votes = array('q')
+        # par film: ids des caracteristiques (tuple trie) et norme du vecteur
+        self.features = []
+        self.norms = array('d')
+        # par caracteristique: poids (idf * type) au carre
+        self.squared_weights = array('d')
+        self.postings = {}
+
+    def load(self, conn):
+        """charge films et caracteristiques depuis la base sqlite"""
+        positions = {}
+        raw = []
+        rows = conn.execute(
+            "SELECT m.mid, m.primaryTitle, m.startYear, r.numVotes "
+            "FROM movies m LEFT JOIN ratings r ON r.mid = m.mid"
+        )
+        for mid, title, year, votes in rows:
+            positions[mid] = len(self.mids)
+            self.mids.append(mid)
+            self.titles.append(title)
+            self.years.append(year)
+            self.votes.append(votes or 0)
+            raw.append({f"y:{year // 10 * 10}"} if isinstance(year, int) else set())
+
+        sources = (
+            ('g', "SELECT mid, genre FROM genres"),
+            ('d', "SELECT mid, pid FROM directors"),
+            ('w', "SELECT mid, pid FROM writers"),
+        )
+        for kind, sql in sources:
+            for mid, value in conn.execute(sql):
+                position = positions.get(mid)
+                if position is not None and value is not None:
+                    raw[position].add(f"{kind}:{value}")
+
+        # frequence documentaire de chaque caracteristique -> idf
+        frequency = defaultdict(int)
+        for feature_set in raw:
+            for feature in feature_set:
+                frequency[feature] += 1
+
+        ids, kinds = {}, []
+        total = len(raw)
+        for feature, df in frequency.items():
+            ids[feature] = len(kinds)
+            kinds.append(feature[0])
+            weight = FEATURE_WEIGHTS[feature[0]] * math.log(1 + total / df)
+            self.squared_weights.append(weight * weight)
+
+        squared = self.squared_weights
+        for feature_set in raw:
+            features = tuple(sorted(ids[feature] for feature in feature_set))
+            self.features.append(features)
+            self.norms.append(math.sqrt(sum(squared[f] for f in features)) or 1.0)
+
+        self._build_postings(kinds)
+
+    @staticmethod
+    def _bucket(features, kinds):
+        """cle de la liste genres+decennie d'un film (None s'il n'a ni l'un ni l'autre)"""
+        key = tuple(f for f in features if kinds[f] not in PERSON_KINDS)
+        return key or None
+
+    def _build_postings(self, kinds):
+        """
+        listes de candidats: une par personne et une par combinaison genres+decennie
+
+        chaque liste ne garde que ses postings_cap films les plus votes
+        """
+        lists = defaultdict(list)
+        self.buckets = []
+        for position, features in enumerate(self.features):
+            for feature in features:
+                if kinds[feature] in PERSON_KINDS:
+                    lists[feature].append(position)
+            bucket = self._bucket(features, kinds)
+            self.buckets.append(bucket)
+            if bucket is not None:
+                lists[bucket].append(position)
+
+        votes = self.votes.__getitem__
+        for key, members in lists.items():
+            if len(members) > self.postings_cap:
+                members = heapq.nlargest(self.postings_cap, members, key=votes)
+            self.postings[key] = array('i', members)
+
+    def candidates(self, position):
+        """films qui partagent une liste de candidats avec le film (lui-meme exclu)"""
+        postings = self.postings
+        candidates = set()
+        for feature in self.features[position]:
+            candidates.update(postings.get(feature, ()))
+        candidates.update(postings.get(self.buckets[position], ()))
+        candidates.discard(position)
+        return candidates
+
+    def neighbours(self, position, top_k=DEFAULT_TOP_K):
+        """
+        meilleurs voisins d'un film
+
+        returns:
+            liste de (position, score) par score decroissant, puis votes decroissants
+        """
+        own = self.features[position]
+        if not own:
+            return []
+
+        candidates = self.candidates(position)
+        own = set(own)
+        squared = self.squared_weights
+        norm = self.norms[position]
+        scored = []
+        for other in candidates:
+            shared = own.intersection(self.features[other])
+            if shared:
+                score = sum(squared[f] for f in shared) / (norm * self.norms[other])
+                scored.append((score, self.votes[other], other))
+
+        return [(other, score) for score, _, other in heapq.nlargest(top_k, scored)]
+
+    def document(self, position, top_k=DEFAULT_TOP_K):
+        """document de similar_movies d'un film, voisins denormalises (titre, annee)"""
+        return {
+            '_id': self.mids[position],
+            'neighbours': [
+                {
+                    '_id': self.mids[other],
+                    'title': self.titles[other],
+                    'year': self.years[other],
+                    'score': round(score, 4),
+                }
+                for other, score in self.neighbours(position, top_k)
+            ],
+        }
+
+    def documents(self, top_k=DEFAULT_TOP_K):
+        """documents de similar_movies: un par film"""
+        for position in range(len(self.mids)):
+            yield self.document(position, top_k)
+
+
+def _flush(collection, batch):
+    """insere un lot et renvoie la duree de l'ecriture"""
+    start = time.perf_counter()
+    collection.insert_many(batch, ordered=False)
+    return time.perf_counter() - start
+
+
+def build_similarity(db, sqlite_conn, top_k=DEFAULT_TOP_K, postings_cap=DEFAULT_POSTINGS_CAP,
+                     batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    construit similar_movies dans une collection de travail puis la substitue a l'ancienne
+
+    args:
+        db: base mongodb cible
+        sqlite_conn: connexion a la base sqlite source
+        progress: fonction appelee avec le nombre de films traites apres chaque lot
+
+    returns:
+        rapport: nombre de films, temps par phase (s) et pic memoire (mo)
+    """
+    report = {'top_k': top_k, 'postings_cap': postings_cap}
+
+    start = time.perf_counter()
+    index = SimilarityIndex(postings_cap)
+    index.load(sqlite_conn)
+    report['movies'] = len(index.mids)
+    report['features'] = len(index.squared_weights)
+    report['load_seconds'] = time.perf_counter() - start
+
+    staging = db[SIMILAR_MOVIES_STAGING]
+    staging.drop()
+
+    # calcul des voisins et ecriture par lots; le temps d'ecriture est isole du calcul
+    start = time.perf_counter()
+    write = 0.0
+    batch, done = [], 0
+    for doc in index.documents(top_k):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            write += _flush(staging, batch)
+            done += len(batch)
+            batch = []
+            if progress is not None:
+                progress(done)
+    if batch:
+        write += _flush(staging, batch)
+        done += len(batch)
+    report['compute_seconds'] = time.perf_counter() - start - write
+    report['write_seconds'] = write
+
+    # _id est deja indexe: la lecture d'un film est une recherche par cle; l'index des
+    # voisins sert a retrouver les films a recalculer apres une synchronisation --delta
+    if done:
+        ensure_collection_indexes(staging, MONGO_INDEXES[SIMILAR_MOVIES])
+        staging.rename(SIMILAR_MOVIES, dropTarget=True)
+        # parametres repris par refresh_similarity
+        db[META_COLLECTION].replace_one(
+            {'_id': SIMILAR_MOVIES},
+            {'top_k': top_k, 'postings_cap': postings_cap, 'built_at': time.time()},
+            upsert=True
+        )
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+
+def refresh_similarity(db, sqlite_conn, mids, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    recalcule les voisins des films touches par une synchronisation incrementale
+
+    les films modifies ou supprimes, leurs candidats et les films qui les ont pour voisins
+    sont recalcules avec les parametres de la derniere construction; l'idf des autres films
+    n'est pas recalcule (build_similarity reconstruit tout l'index)
+
+    args:
+        mids: films ajoutes, modifies ou supprimes
+        batch_size: documents par bulk_write
+
+    returns:
+        nombre de films recalcules (0 si l'index n'a jamais ete construit)
+    """
+    meta = db[META_COLLECTION].find_one({'_id': SIMILAR_MOVIES})
+    if meta is None:
+        return 0
+
+    index = SimilarityIndex(meta['postings_cap'])
+    index.load(sqlite_conn)
+    positions = {mid: position for position, mid in enumerate(index.mids)}
+
+    mids = list(mids)
+    affected = set()
+    for mid in mids:
+        position = positions.get(mid)
+        if position is not None:
+            affected.add(position)
+            affected.update(index.candidates(position))
+    for start in range(0, len(mids), batch_size):
+        query = {'neighbours._id': {'$in': mids[start:start + batch_size]}}
+        for doc in db[SIMILAR_MOVIES].find(query, {'_id': 1}):
+            position = positions.get(doc['_id'])
+            if position is not None:
+                affected.add(position)
+
+    collection = db[SIMILAR_MOVIES]
+    operations = [DeleteOne({'_id': mid}) for mid in mids if mid not in positions]
+    for position in sorted(affected):
+        doc = index.document(position, meta['top_k'])
+        operations.append(ReplaceOne({'_id': doc['_id']}, doc, upsert=True))
+        if len(operations) >= batch_size:
+            collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+    return len(affected)
+
+
+def similar_query(movie_id, limit):
+    """filtre et projection de la lecture des voisins d'un film (find_one sync ou async)"""
+    return {'_id': movie_id}, {'neighbours': {'$slice': limit}}
+
+
+def similar_neighbours(doc):
+    """voisins d'un document de l'index (None si le film n'est pas dans l'index)"""
+    return None if doc is None else doc['neighbours']
+
+
+def read_similar(db, movie_id, limit):
+    """voisins precalcules d'un film (None si le film n'est pas dans l'index)"""
+    return similar_neighbours(db[SIMILAR_MOVIES].find_one(*similar_query(movie_id, limit)))
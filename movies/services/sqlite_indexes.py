@@ -0,0 +1,118 @@
+"""
+index sqlite utilises par la liste filtree des films
+chaque index se termine par mid pour servir le seek de la pagination par curseur,
+et porte les colonnes affichees pour que la lecture reste dans l'index (covering)
+"""
+
+import itertools
+import time
+
+
+# nom -> (table, colonnes)
+LISTING_INDEXES = {
+    'idx_movies_year_mid': ('movies', ('startYear', 'mid', 'primaryTitle')),
+    'idx_movies_title_mid': ('movies', ('primaryTitle', 'mid', 'startYear')),
+    'idx_ratings_rating_mid': ('ratings', ('averageRating', 'mid')),
+    'idx_genres_genre_mid': ('genres', ('genre', 'mid')),
+    'idx_genres_mid_genre': ('genres', ('mid', 'genre')),
+}
+
+# valeurs representatives pour chaque filtre de la vue
+SAMPLE_FILTERS = {
+    'year_min': 1990,
+    'year_max': 2010,
+    'rating_min': 7.0,
+}
+
+
+def existing_indexes(conn):
+    """index presents: nom -> colonnes"""
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()
+    return {
+        row[0]: tuple(info[2] for info in conn.execute(f"PRAGMA index_info({row[0]})").fetchall())
+        for row in rows
+    }
+
+
+def missing_indexes(conn):
+    """index declares absents ou dont les colonnes ont change"""
+    present = existing_indexes(conn)
+    return [
+        name for name, (table, columns) in LISTING_INDEXES.items()
+        if present.get(name) != columns
+    ]
+
+
+def create_listing_indexes(conn):
+    """cree (ou recree) les index manquants et met a jour les statistiques du planificateur"""
+    present = existing_indexes(conn)
+    created = []
+
+    for name in missing_indexes(conn):
+        table, columns = LISTING_INDEXES[name]
+        if name in present:
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute(f"CREATE INDEX {name} ON {table}({', '.join(columns)})")
+        created.append(name)
+
+    if created:
+        conn.execute("ANALYZE")
+    conn.commit()
+    return created
+
+
+def listing_combinations(genre):
+    """
+    toutes les combinaisons filtres/tri/pagination que la vue movies_list peut produire
+
+    returns:
+        generateur de (libelle, filtres, sort_by, sort_order, mode)
+        mode: 'first' (premiere page), 'cursor' (curseur sur une valeur), 'cursor-null'
+        (curseur dans les NULL) ou 'offset' (ancienne pagination page=, hors objectif de seek)
+    """
+    flags = itertools.product([False, True], repeat=4)
+    for (with_genre, with_min, with_max, with_rating) in flags:
+        filters = {}
+        label = []
+        if with_genre:
+            filters['genre'] = genre
+            label.append('genre')
+        if with_min:
+            filters.setdefault('year', {})['$gte'] = SAMPLE_FILTERS['year_min']
+            label.append('year_min')
+        if with_max:
+            filters.setdefault('year', {})['$lte'] = SAMPLE_FILTERS['year_max']
+            label.append('year_max')
+        if with_rating:
+            filters['rating'] = {'$gte': SAMPLE_FILTERS['rating_min']}
+            label.append('rating_min')
+
+        for sort_by, sort_order, mode in itertools.product(
+                ['year', 'rating', 'title'], ['desc', 'asc'], ['first', 'cursor', 'cursor-null', 'offset']):
+            name = f"{'+'.join(label) or 'aucun filtre'} | {sort_by} {sort_order} | {mode}"
+            yield name, filters, sort_by, sort_order, mode
+
+
+def explain(conn, sql, params):
+    """lignes du plan d'execution d'une requete"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def plan_problems(plan):
+    """
+    etapes couteuses d'un plan: (parcours complets sans index, tris en b-tree temporaire)
+
+    un 'SCAN ... USING INDEX' qui sert l'ordre du tri est accepte: avec LIMIT il s'arrete
+    des que la page est remplie. un tri temporaire apres un SEARCH sur un autre filtre est
+    un choix du planificateur (le filtre est plus selectif que l'ordre), il est signale a part
+    """
+    scans = [step for step in plan if step.startswith('SCAN') and 'INDEX' not in step]
+    sorts = [step for step in plan if 'TEMP B-TREE' in step]
+    return scans, sorts
+
+
+def time_query(conn, sql, params):
+    """duree d'execution en millisecondes"""
+    start = time.perf_counter()
+    conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) * 1000
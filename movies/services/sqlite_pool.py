@@ -0,0 +1,213 @@
+"""
+pool de connexions sqlite en lecture seule
+partage entre les threads d'un worker, borne, avec file d'attente fifo
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class _Waiter:
+    """thread en attente d'une connexion (servi dans l'ordre d'arrivee)"""
+
+    __slots__ = ('event', 'entry', 'may_create')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry = None
+        self.may_create = False
+
+
+class SQLitePool:
+    """pool borne de connexions sqlite read-only"""
+
+    def __init__(self, db_path, size=8, timeout=5.0, max_age=600,
+                 health_check_interval=30, mmap_size=268435456, cache_size=-65536):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.health_check_interval = health_check_interval
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.pid = os.getpid()
+
+        # connexions libres (lifo pour garder les caches chauds) et file fifo des threads en attente
+        self._idle = []
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time_ms': 0.0,
+            'timeouts': 0,
+            'recycled': 0,
+            'discarded': 0,
+        }
+
+    def _count(self, name, amount=1):
+        """incremente un compteur sous le verrou (appels hors verrou seulement)"""
+        with self._lock:
+            self._stats[name] += amount
+
+    def _connect(self):
+        """ouvre une connexion read-only et applique les pragmas une seule fois"""
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"base sqlite introuvable: {self.db_path}")
+
+        uri = f"file:{self.db_path}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA query_only = ON")
+
+        now = time.monotonic()
+        return {'conn': conn, 'created_at': now, 'checked_at': now}
+
+    def _is_healthy(self, entry):
+        """verifie l'age et la validite d'une connexion avant de la rendre"""
+        now = time.monotonic()
+        if now - entry['created_at'] > self.max_age:
+            self._count('recycled')
+            return False
+        if now - entry['checked_at'] > self.health_check_interval:
+            try:
+                entry['conn'].execute("SELECT 1").fetchone()
+            except sqlite3.Error:
+                self._count('discarded')
+                return False
+            entry['checked_at'] = now
+        return True
+
+    def _discard(self, entry):
+        """ferme une connexion et cede sa place au premier thread en attente"""
+        try:
+            entry['conn'].close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            if self._waiters and not self._closed:
+                # la place reste comptee: le thread reveille ouvrira la connexion
+                waiter = self._waiters.popleft()
+                waiter.may_create = True
+                waiter.event.set()
+            else:
+                self._created -= 1
+
+    def _create(self):
+        """ouvre une connexion pour une place deja reservee"""
+        try:
+            entry = self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        self._count('misses')
+        return entry
+
+    def _wait(self):
+        """attend qu'une connexion soit rendue (fifo, avec timeout)"""
+        start = time.perf_counter()
+        waiter = _Waiter()
+        with self._lock:
+            self._waiters.append(waiter)
+
+        waiter.event.wait(self.timeout)
+
+        with self._lock:
+            if not waiter.event.is_set():
+                self._waiters.remove(waiter)
+            self._stats['waits'] += 1
+            self._stats['wait_time_ms'] += (time.perf_counter() - start) * 1000
+            if not waiter.may_create and waiter.entry is None:
+                self._stats['timeouts'] += 1
+
+        if waiter.may_create:
+            return self._create(), True
+        if waiter.entry is None:
+            raise TimeoutError(f"aucune connexion sqlite libre apres {self.timeout}s")
+        return waiter.entry, False
+
+    def acquire(self):
+        """obtient une connexion du pool (reutilisee, creee ou attendue)"""
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("pool sqlite ferme")
+                entry = None
+                create = False
+                if self._idle and not self._waiters:
+                    entry = self._idle.pop()
+                elif self._created < self.size:
+                    self._created += 1
+                    create = True
+
+            if create:
+                return self._create()
+
+            if entry is None:
+                entry, created = self._wait()
+                if created:
+                    return entry
+
+            if self._is_healthy(entry):
+                self._count('hits')
+                return entry
+            self._discard(entry)
+
+    def release(self, entry, broken=False):
+        """rend une connexion au pool (directement au premier thread en attente)"""
+        if broken or self._closed:
+            self._discard(entry)
+            return
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.entry = entry
+                waiter.event.set()
+                return
+            self._idle.append(entry)
+
+    @contextmanager
+    def connection(self):
+        """context manager: emprunte une connexion et la rend en sortie"""
+        entry = self.acquire()
+        broken = False
+        try:
+            yield entry['conn']
+        except (sqlite3.InterfaceError, sqlite3.ProgrammingError):
+            broken = True
+            raise
+        finally:
+            self.release(entry, broken=broken)
+
+    def stats(self):
+        """compteurs du pool"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open'] = self._created
+            stats['idle'] = len(self._idle)
+            stats['waiting'] = len(self._waiters)
+        stats['size'] = self.size
+        total = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / total, 4) if total else None
+        stats['wait_time_ms'] = round(stats['wait_time_ms'], 3)
+        return stats
+
+    def close(self):
+        """ferme toutes les connexions inactives"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._discard(entry)
@@ -3,9 +3,23 @@ service d'acces aux donnees sqlite
 gere la connexion a la base sqlite et les requetes
 """
 
-import sqlite3
+import base64
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
+from django.conf import settings
+
+from .cache import cached
+from .leaderboard import configured_min_votes
+from .search_index import MIN_QUERY_LENGTH, fts_phrase, search_index_tables
+from .sqlite_pool import SQLitePool
+from .stats_tables import STATS_TABLES, rating_bucket_label, row_counts, stats_tables
+
 
 class SQLiteService:
     """service de connexion et requetes sqlite"""
@@ -13,21 +27,80 @@ class SQLiteService:
     # chemin vers la base sqlite locale
     DB_PATH = Path(__file__).resolve().parent.parent.parent / 'data' / 'imdb.db'
 
+    # tri autorise pour la liste (parametre get -> colonne sql)
+    # (colonne, departage) par tri; pour la note, r.mid permet de partir de l'index des ratings
+    SORT_COLUMNS = {
+        'year': ('m.startYear', 'm.mid'),
+        'rating': ('r.averageRating', 'r.mid'),
+        'title': ('m.primaryTitle', 'm.mid'),
+    }
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    # tables fts presentes (relu periodiquement pour voir un index construit a chaud)
+    _search_tables = None
+    _search_tables_checked_at = 0.0
+    SEARCH_INDEX_CHECK_INTERVAL = 60
+
+    # tables de synthese presentes (meme intervalle de relecture)
+    _stats_tables = None
+    _stats_tables_checked_at = 0.0
+
+    @classmethod
+    def get_pool(cls):
+        """obtient ou cree le pool de connexions (un par processus)"""
+        pool = cls._pool
+        if pool is None or pool.pid != os.getpid():
+            with cls._pool_lock:
+                pool = cls._pool
+                if pool is None or pool.pid != os.getpid():
+                    sqlite_settings = getattr(settings, 'SQLITE_SETTINGS', {}) if settings.configured else {}
+                    pool = SQLitePool(
+                        str(cls.DB_PATH),
+                        size=sqlite_settings.get('pool_size', 8),
+                        timeout=sqlite_settings.get('pool_timeout', 5.0),
+                        max_age=sqlite_settings.get('max_age', 600),
+                        mmap_size=sqlite_settings.get('mmap_size', 268435456),
+                        cache_size=sqlite_settings.get('cache_size', -65536),
+                    )
+                    cls._pool = pool
+        return pool
+
     @classmethod
     def get_connection(cls):
-        """obtient une connexion a la base sqlite"""
-        if not cls.DB_PATH.exists():
-            raise FileNotFoundError(f"base sqlite introuvable: {cls.DB_PATH}")
-        return sqlite3.connect(str(cls.DB_PATH))
+        """obtient une connexion read-only hors pool (l'appelant la ferme)"""
+        return cls.get_pool()._connect()['conn']
+
+    @classmethod
+    @contextmanager
+    def connection(cls):
+        """emprunte une connexion au pool pour la duree du bloc with"""
+        with cls.get_pool().connection() as conn:
+            yield conn
+
+    @classmethod
+    def get_pool_stats(cls):
+        """compteurs du pool (hits, misses, attentes)"""
+        if cls._pool is None:
+            return None
+        return cls._pool.stats()
+
+    @classmethod
+    def close_pool(cls):
+        """ferme le pool de connexions"""
+        if cls._pool is not None:
+            cls._pool.close()
+            cls._pool = None
+        cls._search_tables = None
+        cls._stats_tables = None
 
     @classmethod
     def test_connection(cls):
         """teste la connexion a la base sqlite"""
         try:
-            conn = cls.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            conn.close()
+            with cls.connection() as conn:
+                conn.execute("SELECT 1")
             return True, "connexion reussie"
         except FileNotFoundError as e:
             return False, str(e)
@@ -35,31 +108,23 @@ class SQLiteService:
             return False, f"erreur: {str(e)}"
 
     @classmethod
-    def get_statistics(cls):
-        """obtient des statistiques sur les donnees"""
+    def get_statistics(cls, exact=False):
+        """
+        obtient des statistiques sur les donnees
+
+        args:
+            exact: compte chaque table au lieu de lire le releve fait a l'import
+        """
         try:
-            conn = cls.get_connection()
-            cursor = conn.cursor()
+            with cls.connection() as conn:
+                tables, counted = row_counts(conn, exact)
 
-            stats = {
-                'tables': {},
-                'total_rows': 0
+            return {
+                'tables': tables,
+                'total_rows': sum(tables.values()),
+                'exact': counted
             }
 
-            # liste des tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
-
-            # compte les lignes par table
-            for table in tables:
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                count = cursor.fetchone()[0]
-                stats['tables'][table] = count
-                stats['total_rows'] += count
-
-            conn.close()
-            return stats
-
         except Exception as e:
             return {'error': str(e)}
 
@@ -67,25 +132,21 @@ class SQLiteService:
     def get_movies(cls, limit=100, offset=0):
         """obtient une liste de films"""
         try:
-            conn = cls.get_connection()
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            with cls.connection() as conn:
+                cursor = conn.cursor()
 
-            query = """
-                SELECT movie_id, title, year, rating
-                FROM movies
-                ORDER BY year DESC
-                LIMIT ? OFFSET ?
-            """
+                query = """
+                    SELECT movie_id, title, year, rating
+                    FROM movies
+                    ORDER BY year DESC
+                    LIMIT ? OFFSET ?
+                """
 
-            cursor.execute(query, (limit, offset))
-            rows = cursor.fetchall()
+                cursor.execute(query, (limit, offset))
+                rows = cursor.fetchall()
 
             # convertit en liste de dictionnaires
-            movies = [dict(row) for row in rows]
-
-            conn.close()
-            return movies
+            return [dict(row) for row in rows]
 
         except Exception as e:
             return {'error': str(e)}
@@ -94,257 +155,552 @@ class SQLiteService:
     def get_movie_by_id(cls, movie_id):
         """obtient un film par son id"""
         try:
-            conn = cls.get_connection()
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            with cls.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute("""
-                SELECT movie_id, title, year, rating
-                FROM movies
-                WHERE movie_id = ?
-            """, (movie_id,))
+                cursor.execute("""
+                    SELECT movie_id, title, year, rating
+                    FROM movies
+                    WHERE movie_id = ?
+                """, (movie_id,))
 
-            row = cursor.fetchone()
-            movie = dict(row) if row else None
+                row = cursor.fetchone()
 
-            conn.close()
-            return movie
+            return dict(row) if row else None
 
         except Exception as e:
             return {'error': str(e)}
 
+    @classmethod
+    def get_movie_document(cls, movie_id):
+        """film au format d'un document movies_complete (chemin degrade sans mongodb)"""
+        try:
+            with cls.connection() as conn:
+                row = conn.execute("""
+                    SELECT m.mid, m.titleType, m.primaryTitle, m.originalTitle, m.isAdult, m.startYear,
+                           m.endYear, m.runtimeMinutes, r.averageRating, r.numVotes
+                    FROM movies m
+                    LEFT JOIN ratings r ON r.mid = m.mid
+                    WHERE m.mid = ?
+                """, (movie_id,)).fetchone()
+                if row is None:
+                    return None
+
+                movie = {
+                    '_id': row['mid'],
+                    'titleType': row['titleType'],
+                    'title': row['primaryTitle'],
+                    'originalTitle': row['originalTitle'],
+                    'isAdult': row['isAdult'],
+                    'year': row['startYear'],
+                    'endYear': row['endYear'],
+                    'runtimeMinutes': row['runtimeMinutes'],
+                    'rating': row['averageRating'],
+                    'numVotes': row['numVotes'],
+                    'genres': [r[0] for r in conn.execute("SELECT genre FROM genres WHERE mid = ?", (movie_id,))],
+                }
+                for role in ('directors', 'writers'):
+                    movie[role] = [
+                        {'pid': r[0], 'name': r[1]}
+                        for r in conn.execute(f"""
+                            SELECT x.pid, p.primaryName FROM {role} x
+                            LEFT JOIN persons p ON p.pid = x.pid
+                            WHERE x.mid = ?
+                        """, (movie_id,))
+                    ]
+            return movie
+
+        except Exception as e:
+            return None
+
+    @classmethod
+    def has_search_index(cls, table):
+        """indique si la table fts donnee existe dans la base"""
+        now = time.monotonic()
+        if cls._search_tables is None or now - cls._search_tables_checked_at > cls.SEARCH_INDEX_CHECK_INTERVAL:
+            with cls.connection() as conn:
+                cls._search_tables = search_index_tables(conn)
+            cls._search_tables_checked_at = now
+        return table in cls._search_tables
+
+    @classmethod
+    def has_stats_table(cls, table):
+        """indique si la table de synthese donnee est construite (False si la base est injoignable)"""
+        now = time.monotonic()
+        if cls._stats_tables is None or now - cls._stats_tables_checked_at > cls.SEARCH_INDEX_CHECK_INTERVAL:
+            try:
+                with cls.connection() as conn:
+                    cls._stats_tables = stats_tables(conn)
+            except Exception:
+                return False
+            cls._stats_tables_checked_at = now
+        return table in cls._stats_tables
+
+    @classmethod
+    def _summary(cls, table, order_by, limit=-1):
+        """
+        lignes d'une table de synthese, ou de son aggregation en direct si elle n'est pas construite
+
+        order_by porte sur les positions des colonnes (communes a la table et a la requete)
+        """
+        source = table if cls.has_stats_table(table) else f"({STATS_TABLES[table]['query']})"
+        with cls.connection() as conn:
+            return conn.execute(f"SELECT * FROM {source} ORDER BY {order_by} LIMIT ?", (limit,)).fetchall()
+
     @classmethod
     def search_movies(cls, query, limit=50):
-        """recherche des films par titre"""
+        """recherche des films par titre (index fts5 si disponible, sinon LIKE)"""
         try:
-            conn = cls.get_connection()
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                SELECT m.mid, m.primaryTitle as title, m.startYear as year, r.averageRating as rating
-                FROM movies m
-                LEFT JOIN ratings r ON m.mid = r.mid
-                WHERE m.primaryTitle LIKE ?
-                LIMIT ?
-            """, (f'%{query}%', limit))
-
-            rows = cursor.fetchall()
-            movies = [dict(row) for row in rows]
-
-            conn.close()
-            return movies
+            if len(query) >= MIN_QUERY_LENGTH and cls.has_search_index('movies_fts'):
+                with cls.connection() as conn:
+                    cursor = conn.cursor()
+
+                    # candidats classes par bm25, departages par popularite
+                    cursor.execute("""
+                        SELECT m.mid, m.primaryTitle as title, m.startYear as year, r.averageRating as rating
+                        FROM (
+                            SELECT rowid, rank FROM movies_fts
+                            WHERE movies_fts MATCH ?
+                            ORDER BY rank
+                            LIMIT ?
+                        ) f
+                        JOIN movies m ON m.rowid = f.rowid
+                        LEFT JOIN ratings r ON m.mid = r.mid
+                        ORDER BY f.rank, COALESCE(r.numVotes, 0) DESC
+                        LIMIT ?
+                    """, (fts_phrase(query), limit * 10, limit))
+
+                    return [dict(row) for row in cursor.fetchall()]
+
+            with cls.connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("""
+                    SELECT m.mid, m.primaryTitle as title, m.startYear as year, r.averageRating as rating
+                    FROM movies m
+                    LEFT JOIN ratings r ON m.mid = r.mid
+                    WHERE m.primaryTitle LIKE ?
+                    LIMIT ?
+                """, (f'%{query}%', limit))
+
+                return [dict(row) for row in cursor.fetchall()]
 
         except Exception as e:
             return []
 
     @classmethod
+    @cached(ttl=3600)
     def get_top_movies(cls, limit=20):
-        """obtient les films les mieux notes"""
+        """films les mieux notes (seuil de votes et tri du classement mongodb top_rated)"""
         try:
-            conn = cls.get_connection()
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                SELECT m.mid, m.primaryTitle as title, m.startYear as year, r.averageRating as rating
-                FROM movies m
-                JOIN ratings r ON m.mid = r.mid
-                WHERE r.averageRating IS NOT NULL
-                ORDER BY r.averageRating DESC
-                LIMIT ?
-            """, (limit,))
-
-            rows = cursor.fetchall()
-            movies = [dict(row) for row in rows]
-
-            conn.close()
-            return movies
+            with cls.connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("""
+                    SELECT m.mid, m.primaryTitle as title, m.startYear as year,
+                           r.averageRating as rating, r.numVotes
+                    FROM ratings r
+                    JOIN movies m ON m.mid = r.mid
+                    WHERE r.averageRating IS NOT NULL AND r.numVotes >= ?
+                    ORDER BY r.averageRating DESC, r.numVotes DESC, r.mid
+                    LIMIT ?
+                """, (configured_min_votes(), limit))
+
+                return [dict(row) for row in cursor.fetchall()]
 
         except Exception as e:
             return {'error': str(e)}
 
+    @classmethod
+    def get_random_movies(cls, limit=6, genre=None, min_rating=None):
+        """films aleatoires, eventuellement filtres (genre, note minimale)"""
+        try:
+            with cls.connection() as conn:
+                if not genre and min_rating is None:
+                    # rowids tires au hasard: une recherche par cle chacun, sans tri de la table
+                    # (le double de la limite couvre les rowids supprimes)
+                    last = conn.execute("SELECT MAX(rowid) FROM movies").fetchone()[0] or 0
+                    rowids = random.sample(range(1, last + 1), min(last, limit * 2))
+                    placeholders = ','.join('?' * len(rowids))
+                    rows = conn.execute(f"""
+                        SELECT mid, primaryTitle as title, startYear as year
+                        FROM movies WHERE rowid IN ({placeholders})
+                    """, rowids).fetchall()
+                    movies = [dict(row) for row in rows]
+                    random.shuffle(movies)
+                    return movies[:limit]
+
+                # un film par point tire: premier film filtre a partir d'un rowid au hasard
+                # (recherche sur la cle primaire, cross join pour garder movies en table
+                # externe), depuis le debut si la fin de la table n'en contient pas
+                joins = []
+                params = []
+                if genre:
+                    joins.append("CROSS JOIN genres g ON g.mid = m.mid AND g.genre = ?")
+                    params.append(genre)
+                if min_rating is not None:
+                    joins.append("CROSS JOIN ratings r ON r.mid = m.mid AND r.averageRating >= ?")
+                    params.append(min_rating)
+                query = f"""
+                    SELECT m.mid, m.primaryTitle as title, m.startYear as year
+                    FROM movies m
+                    {' '.join(joins)}
+                    WHERE m.rowid >= ?
+                    ORDER BY m.rowid
+                    LIMIT 1
+                """
+
+                last = conn.execute("SELECT MAX(rowid) FROM movies").fetchone()[0] or 0
+                movies = {}
+                for _ in range(limit * 2):
+                    if len(movies) >= limit:
+                        break
+                    row = conn.execute(query, params + [random.randint(1, last)]).fetchone() if last else None
+                    if row is None:
+                        row = conn.execute(query, params + [0]).fetchone()
+                        if row is None:
+                            # aucun film ne passe le filtre
+                            break
+                    movies[row['mid']] = dict(row)
+                return list(movies.values())
+
+        except Exception as e:
+            return []
+
+    @classmethod
+    def get_similar_movies(cls, movie_id, limit=6):
+        """films partageant le plus de genres avec le film donne, departages par popularite"""
+        try:
+            with cls.connection() as conn:
+                rows = conn.execute("""
+                    SELECT m.mid, m.primaryTitle as title, m.startYear as year
+                    FROM genres g
+                    JOIN genres o ON o.genre = g.genre AND o.mid != g.mid
+                    JOIN movies m ON m.mid = o.mid
+                    LEFT JOIN ratings r ON r.mid = o.mid
+                    WHERE g.mid = ?
+                    GROUP BY o.mid
+                    ORDER BY COUNT(*) DESC, COALESCE(r.numVotes, 0) DESC
+                    LIMIT ?
+                """, (movie_id, limit)).fetchall()
+                return [dict(row) for row in rows]
+
+        except Exception as e:
+            return []
+
     @classmethod
     def get_movie_with_details(cls, movie_id):
         """obtient un film avec ses acteurs, realisateurs et genres"""
         try:
-            conn = cls.get_connection()
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            # film
-            cursor.execute("""
-                SELECT movie_id, title, year, rating
-                FROM movies
-                WHERE movie_id = ?
-            """, (movie_id,))
-
-            movie_row = cursor.fetchone()
-            if not movie_row:
-                conn.close()
-                return None
-
-            movie = dict(movie_row)
-
-            # acteurs
-            cursor.execute("""
-                SELECT a.actor_id, a.name
-                FROM actors a
-                JOIN movie_actors ma ON a.actor_id = ma.actor_id
-                WHERE ma.movie_id = ?
-            """, (movie_id,))
-            movie['actors'] = [dict(row) for row in cursor.fetchall()]
-
-            # realisateurs
-            cursor.execute("""
-                SELECT d.director_id, d.name
-                FROM directors d
-                JOIN movie_directors md ON d.director_id = md.director_id
-                WHERE md.movie_id = ?
-            """, (movie_id,))
-            movie['directors'] = [dict(row) for row in cursor.fetchall()]
-
-            # genres
-            cursor.execute("""
-                SELECT g.genre_id, g.name
-                FROM genres g
-                JOIN movie_genres mg ON g.genre_id = mg.genre_id
-                WHERE mg.movie_id = ?
-            """, (movie_id,))
-            movie['genres'] = [dict(row) for row in cursor.fetchall()]
-
-            conn.close()
+            with cls.connection() as conn:
+                cursor = conn.cursor()
+
+                # film
+                cursor.execute("""
+                    SELECT movie_id, title, year, rating
+                    FROM movies
+                    WHERE movie_id = ?
+                """, (movie_id,))
+
+                movie_row = cursor.fetchone()
+                if not movie_row:
+                    return None
+
+                movie = dict(movie_row)
+
+                # acteurs
+                cursor.execute("""
+                    SELECT a.actor_id, a.name
+                    FROM actors a
+                    JOIN movie_actors ma ON a.actor_id = ma.actor_id
+                    WHERE ma.movie_id = ?
+                """, (movie_id,))
+                movie['actors'] = [dict(row) for row in cursor.fetchall()]
+
+                # realisateurs
+                cursor.execute("""
+                    SELECT d.director_id, d.name
+                    FROM directors d
+                    JOIN movie_directors md ON d.director_id = md.director_id
+                    WHERE md.movie_id = ?
+                """, (movie_id,))
+                movie['directors'] = [dict(row) for row in cursor.fetchall()]
+
+                # genres
+                cursor.execute("""
+                    SELECT g.genre_id, g.name
+                    FROM genres g
+                    JOIN movie_genres mg ON g.genre_id = mg.genre_id
+                    WHERE mg.movie_id = ?
+                """, (movie_id,))
+                movie['genres'] = [dict(row) for row in cursor.fetchall()]
+
             return movie
 
         except Exception as e:
             return {'error': str(e)}
 
+    @staticmethod
+    def encode_cursor(movie, sort_by='year', direction='next'):
+        """curseur opaque (valeur de tri, mid) d'une ligne de la liste"""
+        sort_by = sort_by if sort_by in SQLiteService.SORT_COLUMNS else 'year'
+        payload = json.dumps([movie.get(sort_by), movie['mid'], direction], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """decode un curseur: (valeur de tri, mid, direction) ou None si invalide"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            value, mid, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError):
+            return None
+        if not isinstance(mid, str) or direction not in ('next', 'prev'):
+            return None
+        return value, mid, direction
+
     @classmethod
-    def get_movies_filtered(cls, filters, sort_by='year', sort_order='desc', limit=20, offset=0):
-        """liste films avec filtres dynamiques"""
+    def build_filtered_query(cls, filters, sort_by='year', sort_order='desc', limit=20, offset=0, cursor=None):
+        """
+        construit la liste filtree: ([(sql, params), ...], lignes a inverser)
+
+        hors pagination par offset, l'ordre de tri est decoupe en segments (valeurs non NULL
+        puis NULL en DESC, l'inverse en ASC) executes dans l'ordre: chacun est un seek sur un
+        index (colonne de tri, mid), sans OR sur IS NULL qui forcerait un parcours complet
+        """
+        query = "SELECT m.mid, m.primaryTitle as title, m.startYear as year, r.averageRating as rating FROM movies m LEFT JOIN ratings r ON m.mid = r.mid"
+        where_clauses = []
+        params = []
+
+        if 'genre' in filters and filters['genre']:
+            query += " JOIN genres g ON m.mid = g.mid"
+            where_clauses.append("g.genre = ?")
+            params.append(filters['genre'])
+
+        if 'year' in filters:
+            if '$gte' in filters['year']:
+                where_clauses.append("m.startYear >= ?")
+                params.append(filters['year']['$gte'])
+            if '$lte' in filters['year']:
+                where_clauses.append("m.startYear <= ?")
+                params.append(filters['year']['$lte'])
+
+        if 'rating' in filters and '$gte' in filters['rating']:
+            where_clauses.append("r.averageRating >= ?")
+            params.append(filters['rating']['$gte'])
+
+        # colonne de tri en liste blanche, mid pour departager les egalites
+        column, tiebreak = cls.SORT_COLUMNS.get(sort_by, cls.SORT_COLUMNS['year'])
+        descending = sort_order != 'asc'
+
+        def segment(extra_clauses, extra_params, order_by, segment_limit, segment_offset=None):
+            clauses = where_clauses + extra_clauses
+            sql = query
+            if clauses:
+                sql += " WHERE " + " AND ".join(clauses)
+            sql += f" ORDER BY {order_by} LIMIT ?"
+            segment_params = params + extra_params + [segment_limit]
+            if segment_offset is not None:
+                sql += " OFFSET ?"
+                segment_params.append(segment_offset)
+            return sql, segment_params
+
+        if cursor is None and offset:
+            # compatibilite page=: offset sur l'ordre complet
+            order = 'DESC' if descending else 'ASC'
+            return [segment([], [], f"{column} {order}, m.mid {order}", limit, offset)], False
+
+        reverse = cursor is not None and cursor[2] == 'prev'
+        if reverse:
+            # page precedente: parcours inverse puis remise dans l'ordre
+            descending = not descending
+
+        order = 'DESC' if descending else 'ASC'
+        op = '<' if descending else '>'
+        not_null_order = f"{column} {order}, {tiebreak} {order}"
+        null_order = f"m.mid {order}"
+
+        if cursor is None:
+            # premiere page: les deux segments depuis le debut
+            not_null = segment([f"{column} IS NOT NULL"], [], not_null_order, limit)
+            null = segment([f"{column} IS NULL"], [], null_order, limit)
+            segments = [not_null, null] if descending else [null, not_null]
+        elif cursor[0] is None:
+            # curseur dans le segment NULL
+            segments = [segment([f"{column} IS NULL", f"m.mid {op} ?"], [cursor[1]], null_order, limit)]
+            if not descending:
+                segments.append(segment([f"{column} IS NOT NULL"], [], not_null_order, limit))
+        else:
+            # curseur dans le segment non NULL
+            value, mid = cursor[0], cursor[1]
+            segments = [segment(
+                [f"{column} {op}= ?", f"({column} {op} ? OR {tiebreak} {op} ?)"],
+                [value, value, mid], not_null_order, limit
+            )]
+            if descending:
+                segments.append(segment([f"{column} IS NULL"], [], null_order, limit))
+
+        return segments, reverse
+
+    @classmethod
+    def get_movies_filtered(cls, filters, sort_by='year', sort_order='desc', limit=20, offset=0, cursor=None):
+        """liste films avec filtres dynamiques (pagination par offset ou par curseur)"""
         try:
-            conn = cls.get_connection()
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            # construire query dynamiquement
-            query = "SELECT m.mid, m.primaryTitle as title, m.startYear as year, r.averageRating as rating FROM movies m LEFT JOIN ratings r ON m.mid = r.mid"
-            where_clauses = []
-            params = []
-
-            if 'genre' in filters and filters['genre']:
-                query += " JOIN genres g ON m.mid = g.mid"
-                where_clauses.append("g.genre = ?")
-                params.append(filters['genre'])
-
-            if 'year' in filters:
-                if '$gte' in filters['year']:
-                    where_clauses.append("m.startYear >= ?")
-                    params.append(filters['year']['$gte'])
-                if '$lte' in filters['year']:
-                    where_clauses.append("m.startYear <= ?")
-                    params.append(filters['year']['$lte'])
-
-            if 'rating' in filters and '$gte' in filters['rating']:
-                where_clauses.append("r.averageRating >= ?")
-                params.append(filters['rating']['$gte'])
-
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
-
-            # tri
-            order = 'ASC' if sort_order == 'asc' else 'DESC'
-            query += f" ORDER BY {sort_by} {order} LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
-
-            cursor.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+            if isinstance(cursor, str):
+                cursor = cls.decode_cursor(cursor)
+
+            segments, reverse = cls.build_filtered_query(
+                filters, sort_by, sort_order, limit, offset, cursor
+            )
+
+            movies = []
+            with cls.connection() as conn:
+                cursor = conn.cursor()
+                for query, params in segments:
+                    if movies:
+                        # le segment suivant ne complete que les lignes manquantes
+                        params[-1] = limit - len(movies)
+                    cursor.execute(query, params)
+                    movies.extend(dict(row) for row in cursor.fetchall())
+                    if len(movies) >= limit:
+                        break
+
+            if reverse:
+                movies.reverse()
+            return movies
 
         except Exception as e:
             return []
 
     @classmethod
+    @cached(ttl=86400)
     def get_genres(cls):
         """liste des genres"""
         try:
-            conn = cls.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT DISTINCT genre FROM genres ORDER BY genre")
-            return [row[0] for row in cursor.fetchall()]
+            with cls.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT DISTINCT genre FROM genres ORDER BY genre")
+                return [row[0] for row in cursor.fetchall()]
         except Exception as e:
             return []
 
     @classmethod
+    @cached(ttl=3600)
     def get_stats_by_genre(cls):
         """nombre films par genre (top 15)"""
         try:
-            conn = cls.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT genre, COUNT(*) as count
-                FROM genres
-                GROUP BY genre
-                ORDER BY count DESC
-                LIMIT 15
-            """)
-            return [{'label': row[0], 'value': row[1]} for row in cursor.fetchall()]
+            rows = cls._summary('stats_genre', '2 DESC, 1', 15)
+            return [{'label': row[0], 'value': row[1]} for row in rows]
         except Exception as e:
             return []
 
     @classmethod
+    @cached(ttl=3600)
     def get_stats_by_decade(cls):
         """nombre films par decennie"""
         try:
-            conn = cls.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT (startYear / 10) * 10 as decade, COUNT(*) as count
-                FROM movies
-                WHERE startYear IS NOT NULL
-                GROUP BY decade
-                ORDER BY decade
-            """)
-            return [{'label': f"{int(row[0])}s", 'value': row[1]} for row in cursor.fetchall()]
+            rows = cls._summary('stats_decade', '1')
+            return [{'label': f"{int(row[0])}s", 'value': row[1]} for row in rows]
         except Exception as e:
             return []
 
     @classmethod
+    @cached(ttl=3600)
     def get_top_actors(cls, limit=10):
         """realisateurs les plus prolifiques"""
         try:
-            conn = cls.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT p.primaryName, COUNT(*) as count
-                FROM persons p
-                JOIN directors d ON p.pid = d.pid
-                GROUP BY p.pid
-                ORDER BY count DESC
-                LIMIT ?
-            """, (limit,))
-            return [{'label': row[0], 'value': row[1]} for row in cursor.fetchall()]
+            rows = cls._summary('stats_directors', '3 DESC, 1', limit)
+            return [{'label': row[1], 'value': row[2]} for row in rows]
         except Exception as e:
             return []
 
+    @classmethod
+    @cached(ttl=3600)
+    def get_ratings_distribution(cls):
+        """distribution des notes (memes tranches que MongoService.get_ratings_distribution)"""
+        try:
+            rows = cls._summary('stats_rating', '1')
+            return [{'label': rating_bucket_label(row[0]), 'value': row[1]} for row in rows]
+        except Exception as e:
+            return []
+
+    @classmethod
+    @cached(ttl=3600)
+    def get_stats_by_genre_decade(cls, genres=6):
+        """films par decennie pour les genres les plus frequents (une serie par genre)"""
+        try:
+            top = [row[0] for row in cls._summary('stats_genre', '2 DESC, 1', genres)]
+            rows = cls._summary('stats_genre_decade', '2, 1')
+            decades = sorted({row[1] for row in rows})
+            counts = {(row[0], row[1]): row[2] for row in rows}
+            return {
+                'labels': [f"{decade}s" for decade in decades],
+                'series': [
+                    {'label': genre, 'values': [counts.get((genre, decade), 0) for decade in decades]}
+                    for genre in top
+                ],
+            }
+        except Exception as e:
+            return {'labels': [], 'series': []}
+
+    @classmethod
+    @cached(ttl=3600)
+    def get_ratings_by_genre(cls, genres=10):
+        """distribution des notes des genres les plus frequents (une serie par tranche)"""
+        try:
+            top = [row[0] for row in cls._summary('stats_genre', '2 DESC, 1', genres)]
+            rows = cls._summary('stats_genre_rating', '1, 2')
+            buckets = sorted({row[1] for row in rows})
+            counts = {(row[0], row[1]): row[2] for row in rows}
+            return {
+                'labels': top,
+                'series': [
+                    {'label': rating_bucket_label(bucket), 'values': [counts.get((genre, bucket), 0) for genre in top]}
+                    for bucket in buckets
+                ],
+            }
+        except Exception as e:
+            return {'labels': [], 'series': []}
+
     @classmethod
     def search_persons(cls, query, limit=10):
-        """recherche realisateurs et scenarists"""
+        """recherche realisateurs et scenarists (index fts5 si disponible, sinon LIKE)"""
         try:
-            conn = cls.get_connection()
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                SELECT p.pid, p.primaryName as name, COUNT(DISTINCT d.mid) as movie_count
-                FROM persons p
-                LEFT JOIN directors d ON p.pid = d.pid
-                WHERE p.primaryName LIKE ?
-                GROUP BY p.pid
-                ORDER BY movie_count DESC
-                LIMIT ?
-            """, (f'%{query}%', limit))
-
-            return [dict(row) for row in cursor.fetchall()]
+            if len(query) >= MIN_QUERY_LENGTH and cls.has_search_index('persons_fts'):
+                with cls.connection() as conn:
+                    cursor = conn.cursor()
+
+                    cursor.execute("""
+                        SELECT p.pid, p.primaryName as name, COUNT(DISTINCT d.mid) as movie_count
+                        FROM (
+                            SELECT rowid, rank FROM persons_fts
+                            WHERE persons_fts MATCH ?
+                            ORDER BY rank
+                            LIMIT ?
+                        ) f
+                        JOIN persons p ON p.rowid = f.rowid
+                        LEFT JOIN directors d ON p.pid = d.pid
+                        GROUP BY p.pid
+                        ORDER BY MIN(f.rank), movie_count DESC
+                        LIMIT ?
+                    """, (fts_phrase(query), limit * 10, limit))
+
+                    return [dict(row) for row in cursor.fetchall()]
+
+            with cls.connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("""
+                    SELECT p.pid, p.primaryName as name, COUNT(DISTINCT d.mid) as movie_count
+                    FROM persons p
+                    LEFT JOIN directors d ON p.pid = d.pid
+                    WHERE p.primaryName LIKE ?
+                    GROUP BY p.pid
+                    ORDER BY movie_count DESC
+                    LIMIT ?
+                """, (f'%{query}%', limit))
+
+                return [dict(row) for row in cursor.fetchall()]
 
         except Exception as e:
             return []
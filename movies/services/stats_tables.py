@@ -0,0 +1,236 @@
+"""
+tables de synthese de la page statistiques, materialisees dans data/imdb.db
+chaque table est le resultat d'une aggregation sur les tables sources, recalculee une fois
+apres l'import au lieu d'un GROUP BY complet a chaque affichage
+sans dependance a django: importable depuis scripts/import_from_sqlite.py
+"""
+
+import time
+
+
+# tranche de note: partie entiere (10 pour la note maximale), comme le $bucket mongodb
+RATING_BUCKET = "CAST(r.averageRating AS INTEGER)"
+
+# realisateurs conserves dans stats_directors (limite maximale de get_top_actors)
+DIRECTORS_KEPT = 1000
+
+# table -> colonnes, nombre de colonnes de la cle primaire et requete source
+STATS_TABLES = {
+    'stats_genre': {
+        'key': 1,
+        'columns': "genre TEXT PRIMARY KEY, movies INTEGER NOT NULL",
+        'query': "SELECT genre, COUNT(*) FROM genres GROUP BY genre",
+    },
+    'stats_decade': {
+        'key': 1,
+        'columns': "decade INTEGER PRIMARY KEY, movies INTEGER NOT NULL",
+        'query': """
+            SELECT (startYear / 10) * 10, COUNT(*) FROM movies
+            WHERE startYear IS NOT NULL
+            GROUP BY 1
+        """,
+    },
+    'stats_directors': {
+        'key': 1,
+        'columns': "pid TEXT PRIMARY KEY, name TEXT, movies INTEGER NOT NULL",
+        'query': f"""
+            SELECT p.pid, p.primaryName, COUNT(*) FROM persons p
+            JOIN directors d ON p.pid = d.pid
+            GROUP BY p.pid
+            ORDER BY COUNT(*) DESC, p.pid
+            LIMIT {DIRECTORS_KEPT}
+        """,
+    },
+    'stats_rating': {
+        'key': 1,
+        'columns': "bucket INTEGER PRIMARY KEY, movies INTEGER NOT NULL",
+        'query': f"""
+            SELECT {RATING_BUCKET}, COUNT(*) FROM ratings r
+            WHERE r.averageRating IS NOT NULL
+            GROUP BY 1
+        """,
+    },
+    'stats_genre_decade': {
+        'key': 2,
+        'columns': """
+            genre TEXT NOT NULL, decade INTEGER NOT NULL, movies INTEGER NOT NULL,
+            rated INTEGER NOT NULL, avg_rating REAL,
+            PRIMARY KEY (genre, decade)
+        """,
+        'query': """
+            SELECT g.genre, (m.startYear / 10) * 10, COUNT(*), COUNT(r.averageRating),
+                   ROUND(AVG(r.averageRating), 2)
+            FROM genres g
+            JOIN movies m ON m.mid = g.mid
+            LEFT JOIN ratings r ON r.mid = g.mid
+            WHERE m.startYear IS NOT NULL
+            GROUP BY 1, 2
+        """,
+    },
+    'stats_genre_rating': {
+        'key': 2,
+        'columns': """
+            genre TEXT NOT NULL, bucket INTEGER NOT NULL, movies INTEGER NOT NULL,
+            PRIMARY KEY (genre, bucket)
+        """,
+        'query': f"""
+            SELECT g.genre, {RATING_BUCKET}, COUNT(*)
+            FROM genres g
+            JOIN ratings r ON r.mid = g.mid
+            WHERE r.averageRating IS NOT NULL
+            GROUP BY 1, 2
+        """,
+    },
+}
+
+STATE_TABLE = 'stats_tables_state'
+
+# tables du jeu de donnees comptees par get_statistics (hors tables de synthese, index fts
+# et tables d'etat: elles gonfleraient total_rows et changent sans nouvel import)
+SOURCE_TABLES = ('movies', 'persons', 'genres', 'ratings', 'directors', 'writers')
+
+# nombre de lignes par table, releve a l'import (comptages approches de get_statistics)
+ROW_COUNTS_TABLE = 'table_row_counts'
+
+
+def rating_bucket_label(bucket):
+    """libelle chart.js d'une tranche de note"""
+    return f"{bucket}-{bucket + 1}" if bucket < 10 else "10+"
+
+
+def build_stats_tables(conn):
+    """
+    recalcule toutes les tables de synthese
+
+    les aggregations et les comptages sont calcules en lecture, sans verrou d'ecriture (les
+    resultats, quelques centaines de lignes, restent en memoire), puis toutes les tables sont
+    remplacees dans une seule transaction courte: les lecteurs voient les anciennes valeurs
+    ou les nouvelles, jamais une table vide, et les ecritures ne sont bloquees que le temps
+    des insertions
+
+    args:
+        conn: connexion sqlite en ecriture
+
+    returns:
+        dictionnaire {table: (lignes, duree du calcul en secondes)}
+    """
+    results = {}
+    computed = {}
+    for name, spec in STATS_TABLES.items():
+        start = time.time()
+        computed[name] = conn.execute(spec['query']).fetchall()
+        results[name] = (len(computed[name]), time.time() - start)
+    counts = count_rows(conn)
+
+    with conn:
+        # le module sqlite3 n'ouvre pas de transaction avant un DROP/CREATE: ouverture explicite
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                name TEXT PRIMARY KEY,
+                row_count INTEGER NOT NULL,
+                built_at REAL NOT NULL
+            )
+        """)
+        for name, spec in STATS_TABLES.items():
+            rows = computed[name]
+            conn.execute(f"DROP TABLE IF EXISTS {name}")
+            conn.execute(f"CREATE TABLE {name} ({spec['columns']}) WITHOUT ROWID")
+            if rows:
+                placeholders = ','.join('?' * len(rows[0]))
+                conn.executemany(f"INSERT INTO {name} VALUES ({placeholders})", rows)
+            conn.execute(f"""
+                INSERT INTO {STATE_TABLE} (name, row_count, built_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET row_count = excluded.row_count, built_at = excluded.built_at
+            """, (name, len(rows), time.time()))
+        write_row_counts(conn, counts)
+    return results
+
+
+def counted_tables(conn):
+    """tables sources presentes dans la base (comptees par get_statistics)"""
+    placeholders = ','.join('?' * len(SOURCE_TABLES))
+    rows = conn.execute(
+        f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders}) ORDER BY name",
+        SOURCE_TABLES
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def count_rows(conn):
+    """nombre de lignes de chaque table source (COUNT(*))"""
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in counted_tables(conn)}
+
+
+def write_row_counts(conn, counts):
+    """remplace le releve des comptages par table (l'appelant valide la transaction)"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ROW_COUNTS_TABLE} (
+            name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL,
+            counted_at REAL NOT NULL
+        )
+    """)
+    conn.execute(f"DELETE FROM {ROW_COUNTS_TABLE}")
+    now = time.time()
+    for table, count in counts.items():
+        conn.execute(f"INSERT INTO {ROW_COUNTS_TABLE} (name, row_count, counted_at) VALUES (?, ?, ?)",
+                     (table, count, now))
+
+
+def row_counts(conn, exact=False):
+    """
+    nombre de lignes par table
+
+    args:
+        exact: compte chaque table (COUNT(*)) au lieu de lire le releve fait a l'import
+
+    returns:
+        (dictionnaire {table: lignes}, True si les comptages sont exacts)
+    """
+    if not exact:
+        present = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (ROW_COUNTS_TABLE,)
+        ).fetchone()
+        if present:
+            # un releve d'une version precedente peut contenir d'autres tables
+            rows = conn.execute(f"SELECT name, row_count FROM {ROW_COUNTS_TABLE} ORDER BY name").fetchall()
+            return {row[0]: row[1] for row in rows if row[0] in SOURCE_TABLES}, False
+
+    return count_rows(conn), True
+
+
+def check_stats_tables(conn):
+    """
+    compare chaque table de synthese a l'aggregation calculee en direct
+
+    returns:
+        dictionnaire {table: None si absente, sinon liste des lignes divergentes
+        (valeur stockee, valeur en direct)}
+    """
+    present = stats_tables(conn)
+    report = {}
+    for name, spec in STATS_TABLES.items():
+        if name not in present:
+            report[name] = None
+            continue
+        width = spec['key']
+        stored = {row[:width]: row for row in conn.execute(f"SELECT * FROM {name}")}
+        live = {row[:width]: row for row in conn.execute(spec['query'])}
+        report[name] = [
+            (stored.get(key), live.get(key))
+            for key in sorted(set(stored) | set(live), key=repr)
+            if stored.get(key) != live.get(key)
+        ]
+    return report
+
+
+def stats_tables(conn):
+    """noms des tables de synthese presentes dans la base"""
+    placeholders = ','.join('?' * len(STATS_TABLES))
+    rows = conn.execute(
+        f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+        tuple(STATS_TABLES)
+    ).fetchall()
+    return {row[0] for row in rows}
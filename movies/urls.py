@@ -2,15 +2,19 @@
 configuration des routes url pour l'app movies
 """
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, views_async
+
+# memes routes, vues sync (wsgi) ou async (asgi) selon MOVIES_ASYNC_VIEWS
+handlers = views_async if settings.MOVIES_ASYNC_VIEWS else views
 
 app_name = 'movies'
 
 urlpatterns = [
-    path('', views.home, name='home'),
-    path('movies/', views.movies_list, name='movies_list'),
-    path('movies/<str:movie_id>/', views.movie_detail, name='movie_detail'),
-    path('search/', views.search, name='search'),
-    path('stats/', views.statistics, name='stats'),
+    path('', handlers.home, name='home'),
+    path('movies/', handlers.movies_list, name='movies_list'),
+    path('movies/<str:movie_id>/', handlers.movie_detail, name='movie_detail'),
+    path('search/', handlers.search, name='search'),
+    path('stats/', handlers.statistics, name='stats'),
 ]
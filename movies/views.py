@@ -5,22 +5,55 @@ gere les requetes http et renvoie les templates avec les donnees
 
 from django.shortcuts import render
 from .services.mongo_service import MongoService
+from .services.orchestrator import call, run_parallel
+from .services.repository import MovieRepository
 from .services.sqlite_service import SQLiteService
 import json
 
 
+PAGE_SIZE = 20
+
+# series multiples vides (graphiques empiles de la page statistiques)
+EMPTY_SERIES = {'labels': [], 'series': []}
+
+
 def home(request):
     """page accueil avec stats, top 10 et recherche"""
-    context = {
-        'stats': MongoService.get_statistics(),
-        'top_movies': MongoService.get_top_movies(limit=10),
-        'random_movies': MongoService.get_random_movies(limit=6),
+    # les trois appels sont independants: lances en parallele
+    results = run_parallel({
+        'stats': call(MongoService.get_statistics, default={}),
+        'top_movies': call(MovieRepository.get_top_movies, limit=10, default=[]),
+        'random_movies': call(MovieRepository.get_random_movies, limit=6, default=[]),
+    })
+
+    return render(request, 'movies/home.html', home_context(results))
+
+
+def home_context(results):
+    """contexte de la page d'accueil (partage avec views_async)"""
+    return {
+        'stats': results['stats'],
+        'top_movies': results['top_movies'],
+        'random_movies': results['random_movies'],
+        'unavailable': results.unavailable,
+        'timings': results.timings,
     }
-    return render(request, 'movies/home.html', context)
 
 
 def movies_list(request):
     """liste films avec filtres, tri, pagination"""
+    params = list_params(request)
+
+    # appeler service (utilise SQLite pour filtrage efficace)
+    # avec un curseur: pagination par seek, sinon offset (compatibilite page=)
+    movies = SQLiteService.get_movies_filtered(**params['query'])
+
+    context = list_context(request, params, movies, SQLiteService.get_genres())
+    return render(request, 'movies/list.html', context)
+
+
+def list_params(request):
+    """filtres, tri et position de pagination lus dans la requete"""
     # recuperer parametres GET
     genre = request.GET.get('genre', '')
     year_min = request.GET.get('year_min', '')
@@ -44,28 +77,60 @@ def movies_list(request):
     if rating_min:
         filters['rating'] = {'$gte': float(rating_min)}
 
-    # appeler service (utilise SQLite pour filtrage efficace)
-    movies = SQLiteService.get_movies_filtered(
-        filters=filters,
-        sort_by=sort_by,
-        sort_order=sort_order,
-        limit=20,
-        offset=(page-1)*20
-    )
+    cursor = SQLiteService.decode_cursor(request.GET['cursor']) if request.GET.get('cursor') else None
+    return {
+        'page': page,
+        'cursor': cursor,
+        # une ligne de plus que la page pour savoir s'il existe une suite
+        'query': {
+            'filters': filters,
+            'sort_by': sort_by,
+            'sort_order': sort_order,
+            'limit': PAGE_SIZE + 1,
+            'offset': (page-1)*PAGE_SIZE,
+            'cursor': cursor,
+        },
+    }
 
-    context = {
+
+def list_context(request, params, movies, genres):
+    """contexte de la liste: page courante et curseurs des pages voisines"""
+    page = params['page']
+    cursor = params['cursor']
+    sort_by = params['query']['sort_by']
+
+    going_back = cursor is not None and cursor[2] == 'prev'
+    has_more = len(movies) > PAGE_SIZE
+    if has_more:
+        movies = movies[1:] if going_back else movies[:PAGE_SIZE]
+
+    has_next = has_more or going_back
+    has_previous = page > 1
+    next_cursor = SQLiteService.encode_cursor(movies[-1], sort_by, 'next') if movies and has_next else ''
+    prev_cursor = SQLiteService.encode_cursor(movies[0], sort_by, 'prev') if movies and has_previous else ''
+
+    # parametres a conserver dans les liens de pagination
+    query_params = request.GET.copy()
+    query_params.pop('page', None)
+    query_params.pop('cursor', None)
+
+    return {
         'movies': movies,
-        'genres': SQLiteService.get_genres(),
+        'genres': genres,
         'page': page,
         'filters': request.GET,
+        'has_next': has_next,
+        'has_previous': has_previous,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'base_query': query_params.urlencode(),
     }
-    return render(request, 'movies/list.html', context)
 
 
 def movie_detail(request, movie_id):
-    """detail complet film depuis mongodb"""
-    movie = MongoService.get_movie_by_id(movie_id)
-    similar_movies = MongoService.get_similar_movies(movie_id, limit=6)
+    """detail complet film (mongodb, ou sqlite si plus rapide ou replica set indisponible)"""
+    movie = MovieRepository.get_movie_by_id(movie_id)
+    similar_movies = MovieRepository.get_similar_movies(movie_id, limit=6)
 
     context = {
         'movie': movie,
@@ -98,22 +163,35 @@ def search(request):
 
 def statistics(request):
     """stats avec donnees pour chart.js"""
-    # films par genre
-    genres_data = SQLiteService.get_stats_by_genre()
-
-    # films par decennie
-    decades_data = SQLiteService.get_stats_by_decade()
-
-    # distribution notes (mongodb aggregation)
-    ratings_data = MongoService.get_ratings_distribution()
-
-    # top acteurs
-    actors_data = SQLiteService.get_top_actors(limit=10)
-
-    context = {
-        'genres': json.dumps(genres_data),
-        'decades': json.dumps(decades_data),
-        'ratings': json.dumps(ratings_data),
-        'actors': json.dumps(actors_data),
+    # lectures independantes sur sqlite et mongodb, lancees en parallele
+    # (tables de synthese construites a l'import, aggregation en direct a defaut)
+    results = run_parallel({
+        # films par genre
+        'genres': call(SQLiteService.get_stats_by_genre, default=[]),
+        # films par decennie
+        'decades': call(SQLiteService.get_stats_by_decade, default=[]),
+        # distribution notes
+        # (table de synthese sqlite ou $bucket mongodb, selon la latence observee)
+        'ratings': call(MovieRepository.get_ratings_distribution, default=[]),
+        # top acteurs
+        'actors': call(SQLiteService.get_top_actors, limit=10, default=[]),
+        # genres x decennies et notes par genre
+        'genre_decades': call(SQLiteService.get_stats_by_genre_decade, default=EMPTY_SERIES),
+        'genre_ratings': call(SQLiteService.get_ratings_by_genre, default=EMPTY_SERIES),
+    })
+
+    return render(request, 'movies/stats.html', stats_context(results))
+
+
+def stats_context(results):
+    """contexte de la page statistiques (series serialisees pour chart.js)"""
+    return {
+        'genres': json.dumps(results['genres']),
+        'decades': json.dumps(results['decades']),
+        'ratings': json.dumps(results['ratings']),
+        'actors': json.dumps(results['actors']),
+        'genre_decades': json.dumps(results['genre_decades']),
+        'genre_ratings': json.dumps(results['genre_ratings']),
+        'unavailable': results.unavailable,
+        'timings': results.timings,
     }
-    return render(request, 'movies/stats.html', context)
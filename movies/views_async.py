@@ -0,0 +1,84 @@
+"""
+versions async des vues de l'application movies (servies par config.asgi sous uvicorn)
+les appels mongodb passent par AsyncMongoService, les appels sqlite par le pool de threads:
+un worker n'est plus bloque pendant les allers-retours vers le replica set
+"""
+
+from django.shortcuts import render
+
+from .services.async_mongo_service import AsyncMongoService
+from .services.async_sqlite_service import AsyncSQLiteService
+from .services.orchestrator import call, gather_parallel
+from .services.repository import AsyncMovieRepository
+from .views import EMPTY_SERIES, home_context, list_context, list_params, stats_context
+
+
+async def home(request):
+    """page accueil avec stats, top 10 et recherche"""
+    results = await gather_parallel({
+        'stats': call(AsyncMongoService.get_statistics, default={}),
+        'top_movies': call(AsyncMovieRepository.get_top_movies, limit=10, default=[]),
+        'random_movies': call(AsyncMovieRepository.get_random_movies, limit=6, default=[]),
+    })
+    return render(request, 'movies/home.html', home_context(results))
+
+
+async def movies_list(request):
+    """liste films avec filtres, tri, pagination"""
+    params = list_params(request)
+
+    results = await gather_parallel({
+        'movies': call(AsyncSQLiteService.get_movies_filtered, default=[], **params['query']),
+        'genres': call(AsyncSQLiteService.get_genres, default=[]),
+    })
+
+    context = list_context(request, params, results['movies'], results['genres'])
+    return render(request, 'movies/list.html', context)
+
+
+async def movie_detail(request, movie_id):
+    """detail complet film (mongodb, ou sqlite si plus rapide ou replica set indisponible)"""
+    results = await gather_parallel({
+        'movie': call(AsyncMovieRepository.get_movie_by_id, movie_id),
+        'similar_movies': call(AsyncMovieRepository.get_similar_movies, movie_id, limit=6, default=[]),
+    })
+
+    context = {
+        'movie': results['movie'],
+        'similar_movies': results['similar_movies'],
+    }
+    return render(request, 'movies/detail.html', context)
+
+
+async def search(request):
+    """recherche par titre ou personne"""
+    query = request.GET.get('q', '')
+
+    if not query:
+        context = {'query': '', 'movies': [], 'persons': []}
+        return render(request, 'movies/search.html', context)
+
+    results = await gather_parallel({
+        'movies': call(AsyncSQLiteService.search_movies, query, limit=20, default=[]),
+        'persons': call(AsyncSQLiteService.search_persons, query, limit=10, default=[]),
+    })
+
+    context = {
+        'query': query,
+        'movies': results['movies'],
+        'persons': results['persons'],
+    }
+    return render(request, 'movies/search.html', context)
+
+
+async def statistics(request):
+    """stats avec donnees pour chart.js"""
+    results = await gather_parallel({
+        'genres': call(AsyncSQLiteService.get_stats_by_genre, default=[]),
+        'decades': call(AsyncSQLiteService.get_stats_by_decade, default=[]),
+        'ratings': call(AsyncMovieRepository.get_ratings_distribution, default=[]),
+        'actors': call(AsyncSQLiteService.get_top_actors, limit=10, default=[]),
+        'genre_decades': call(AsyncSQLiteService.get_stats_by_genre_decade, default=EMPTY_SERIES),
+        'genre_ratings': call(AsyncSQLiteService.get_ratings_by_genre, default=EMPTY_SERIES),
+    })
+    return render(request, 'movies/stats.html', stats_context(results))
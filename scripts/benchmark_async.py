@@ -0,0 +1,242 @@
+"""
+benchmark des vues sync (wsgi, gunicorn) contre les vues async (asgi, uvicorn)
+lance les deux serveurs, envoie la meme charge (200 clients concurrents par defaut)
+et compare req/s et latences
+
+usage:
+    pip install gunicorn uvicorn
+    python scripts/benchmark_async.py [--clients 200] [--duration 30] [--workers 4]
+    python scripts/benchmark_async.py --wsgi-url http://127.0.0.1:8001 --asgi-url http://127.0.0.1:8002
+
+le client de charge n'utilise que la bibliotheque standard (asyncio, http/1.1 keep-alive)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import time
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlsplit
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# parcours represente par la charge (les cinq vues)
+DEFAULT_PATHS = [
+    '/',
+    '/movies/',
+    '/movies/?genre=Drama&sort_by=rating',
+    '/movies/tt0111161/',
+    '/search/?q=star',
+    '/stats/',
+]
+
+
+def start_server(kind, port, workers, threads):
+    """lance gunicorn (vues sync) ou uvicorn (vues async) sur le port donne"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='config.settings')
+    if kind == 'wsgi':
+        executable = 'gunicorn'
+        env['MOVIES_ASYNC_VIEWS'] = '0'
+        cmd = ['gunicorn', 'config.wsgi:application', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning']
+    else:
+        executable = 'uvicorn'
+        env['MOVIES_ASYNC_VIEWS'] = '1'
+        cmd = ['uvicorn', 'config.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+               '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+
+    if shutil.which(executable) is None:
+        raise SystemExit(f"{executable} introuvable: pip install {executable}")
+
+    return subprocess.Popen(cmd, cwd=BASE_DIR, env=env)
+
+
+def wait_ready(url, timeout=30):
+    """attend que le serveur reponde"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url + '/search/', timeout=2).read()
+            return
+        except Exception:
+            time.sleep(0.5)
+    raise SystemExit(f"serveur {url} injoignable apres {timeout}s")
+
+
+class Connection:
+    """connexion http/1.1 persistante minimale"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.reader = self.writer = None
+
+    async def get(self, path):
+        """envoie un GET et lit la reponse complete; renvoie le code http"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        self.writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nConnection: keep-alive\r\n\r\n".encode()
+        )
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self.reader.read()
+            await self.close()
+
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status
+
+
+async def client_loop(host, port, paths, offset, stop_at, results):
+    """un client: enchaine les requetes jusqu'a la fin de la mesure"""
+    conn = Connection(host, port)
+    i = offset
+    while time.monotonic() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            status = await conn.get(path)
+            ok = status < 400
+        except Exception:
+            await conn.close()
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        results.append((path, ok, elapsed))
+    await conn.close()
+
+
+async def run_load(url, clients, duration, paths):
+    """charge de `clients` connexions concurrentes pendant `duration` secondes"""
+    parts = urlsplit(url)
+    results = []
+    start = time.monotonic()
+    stop_at = start + duration
+    await asyncio.gather(*(
+        client_loop(parts.hostname, parts.port or 80, paths, i, stop_at, results)
+        for i in range(clients)
+    ))
+    return results, time.monotonic() - start
+
+
+def percentile(values, p):
+    """percentile p (0-100) d'une liste deja triee"""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(results, elapsed):
+    """req/s, erreurs et latences (ms)"""
+    latencies = sorted(ms for _, ok, ms in results if ok)
+    errors = sum(1 for _, ok, _ in results if not ok)
+    by_path = {}
+    for path, ok, ms in results:
+        if ok:
+            by_path.setdefault(path, []).append(ms)
+
+    return {
+        'requests': len(results),
+        'errors': errors,
+        'req_per_s': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(latencies, 50) or 0, 1),
+        'p95_ms': round(percentile(latencies, 95) or 0, 1),
+        'p99_ms': round(percentile(latencies, 99) or 0, 1),
+        'per_path_median_ms': {p: round(statistics.median(v), 1) for p, v in by_path.items()},
+    }
+
+
+def benchmark(label, url, args):
+    """chauffe puis mesure un serveur"""
+    print(f"\n{label} ({url}): chauffe {args.warmup}s...")
+    asyncio.run(run_load(url, args.clients, args.warmup, args.paths))
+
+    print(f"{label}: mesure {args.duration}s avec {args.clients} clients...")
+    results, elapsed = asyncio.run(run_load(url, args.clients, args.duration, args.paths))
+    summary = summarize(results, elapsed)
+
+    print(f"  {summary['req_per_s']} req/s, {summary['requests']} requetes, {summary['errors']} erreurs")
+    print(f"  latence p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms")
+    return summary
+
+
+def main():
+    """fonction principale"""
+    parser = argparse.ArgumentParser(description="benchmark wsgi (vues sync) vs asgi (vues async)")
+    parser.add_argument('--clients', type=int, default=200, help='clients concurrents')
+    parser.add_argument('--duration', type=int, default=30, help='duree de la mesure (secondes)')
+    parser.add_argument('--warmup', type=int, default=5, help='duree de la chauffe (secondes)')
+    parser.add_argument('--workers', type=int, default=4, help='processus par serveur')
+    parser.add_argument('--threads', type=int, default=8, help='threads par worker gunicorn')
+    parser.add_argument('--wsgi-url', help='serveur wsgi deja lance (sinon gunicorn sur le port 8001)')
+    parser.add_argument('--asgi-url', help='serveur asgi deja lance (sinon uvicorn sur le port 8002)')
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS, help='chemins parcourus')
+    parser.add_argument('--json', help='ecrit le rapport dans ce fichier')
+    args = parser.parse_args()
+
+    print("\nbenchmark wsgi vs asgi")
+    print("="*60)
+
+    servers = []
+    report = {'clients': args.clients, 'duration': args.duration, 'paths': args.paths}
+    try:
+        for kind, url, port in (('wsgi', args.wsgi_url, 8001), ('asgi', args.asgi_url, 8002)):
+            if url is None:
+                servers.append(start_server(kind, port, args.workers, args.threads))
+                url = f'http://127.0.0.1:{port}'
+            wait_ready(url)
+            report[kind] = benchmark(kind, url, args)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    wsgi, asgi = report['wsgi']['req_per_s'], report['asgi']['req_per_s']
+    print("\n" + "="*60)
+    print(f"wsgi: {wsgi} req/s | asgi: {asgi} req/s | rapport asgi/wsgi: {asgi / wsgi:.2f}x" if wsgi else
+          f"wsgi: {wsgi} req/s | asgi: {asgi} req/s")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"rapport ecrit dans {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,103 +2,412 @@
 script d'import des donnees depuis sqlite vers le replica set mongodb
 """
 
+import argparse
+import hashlib
+import math
+import multiprocessing
+import os
+import queue
 import sqlite3
-from pymongo import MongoClient
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pymongo import DeleteOne, MongoClient, ReplaceOne
+from pymongo.write_concern import WriteConcern
 from pathlib import Path
 import time
 
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+# acces aux modules du projet (movies.services)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# parametres de l'application (seuil du classement) lus sans demarrer django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+from movies.services.cache import bump_dataset_version
+from movies.services.leaderboard import DEFAULT_SIZE, build_leaderboard, configured_min_votes, refresh_leaderboard
+from movies.services.mongo_indexes import MONGO_INDEXES, ensure_collection_indexes, ensure_indexes
+from movies.services.similarity import build_similarity, refresh_similarity
+from movies.services.stats_tables import build_stats_tables
+
 # configuration
 SQLITE_DB = Path(__file__).parent.parent / "data" / "imdb.db"
 REPLICA_SET_HOSTS = "localhost:27017,localhost:27018,localhost:27019"
 REPLICA_SET_NAME = "rs0"
 MONGO_DB = "imdb"
 
+# colonnes utilisees comme _id
+ID_COLUMNS = {
+    'movies': 'mid',
+    'persons': 'pid',
+    'ratings': 'mid',
+}
+
+# movies_complete est construite a cote puis renommee: les lecteurs ne la voient jamais absente
+MOVIES_COMPLETE = 'movies_complete'
+MOVIES_COMPLETE_STAGING = 'movies_complete_staging'
+
+# documents de movies_complete enrichis par aggregation ($lookup + $merge)
+ENRICH_CHUNK_SIZE = 20000
+ENRICH_PROGRESS_ID = 'enrich_persons'
+
+# lignes par lot et lots en attente entre lecture et ecriture
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_QUEUE_SIZE = 4
+
+# cles primaires des tables (synchronisation incrementale --delta)
+TABLE_KEYS = {
+    'movies': ('mid',),
+    'persons': ('pid',),
+    'ratings': ('mid',),
+    'genres': ('mid', 'genre'),
+    'directors': ('mid', 'pid'),
+    'writers': ('mid', 'pid'),
+}
+FINGERPRINTS = 'sync_fingerprints'
+# etat des tables a la fin d'un import complet (lignes et somme des empreintes), dans FINGERPRINTS
+SNAPSHOT_PREFIX = 'snapshot:'
+REBUILD_CHUNK_SIZE = 1000
+
+# lignes par plage de rowid en import parallele
+DEFAULT_PARTITION_SIZE = 200000
+
 def get_sqlite_connection():
     """connexion a sqlite"""
     if not SQLITE_DB.exists():
         raise FileNotFoundError(f"base sqlite introuvable: {SQLITE_DB}")
     return sqlite3.connect(str(SQLITE_DB))
 
+def refresh_stats_tables(sqlite_conn):
+    """recalcule les tables de synthese sqlite de la page statistiques"""
+    print("\ntables de synthese sqlite (page statistiques)...")
+    for name, (rows, elapsed) in build_stats_tables(sqlite_conn).items():
+        print(f"  {name}: {rows} lignes en {elapsed:.2f}s")
+
 def get_mongo_client():
     """connexion au replica set mongodb"""
     return MongoClient(REPLICA_SET_HOSTS, replicaSet=REPLICA_SET_NAME)
 
-def migrate_table_to_collection(sqlite_conn, mongo_db, table_name):
+def current_rss_mb():
+    """memoire residente actuelle du processus en mo (None si non mesurable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    # pas de /proc (macos): pic du processus, en octets sur macos
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def row_to_document(table_name, columns, row):
+    """convertit une ligne sqlite en document (cle primaire -> _id)"""
+    id_column = ID_COLUMNS.get(table_name)
+    doc = {}
+    for column_name, value in zip(columns, row):
+        if column_name == id_column:
+            doc['_id'] = value
+        else:
+            doc[column_name] = value
+    return doc
+
+def parse_write_concern(value, journal=False):
+    """write concern a partir de --write-concern ('majority', '1', '0'...)"""
+    w = int(value) if value.isdigit() else value
+    return WriteConcern(w=w, j=True if journal else None)
+
+def stream_table(sqlite_conn, collection, table_name, query, params=(),
+                 batch_size=DEFAULT_BATCH_SIZE, queue_size=DEFAULT_QUEUE_SIZE, writers=1, progress=None):
     """
-    migrer une table sqlite vers une collection mongodb
+    lit une requete par lots (fetchmany) et les insere pendant la lecture du lot suivant
+
+    le lecteur remplit une file bornee, les threads d'ecriture la vident avec insert_many:
+    la memoire reste limitee a (queue_size + writers + 1) lots quelle que soit la taille de la table
+
+    args:
+        collection: collection cible (avec son write concern)
+        progress: fonction appelee avec le nombre de documents inseres
+
+    returns:
+        dictionnaire (rows, inserted, checksum, peak_rss_mb)
+        checksum: somme des empreintes des lignes lues (voir add_fingerprint)
+    """
+    batches = queue.Queue(maxsize=queue_size)
+    state = {'inserted': 0, 'error': None}
+    lock = threading.Lock()
+
+    def write():
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            if state['error'] is not None:
+                continue
+            try:
+                result = collection.insert_many(batch, ordered=False)
+                with lock:
+                    state['inserted'] += len(result.inserted_ids)
+                    if progress:
+                        progress(state['inserted'])
+            except Exception as e:
+                state['error'] = e
+
+    threads = [threading.Thread(target=write, daemon=True) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+
+    cursor = sqlite_conn.cursor()
+    cursor.execute(query, params)
+    columns = [description[0] for description in cursor.description]
+
+    rows = 0
+    checksum = 0
+    peak_rss = current_rss_mb()
+    try:
+        while state['error'] is None:
+            chunk = cursor.fetchmany(batch_size)
+            if not chunk:
+                break
+            rows += len(chunk)
+            for row in chunk:
+                checksum = add_fingerprint(checksum, row)
+            # put bloque quand la file est pleine: le lecteur attend l'ecriture
+            batches.put([row_to_document(table_name, columns, row) for row in chunk])
+
+            rss = current_rss_mb()
+            if rss is not None:
+                peak_rss = max(peak_rss or 0, rss)
+    finally:
+        for _ in threads:
+            batches.put(None)
+        for thread in threads:
+            thread.join()
+
+    if state['error'] is not None:
+        raise state['error']
+
+    return {'rows': rows, 'inserted': state['inserted'], 'checksum': checksum, 'peak_rss_mb': peak_rss}
+
+def migrate_table_to_collection(sqlite_conn, mongo_db, table_name, batch_size=DEFAULT_BATCH_SIZE,
+                                queue_size=DEFAULT_QUEUE_SIZE, writers=1, write_concern=None):
+    """
+    migrer une table sqlite vers une collection mongodb en flux
 
     args:
         sqlite_conn: connexion sqlite
         mongo_db: base mongodb
         table_name: nom de la table sqlite
+        batch_size: lignes lues (fetchmany) et inserees par lot
+        queue_size: lots en attente entre lecteur et threads d'ecriture
+        writers: threads d'ecriture
+        write_concern: WriteConcern des insertions (celui du client si None)
 
     returns:
-        nombre de documents inseres
+        dictionnaire (table, inserted, rows, checksum, elapsed, rows_per_s, peak_rss_mb)
     """
     print(f"\nmigration de {table_name}...")
 
-    # extraire les donnees de sqlite
-    cursor = sqlite_conn.cursor()
-    cursor.execute(f"SELECT * FROM {table_name}")
-
-    # recuperer les noms de colonnes
-    columns = [description[0] for description in cursor.description]
-
-    # convertir les lignes en dictionnaires
-    documents = []
-    for row in cursor.fetchall():
-        doc = {}
-        for i, value in enumerate(row):
-            column_name = columns[i]
-
-            # utiliser mid comme _id pour movies
-            if table_name == 'movies' and column_name == 'mid':
-                doc['_id'] = value
-            # utiliser pid comme _id pour persons
-            elif table_name == 'persons' and column_name == 'pid':
-                doc['_id'] = value
-            # utiliser mid comme _id pour ratings
-            elif table_name == 'ratings' and column_name == 'mid':
-                doc['_id'] = value
-            else:
-                doc[column_name] = value
-
-        documents.append(doc)
+    total = sqlite_conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
 
     # vider la collection si elle existe
     mongo_db[table_name].drop()
 
-    # inserer dans mongodb par batch
-    if documents:
-        start_time = time.time()
+    collection = mongo_db[table_name]
+    if write_concern is not None:
+        collection = collection.with_options(write_concern=write_concern)
 
-        # inserer par lots de 10000
-        batch_size = 10000
-        total_inserted = 0
+    def progress(inserted):
+        print(f"  {inserted}/{total} documents inseres", end='\r')
 
-        for i in range(0, len(documents), batch_size):
-            batch = documents[i:i + batch_size]
-            result = mongo_db[table_name].insert_many(batch, ordered=False)
-            total_inserted += len(result.inserted_ids)
-            print(f"  {total_inserted}/{len(documents)} documents inseres", end='\r')
+    start_time = time.time()
+    result = stream_table(
+        sqlite_conn, collection, table_name, f"SELECT * FROM {table_name}",
+        batch_size=batch_size, queue_size=queue_size, writers=writers, progress=progress
+    )
+    elapsed = time.time() - start_time
 
-        elapsed = time.time() - start_time
-        print(f"\n  {total_inserted} documents inseres en {elapsed:.2f}s")
-        return total_inserted
-    else:
+    if not result['rows']:
         print(f"  table vide, aucun document insere")
-        return 0
 
-def create_movies_complete(mongo_db):
+    rows_per_s = result['inserted'] / elapsed if elapsed else 0.0
+    rss = f"{result['peak_rss_mb']:.0f} mo" if result['peak_rss_mb'] is not None else "non mesure"
+    print(f"\n  {result['inserted']} documents inseres en {elapsed:.2f}s"
+          f" ({rows_per_s:.0f} lignes/s, pic rss {rss})")
+
+    return {
+        'table': table_name,
+        'inserted': result['inserted'],
+        'rows': result['rows'],
+        'checksum': result['checksum'],
+        'elapsed': elapsed,
+        'rows_per_s': rows_per_s,
+        'peak_rss_mb': result['peak_rss_mb'],
+    }
+
+def plan_partitions(sqlite_conn, tables, partition_size):
     """
-    creer la collection movies_complete avec documents structures
+    decoupe les tables en plages de rowid d'environ partition_size lignes
 
-    utilise un pipeline d'agregation pour construire des documents denormalises
+    returns:
+        (taches triees de la plus grosse a la plus petite, nombre de lignes par table)
     """
-    print("\ncreation de la collection movies_complete...")
+    tasks = []
+    totals = {}
+    for table in tables:
+        low, high, count = sqlite_conn.execute(
+            f"SELECT MIN(rowid), MAX(rowid), COUNT(*) FROM {table}"
+        ).fetchone()
+        totals[table] = count
+        if not count:
+            continue
 
-    # pipeline d'agregation
-    pipeline = [
+        parts = max(1, math.ceil(count / partition_size))
+        step = math.ceil((high - low + 1) / parts)
+        for start in range(low, high + 1, step):
+            tasks.append({
+                'table': table,
+                'start': start,
+                'end': min(start + step, high + 1),
+                'rows': count // parts,
+            })
+
+    tasks.sort(key=lambda task: task['rows'], reverse=True)
+    return tasks, totals
+
+# etat d'un processus du pool (connexions ouvertes a la premiere tache)
+_worker = {}
+
+def init_worker(progress_queue, options):
+    """initialisation d'un processus du pool"""
+    _worker['progress'] = progress_queue
+    _worker['options'] = options
+
+def import_partition(task):
+    """tache du pool: importe une plage de rowid avec ses propres connexions sqlite et mongodb"""
+    options = _worker['options']
+    if 'mongo' not in _worker:
+        _worker['sqlite'] = get_sqlite_connection()
+        _worker['mongo'] = get_mongo_client()
+
+    table = task['table']
+    write_concern = parse_write_concern(options['write_concern'], options['journal'])
+    collection = _worker['mongo'][MONGO_DB][table].with_options(write_concern=write_concern)
+
+    # le processus principal additionne les increments de toutes les taches
+    sent = {'inserted': 0}
+
+    def progress(inserted):
+        _worker['progress'].put((table, inserted - sent['inserted']))
+        sent['inserted'] = inserted
+
+    start_time = time.time()
+    result = stream_table(
+        _worker['sqlite'], collection, table,
+        f"SELECT * FROM {table} WHERE rowid >= ? AND rowid < ?", (task['start'], task['end']),
+        batch_size=options['batch_size'], queue_size=options['queue_size'],
+        writers=options['writers'], progress=progress
+    )
+    result.update({'table': table, 'started': start_time, 'finished': time.time(), 'pid': os.getpid()})
+    return result
+
+def migrate_tables_parallel(sqlite_conn, mongo_db, tables, args):
+    """
+    importe les tables en parallele: tables independantes et plages de rowid des grosses
+    tables reparties sur un pool de args.workers processus
+
+    returns:
+        liste de rapports par table (meme format que migrate_table_to_collection)
+    """
+    tasks, totals = plan_partitions(sqlite_conn, tables, args.partition_size)
+    print(f"\n{len(tasks)} taches sur {args.workers} processus "
+          f"(plages de ~{args.partition_size} lignes)")
+
+    for table in tables:
+        mongo_db[table].drop()
+
+    options = {
+        'batch_size': args.batch_size,
+        'queue_size': args.queue_size,
+        'writers': args.writers,
+        'write_concern': args.write_concern,
+        'journal': args.journal,
+    }
+
+    # spawn: aucun client mongodb herite du processus principal
+    context = multiprocessing.get_context('spawn')
+    progress_queue = context.Queue()
+    inserted = {table: 0 for table in tables}
+
+    def drain():
+        while True:
+            try:
+                table, count = progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            inserted[table] += count
+
+    def show():
+        line = ' | '.join(f"{table} {inserted[table]}/{totals[table]}" for table in tables)
+        print(f"  {line}", end='\r')
+
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context,
+                             initializer=init_worker, initargs=(progress_queue, options)) as pool:
+        pending = {pool.submit(import_partition, task) for task in tasks}
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                # une tache en echec arrete l'import
+                results.append(future.result())
+            drain()
+            show()
+
+    drain()
+    show()
+    print()
+
+    reports = []
+    for table in tables:
+        parts = [r for r in results if r['table'] == table]
+        if parts:
+            elapsed = max(r['finished'] for r in parts) - min(r['started'] for r in parts)
+        else:
+            elapsed = 0.0
+        count = sum(r['inserted'] for r in parts)
+        peaks = [r['peak_rss_mb'] for r in parts if r['peak_rss_mb'] is not None]
+        reports.append({
+            'table': table,
+            'inserted': count,
+            'rows': sum(r['rows'] for r in parts),
+            'checksum': sum(r['checksum'] for r in parts) % FINGERPRINT_MODULUS,
+            'elapsed': elapsed,
+            'rows_per_s': count / elapsed if elapsed else 0.0,
+            'peak_rss_mb': max(peaks) if peaks else None,
+            'processes': len({r['pid'] for r in parts}),
+        })
+    return reports
+
+def print_throughput_report(reports, total_elapsed):
+    """debit et memoire par table puis debit global"""
+    print(f"\n{'table':<15} {'documents':<12} {'duree (s)':<12} {'lignes/s':<12} {'pic rss (mo)':<12}")
+    print("-" * 66)
+    for r in reports:
+        rss = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else '-'
+        print(f"{r['table']:<15} {r['inserted']:<12} {r['elapsed']:<12.2f} {r['rows_per_s']:<12.0f} {rss:<12}")
+
+    total_docs = sum(r['inserted'] for r in reports)
+    rate = total_docs / total_elapsed if total_elapsed else 0.0
+    print("-" * 66)
+    print(f"{'total':<15} {total_docs:<12} {total_elapsed:<12.2f} {rate:<12.0f}")
+
+def movies_complete_stages():
+    """etapes de construction d'un document movies_complete a partir d'un film"""
+    return [
         # lookup genres
         {
             '$lookup': {
@@ -165,15 +474,35 @@ def create_movies_complete(mongo_db):
                 },
                 # stocker les pids pour enrichissement ulterieur
                 'directors_pids': '$directors_data.pid',
-                'writers_pids': '$writers_data.pid'
+                'writers_pids': '$writers_data.pid',
+                # cle de tirage aleatoire (movies/services/sampling.py)
+                'rand': {'$rand': {}}
             }
-        },
-        # ecrire dans movies_complete
-        {'$out': 'movies_complete'}
+        }
+    ]
+
+def create_movies_complete(mongo_db, sqlite_conn, enrich_chunk_size=ENRICH_CHUNK_SIZE):
+    """
+    creer la collection movies_complete avec documents structures
+
+    utilise un pipeline d'agregation pour construire des documents denormalises.
+    la construction se fait dans movies_complete_staging; la collection en service
+    n'est remplacee qu'une fois la nouvelle enrichie, indexee et validee
+
+    returns:
+        True si la nouvelle collection est en service
+    """
+    print("\ncreation de la collection movies_complete...")
+
+    # pipeline d'agregation
+    pipeline = movies_complete_stages() + [
+        # ecrire dans la collection de staging
+        {'$out': MOVIES_COMPLETE_STAGING}
     ]
 
-    # supprimer l'ancienne collection
-    mongo_db.movies_complete.drop()
+    # repartir d'une staging vide (et sans reprise d'un enrichissement precedent)
+    mongo_db[MOVIES_COMPLETE_STAGING].drop()
+    mongo_db.import_progress.delete_one({'_id': ENRICH_PROGRESS_ID})
 
     # executer le pipeline
     print("  execution du pipeline (peut prendre quelques minutes)...")
@@ -181,74 +510,459 @@ def create_movies_complete(mongo_db):
     mongo_db.movies.aggregate(pipeline, allowDiskUse=True)
     elapsed = time.time() - start_time
 
-    count = mongo_db.movies_complete.count_documents({})
+    count = mongo_db[MOVIES_COMPLETE_STAGING].count_documents({})
     print(f"  {count} documents crees en {elapsed:.2f}s")
 
     # enrichir avec les noms des personnes
-    enrich_persons_data(mongo_db)
+    enrich_persons_data(mongo_db, enrich_chunk_size)
+
+    return publish_movies_complete(mongo_db, sqlite_conn)
+
+def validate_staging(mongo_db, sqlite_conn):
+    """verifie la collection de staging avant la bascule"""
+    print("\nvalidation de movies_complete_staging...")
+    ok = verify_migration(sqlite_conn, mongo_db)
+
+    staging = mongo_db[MOVIES_COMPLETE_STAGING]
+    expected = sqlite_conn.execute("SELECT COUNT(*) FROM movies").fetchone()[0]
+    count = staging.count_documents({})
+    pending = staging.count_documents({'directors_pids': {'$exists': True}})
+
+    print(f"  {count} documents (attendu {expected}), {pending} non enrichis")
+    return ok and count == expected and pending == 0
+
+def publish_movies_complete(mongo_db, sqlite_conn):
+    """
+    indexe et valide la staging puis la renomme en movies_complete (dropTarget):
+    le renommage est atomique, les lecteurs passent de l'ancienne a la nouvelle version
+
+    returns:
+        True si la bascule a eu lieu
+    """
+    staging = mongo_db[MOVIES_COMPLETE_STAGING]
+
+    print("\ncreation des index de movies_complete_staging...")
+    for name in ensure_collection_indexes(staging, MONGO_INDEXES[MOVIES_COMPLETE]):
+        print(f"  {name}")
+
+    if not validate_staging(mongo_db, sqlite_conn):
+        print("\nvalidation en echec: movies_complete reste inchangee, "
+              "movies_complete_staging est conservee pour analyse")
+        return False
 
-def enrich_persons_data(mongo_db):
+    mongo_db.client.admin.command(
+        'renameCollection', f"{mongo_db.name}.{MOVIES_COMPLETE_STAGING}",
+        to=f"{mongo_db.name}.{MOVIES_COMPLETE}", dropTarget=True
+    )
+    print("\nmovies_complete_staging renommee en movies_complete")
+    return True
+
+def resolve_names(role):
+    """
+    expression {pid, name} pour chaque pid de <role>_pids present dans persons
+
+    conserve l'ordre des pids du film (l'ordre du $lookup n'est pas garanti)
+    """
+    persons = f'${role}_persons'
+    return {
+        '$map': {
+            'input': {
+                '$filter': {
+                    'input': {'$ifNull': [f'${role}_pids', []]},
+                    'as': 'pid',
+                    'cond': {'$in': ['$$pid', f'{persons}._id']}
+                }
+            },
+            'as': 'pid',
+            'in': {
+                '$let': {
+                    'vars': {
+                        'person': {
+                            '$arrayElemAt': [
+                                {'$filter': {'input': persons, 'as': 'p', 'cond': {'$eq': ['$$p._id', '$$pid']}}},
+                                0
+                            ]
+                        }
+                    },
+                    'in': {'pid': '$$pid', 'name': {'$ifNull': ['$$person.primaryName', None]}}
+                }
+            }
+        }
+    }
+
+def enrich_range_pipeline(id_range, target=MOVIES_COMPLETE):
+    """pipeline d'enrichissement d'une tranche de _id, ecrit en place via $merge"""
+    return [
+        {'$match': {'_id': id_range, 'directors_pids': {'$exists': True}}},
+        # une recherche par index sur persons._id pour tous les pids du film
+        {'$lookup': {'from': 'persons', 'localField': 'directors_pids', 'foreignField': '_id', 'as': 'directors_persons'}},
+        {'$lookup': {'from': 'persons', 'localField': 'writers_pids', 'foreignField': '_id', 'as': 'writers_persons'}},
+        {'$project': {'directors': resolve_names('directors'), 'writers': resolve_names('writers')}},
+        {
+            '$merge': {
+                'into': target,
+                'on': '_id',
+                'whenMatched': [
+                    {'$set': {'directors': '$$new.directors', 'writers': '$$new.writers'}},
+                    {'$unset': ['directors_pids', 'writers_pids']}
+                ],
+                'whenNotMatched': 'discard'
+            }
+        }
+    ]
+
+def enrich_persons_data(mongo_db, chunk_size=ENRICH_CHUNK_SIZE, target=MOVIES_COMPLETE_STAGING):
     """
     enrichir les documents avec les noms des personnes
 
-    remplace les listes de pids par des objets contenant pid et name
+    remplace les listes de pids par des objets contenant pid et name, cote serveur:
+    chaque tranche de _id passe par $lookup sur persons puis $merge dans la collection cible.
+    la derniere tranche terminee est enregistree dans import_progress: une execution
+    interrompue reprend a la tranche suivante
     """
     print("\nenrichissement avec les donnees des personnes...")
 
-    total = mongo_db.movies_complete.count_documents({})
-    processed = 0
+    movies = mongo_db[target]
+    progress = mongo_db.import_progress
+    state = progress.find_one({'_id': ENRICH_PROGRESS_ID}) or {}
+    last_id = state.get('last_id')
+    processed = state.get('processed', 0)
+    if last_id is not None:
+        print(f"  reprise apres _id {last_id} ({processed} documents deja enrichis)")
+
+    remaining = movies.count_documents({'directors_pids': {'$exists': True}})
+    total = processed + remaining
     start_time = time.time()
 
-    # traiter par lots
-    batch_size = 100
-
-    for i in range(0, total, batch_size):
-        movies = mongo_db.movies_complete.find().skip(i).limit(batch_size)
-
-        for movie in movies:
-            # recuperer les directors
-            directors = []
-            for pid in movie.get('directors_pids', []):
-                person = mongo_db.persons.find_one({'_id': pid}, {'primaryName': 1})
-                if person:
-                    directors.append({
-                        'pid': pid,
-                        'name': person.get('primaryName')
-                    })
-
-            # recuperer les writers
-            writers = []
-            for pid in movie.get('writers_pids', []):
-                person = mongo_db.persons.find_one({'_id': pid}, {'primaryName': 1})
-                if person:
-                    writers.append({
-                        'pid': pid,
-                        'name': person.get('primaryName')
-                    })
-
-            # mettre a jour le document
-            mongo_db.movies_complete.update_one(
-                {'_id': movie['_id']},
-                {
-                    '$set': {
-                        'directors': directors,
-                        'writers': writers
-                    },
-                    '$unset': {
-                        'directors_pids': '',
-                        'writers_pids': ''
-                    }
-                }
-            )
+    while True:
+        lower = {'$gt': last_id} if last_id is not None else {'$exists': True}
+
+        # borne haute de la tranche: chunk_size _id plus loin, lus dans l'index
+        boundary = list(
+            movies.find({'_id': lower}, {'_id': 1}).sort('_id', 1).skip(chunk_size - 1).limit(1)
+        )
+        id_range = dict(lower)
+        if boundary:
+            id_range['$lte'] = boundary[0]['_id']
 
-            processed += 1
-            if processed % 100 == 0:
-                progress = (processed / total) * 100
-                print(f"  {processed}/{total} ({progress:.1f}%)", end='\r')
+        count = movies.count_documents({'_id': id_range, 'directors_pids': {'$exists': True}})
+        movies.aggregate(enrich_range_pipeline(id_range, target), allowDiskUse=True)
+        processed += count
+
+        if not boundary:
+            break
+
+        last_id = boundary[0]['_id']
+        progress.update_one(
+            {'_id': ENRICH_PROGRESS_ID},
+            {'$set': {'last_id': last_id, 'processed': processed, 'updated_at': time.time()}},
+            upsert=True
+        )
+        percent = (processed / total) * 100 if total else 100.0
+        print(f"  {processed}/{total} ({percent:.1f}%)", end='\r')
+
+    progress.delete_one({'_id': ENRICH_PROGRESS_ID})
 
     elapsed = time.time() - start_time
     print(f"\n  {processed} documents enrichis en {elapsed:.2f}s")
 
+def row_fingerprint(row):
+    """empreinte courte du contenu d'une ligne"""
+    return hashlib.blake2b(repr(tuple(row)).encode(), digest_size=8).hexdigest()
+
+# somme des empreintes modulo 2^64: independante de l'ordre de lecture (plages de rowid)
+FINGERPRINT_MODULUS = 2 ** 64
+
+def add_fingerprint(checksum, row):
+    """ajoute l'empreinte d'une ligne a une somme d'empreintes"""
+    return (checksum + int(row_fingerprint(row), 16)) % FINGERPRINT_MODULUS
+
+def table_checksum(sqlite_conn, table_name, batch_size=DEFAULT_BATCH_SIZE):
+    """(lignes, somme des empreintes) d'une table sqlite, lue par lots"""
+    cursor = sqlite_conn.execute(f"SELECT * FROM {table_name}")
+    rows = checksum = 0
+    while True:
+        chunk = cursor.fetchmany(batch_size)
+        if not chunk:
+            return rows, checksum
+        rows += len(chunk)
+        for row in chunk:
+            checksum = add_fingerprint(checksum, row)
+
+def record_snapshot(mongo_db, reports):
+    """enregistre l'etat des tables importees (verifie par la premiere synchronisation --delta)"""
+    for r in reports:
+        mongo_db[FINGERPRINTS].replace_one(
+            {'_id': SNAPSHOT_PREFIX + r['table']},
+            {'rows': r['rows'], 'checksum': str(r['checksum']), 'imported_at': time.time()},
+            upsert=True
+        )
+
+def check_snapshot(sqlite_conn, mongo_db, table_name, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    verifie qu'une collection sans empreintes correspond encore a sqlite
+
+    la collection n'est tenue pour a jour que si un import complet a enregistre son etat
+    et que la table sqlite n'a pas change depuis (memes lignes et meme somme d'empreintes)
+
+    raises:
+        RuntimeError: etat inconnu ou table modifiee depuis l'import (import complet requis)
+    """
+    snapshot = mongo_db[FINGERPRINTS].find_one({'_id': SNAPSHOT_PREFIX + table_name})
+    if snapshot is None:
+        raise RuntimeError(
+            f"{table_name}: collection non vide sans empreintes ni etat d'import complet, "
+            f"relancer un import complet (sans --delta)"
+        )
+    rows, checksum = table_checksum(sqlite_conn, table_name, batch_size)
+    if rows != snapshot['rows'] or str(checksum) != snapshot['checksum']:
+        raise RuntimeError(
+            f"{table_name}: table sqlite modifiee depuis l'import complet "
+            f"({snapshot['rows']} -> {rows} lignes), relancer un import complet (sans --delta)"
+        )
+
+def fingerprint_id(table_name, key):
+    """_id d'une empreinte dans sync_fingerprints"""
+    return f"{table_name}:" + '\x1f'.join(str(value) for value in key)
+
+def key_filter(table_name, key):
+    """filtre mongodb d'une ligne a partir de sa cle sqlite"""
+    if table_name in ID_COLUMNS:
+        return {'_id': key[0]}
+    return dict(zip(TABLE_KEYS[table_name], key))
+
+def ensure_delta_indexes(mongo_db):
+    """index necessaires aux upserts par cle et a la recherche des films d'une personne"""
+    mongo_db[FINGERPRINTS].create_index('t')
+    # les cles de TABLE_KEYS et pid de directors/writers sont declarees dans mongo_indexes
+    ensure_indexes(mongo_db)
+
+def fingerprint_range(table_name):
+    """filtre des empreintes d'une table (intervalle de _id: parcours de l'index _id)"""
+    return {'_id': {'$gte': f"{table_name}:", '$lt': f"{table_name};"}}
+
+def stream_fingerprints(fingerprints, table_name, batch_size=DEFAULT_BATCH_SIZE):
+    """empreintes d'une table triees par _id, lues par lots: (_id, cle, empreinte)"""
+    cursor = fingerprints.find(fingerprint_range(table_name), {'k': 1, 'h': 1})
+    for doc in cursor.sort('_id', 1).batch_size(batch_size):
+        yield doc['_id'], tuple(doc['k']), doc['h']
+
+def sync_table(sqlite_conn, mongo_db, table_name, batch_size=DEFAULT_BATCH_SIZE,
+               write_concern=None, dry_run=False):
+    """
+    compare une table sqlite aux empreintes de la derniere synchronisation et
+    applique uniquement les differences (upsert des lignes nouvelles ou modifiees,
+    suppression des lignes disparues) par bulk_write
+
+    les deux cotes sont lus par lots dans l'ordre des cles (ORDER BY sur sqlite, _id des
+    empreintes sur mongodb) et compares par fusion: la memoire ne depend pas de la taille
+    de la table
+
+    returns:
+        dictionnaire (table, inserted, updated, deleted, unchanged, bootstrapped, keys)
+        keys: cles des lignes touchees (pour reconstruire movies_complete), deleted_keys: cles supprimees
+    """
+    key_columns = TABLE_KEYS[table_name]
+    collection = mongo_db[table_name]
+    fingerprints = mongo_db[FINGERPRINTS]
+    if write_concern is not None:
+        collection = collection.with_options(write_concern=write_concern)
+        fingerprints = fingerprints.with_options(write_concern=write_concern)
+
+    # premiere synchronisation apres un import complet: si sqlite n'a pas change depuis,
+    # la collection est a jour et seules les empreintes sont enregistrees
+    bootstrap = (fingerprints.find_one(fingerprint_range(table_name), {'_id': 1}) is None
+                 and collection.estimated_document_count() > 0)
+    if bootstrap:
+        check_snapshot(sqlite_conn, mongo_db, table_name, batch_size)
+
+    report = {'table': table_name, 'inserted': 0, 'updated': 0, 'deleted': 0,
+              'unchanged': 0, 'bootstrapped': bootstrap, 'keys': set(), 'deleted_keys': set()}
+    data_ops = []
+    fingerprint_ops = []
+
+    def flush(force=False):
+        if dry_run or not (force or len(fingerprint_ops) >= batch_size):
+            return
+        # donnees avant empreintes: une interruption fait rejouer le lot, jamais l'oublier
+        if data_ops:
+            collection.bulk_write(data_ops, ordered=False)
+        if fingerprint_ops:
+            fingerprints.bulk_write(fingerprint_ops, ordered=False)
+        data_ops.clear()
+        fingerprint_ops.clear()
+
+    def delete(fingerprint):
+        """empreinte sans ligne sqlite: ligne supprimee"""
+        fingerprint_key, key = fingerprint[0], fingerprint[1]
+        report['deleted'] += 1
+        report['keys'].add(key)
+        report['deleted_keys'].add(key)
+        data_ops.append(DeleteOne(key_filter(table_name, key)))
+        fingerprint_ops.append(DeleteOne({'_id': fingerprint_key}))
+        flush()
+
+    previous = stream_fingerprints(fingerprints, table_name, batch_size)
+    fingerprint = next(previous, None)
+
+    # cles TEXT triees en binaire: meme ordre que les _id 'table:cle1\x1fcle2' des empreintes
+    cursor = sqlite_conn.cursor()
+    cursor.execute(f"SELECT * FROM {table_name} ORDER BY {', '.join(key_columns)}")
+    columns = [description[0] for description in cursor.description]
+    key_positions = [columns.index(column) for column in key_columns]
+    last_id = ''
+
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            key = tuple(row[position] for position in key_positions)
+            row_id = fingerprint_id(table_name, key)
+            if row_id == last_id:
+                raise RuntimeError(f"{table_name}: cle sqlite en double ({key})")
+            if row_id < last_id:
+                raise RuntimeError(f"{table_name}: cles sqlite hors de l'ordre des empreintes ({key})")
+            last_id = row_id
+
+            # empreintes placees avant la ligne: lignes disparues de sqlite
+            while fingerprint is not None and fingerprint[0] < row_id:
+                delete(fingerprint)
+                fingerprint = next(previous, None)
+
+            old = None
+            if fingerprint is not None and fingerprint[0] == row_id:
+                old = fingerprint[2]
+                fingerprint = next(previous, None)
+            digest = row_fingerprint(row)
+            if old == digest:
+                report['unchanged'] += 1
+                continue
+
+            fingerprint_ops.append(ReplaceOne(
+                {'_id': row_id},
+                {'t': table_name, 'k': list(key), 'h': digest},
+                upsert=True
+            ))
+            if bootstrap:
+                continue
+
+            report['inserted' if old is None else 'updated'] += 1
+            report['keys'].add(key)
+            data_ops.append(ReplaceOne(
+                key_filter(table_name, key), row_to_document(table_name, columns, row), upsert=True
+            ))
+        flush()
+
+    # empreintes restantes: cles absentes de sqlite
+    while fingerprint is not None:
+        delete(fingerprint)
+        fingerprint = next(previous, None)
+
+    flush(force=True)
+    if bootstrap and not dry_run:
+        # les empreintes decrivent maintenant la table: l'etat de l'import complet est perime
+        fingerprints.delete_one({'_id': SNAPSHOT_PREFIX + table_name})
+    return report
+
+def affected_movies(mongo_db, reports):
+    """
+    films dont le document movies_complete doit etre reconstruit
+
+    returns:
+        (mids a reconstruire, mids supprimes de movies)
+    """
+    mids = set()
+    deleted = set()
+    pids = set()
+    for report in reports:
+        if report['table'] == 'movies':
+            deleted.update(key[0] for key in report['deleted_keys'])
+        if report['table'] == 'persons':
+            pids.update(key[0] for key in report['keys'])
+        else:
+            # la premiere colonne de cle des autres tables est mid
+            mids.update(key[0] for key in report['keys'])
+
+    # films ou apparait une personne modifiee
+    pids = list(pids)
+    for i in range(0, len(pids), REBUILD_CHUNK_SIZE):
+        chunk = pids[i:i + REBUILD_CHUNK_SIZE]
+        for table_name in ('directors', 'writers'):
+            mids.update(mongo_db[table_name].distinct('mid', {'pid': {'$in': chunk}}))
+
+    return mids - deleted, deleted
+
+def rebuild_movies_complete(mongo_db, mids, deleted):
+    """reconstruit uniquement les documents movies_complete des films touches"""
+    mids = sorted(mids, key=str)
+    for i in range(0, len(mids), REBUILD_CHUNK_SIZE):
+        chunk = mids[i:i + REBUILD_CHUNK_SIZE]
+        pipeline = [{'$match': {'_id': {'$in': chunk}}}] + movies_complete_stages() + [
+            {'$merge': {'into': MOVIES_COMPLETE, 'on': '_id',
+                        'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+        ]
+        mongo_db.movies.aggregate(pipeline, allowDiskUse=True)
+        mongo_db[MOVIES_COMPLETE].aggregate(enrich_range_pipeline({'$in': chunk}), allowDiskUse=True)
+        print(f"  {min(i + REBUILD_CHUNK_SIZE, len(mids))}/{len(mids)} documents reconstruits", end='\r')
+
+    if deleted:
+        mongo_db[MOVIES_COMPLETE].delete_many({'_id': {'$in': list(deleted)}})
+    print(f"\n  {len(mids)} documents reconstruits, {len(deleted)} supprimes")
+
+def delta_sync(sqlite_conn, mongo_db, tables, args, write_concern):
+    """
+    synchronisation incrementale: seules les differences depuis la derniere
+    synchronisation sont ecrites, les collections restent servies pendant l'import
+
+    returns:
+        nombre total de lignes modifiees
+    """
+    if not args.dry_run:
+        ensure_delta_indexes(mongo_db)
+
+    reports = []
+    for table_name in tables:
+        start_time = time.time()
+        report = sync_table(sqlite_conn, mongo_db, table_name, batch_size=args.batch_size,
+                            write_concern=write_concern, dry_run=args.dry_run)
+        report['elapsed'] = time.time() - start_time
+        reports.append(report)
+
+    print(f"\n{'table':<15} {'nouvelles':<12} {'modifiees':<12} {'supprimees':<12} {'inchangees':<12}")
+    print("-" * 66)
+    for r in reports:
+        note = ' (empreintes initiales)' if r['bootstrapped'] else ''
+        print(f"{r['table']:<15} {r['inserted']:<12} {r['updated']:<12} {r['deleted']:<12} {r['unchanged']:<12}{note}")
+
+    changed = sum(r['inserted'] + r['updated'] + r['deleted'] for r in reports)
+    mids, deleted = affected_movies(mongo_db, reports)
+    print(f"\n{changed} lignes modifiees, {len(mids)} documents movies_complete a reconstruire, "
+          f"{len(deleted)} a supprimer")
+
+    # films dont la note ou le titre a change: classement mis a jour film par film
+    ranked = {key[0] for r in reports if r['table'] in ('ratings', 'movies') for key in r['keys']}
+
+    if args.dry_run:
+        print("dry-run: aucune ecriture")
+    else:
+        if mids or deleted:
+            rebuild_movies_complete(mongo_db, mids, deleted)
+        if ranked:
+            count = refresh_leaderboard(mongo_db, ranked, leaderboard_min_votes(args), args.leaderboard_size)
+            print(f"  classement top_rated: {len(ranked)} films reclasses, {count} films")
+        if mids or deleted:
+            # films touches, leurs candidats et les films qui les ont pour voisins
+            count = refresh_similarity(mongo_db, sqlite_conn, mids | deleted)
+            print(f"  films similaires: {count} films recalcules")
+
+    return changed
+
+def leaderboard_min_votes(args):
+    """seuil du classement: --min-votes, sinon celui des parametres de l'application"""
+    return args.min_votes if args.min_votes is not None else configured_min_votes()
+
+
 def verify_migration(sqlite_conn, mongo_db):
     """verifier que les comptages correspondent"""
     print("\nverification de la migration")
@@ -265,7 +979,7 @@ def verify_migration(sqlite_conn, mongo_db):
         cursor.execute(f"SELECT COUNT(*) FROM {table}")
         sqlite_count = cursor.fetchone()[0]
 
-        # compter dans mongodb
+        # compter dans mongodb (exact: jamais estimated_document_count pour la verification)
         mongo_count = mongo_db[table].count_documents({})
 
         # verifier
@@ -280,9 +994,46 @@ def verify_migration(sqlite_conn, mongo_db):
         print("migration reussie - tous les comptages correspondent")
     else:
         print("migration incomplete - verifiez les erreurs")
+    return all_ok
+
+def parse_args():
+    """options de la ligne de commande"""
+    parser = argparse.ArgumentParser(description="import sqlite -> mongodb replica set")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='lignes lues et inserees par lot')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='lots en attente entre la lecture et l\'ecriture')
+    parser.add_argument('--writers', type=int, default=1,
+                        help="threads d'ecriture (insert_many en parallele)")
+    parser.add_argument('--write-concern', default='majority',
+                        help="write concern des insertions: 'majority', 1, 0...")
+    parser.add_argument('--journal', action='store_true',
+                        help='attendre la journalisation des ecritures (j=true)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processus d'import (1: tables importees l'une apres l'autre)")
+    parser.add_argument('--partition-size', type=int, default=DEFAULT_PARTITION_SIZE,
+                        help='lignes par plage de rowid en mode --workers')
+    parser.add_argument('--min-votes', type=int, default=None,
+                        help="nombre minimum de votes du classement top_rated (defaut: "
+                             "MONGODB_SETTINGS['leaderboard_min_votes']; avec --delta, un "
+                             "classement en place garde le seuil de sa construction)")
+    parser.add_argument('--leaderboard-size', type=int, default=DEFAULT_SIZE,
+                        help='nombre de films du classement top_rated')
+    parser.add_argument('--delta', action='store_true',
+                        help='synchronisation incrementale (aucune collection supprimee)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='avec --delta: affiche la taille des changements sans rien ecrire')
+    parser.add_argument('--enrich-chunk-size', type=int, default=ENRICH_CHUNK_SIZE,
+                        help="documents de movies_complete enrichis par aggregation")
+    parser.add_argument('--resume-enrich', action='store_true',
+                        help="reprend l'enrichissement interrompu de movies_complete_staging puis la bascule")
+    return parser.parse_args()
 
 def main():
     """fonction principale"""
+    args = parse_args()
+    write_concern = parse_write_concern(args.write_concern, args.journal)
+
     print("\nimport des donnees sqlite -> mongodb replica set")
     print("="*60)
 
@@ -296,23 +1047,78 @@ def main():
     mongo_db = mongo_client[MONGO_DB]
     print(f"  ok: {REPLICA_SET_NAME}")
 
-    # migrer toutes les tables
     tables = ['movies', 'persons', 'genres', 'ratings', 'directors', 'writers']
 
+    if args.delta:
+        print("\n" + "="*60)
+        print("synchronisation incrementale" + (" (dry-run)" if args.dry_run else ""))
+        print("="*60)
+        try:
+            changed = delta_sync(sqlite_conn, mongo_db, tables, args, write_concern)
+        except RuntimeError as e:
+            print(f"\nerreur: {e}")
+            sqlite_conn.close()
+            mongo_client.close()
+            sys.exit(1)
+        if changed and not args.dry_run:
+            refresh_stats_tables(sqlite_conn)
+            version = bump_dataset_version()
+            print(f"\nversion du jeu de donnees: {version}")
+        sqlite_conn.close()
+        mongo_client.close()
+        return
+
+    if args.resume_enrich:
+        enrich_persons_data(mongo_db, args.enrich_chunk_size)
+        published = publish_movies_complete(mongo_db, sqlite_conn)
+        if published:
+            bump_dataset_version()
+        sqlite_conn.close()
+        mongo_client.close()
+        sys.exit(0 if published else 1)
+
+    # migrer toutes les tables
     total_start = time.time()
-    total_docs = 0
+    reports = []
+
+    # les empreintes d'une synchronisation precedente ne decrivent plus les collections rechargees
+    mongo_db[FINGERPRINTS].drop()
 
     print("\n" + "="*60)
     print("etape 1/2: import des collections plates")
+    print(f"lots de {args.batch_size} lignes, file de {args.queue_size} lots, "
+          f"{args.writers} thread(s) d'ecriture, write concern {write_concern.document or 'par defaut'}")
     print("="*60)
 
-    for table in tables:
-        count = migrate_table_to_collection(sqlite_conn, mongo_db, table)
-        total_docs += count
+    if args.workers > 1:
+        reports = migrate_tables_parallel(sqlite_conn, mongo_db, tables, args)
+    else:
+        for table in tables:
+            reports.append(migrate_table_to_collection(
+                sqlite_conn, mongo_db, table,
+                batch_size=args.batch_size,
+                queue_size=args.queue_size,
+                writers=args.writers,
+                write_concern=write_concern
+            ))
 
+    total_docs = sum(r['inserted'] for r in reports)
     total_elapsed = time.time() - total_start
     print(f"\ntotal: {total_docs} documents migres en {total_elapsed:.2f}s")
 
+    print_throughput_report(reports, total_elapsed)
+    record_snapshot(mongo_db, reports)
+
+    # index des collections plates avant les $lookup de movies_complete
+    print("\ncreation des index mongodb...")
+    for collection, names in ensure_indexes(mongo_db).items():
+        print(f"  {collection}: {', '.join(names)}")
+
+    # classement des films les mieux notes (lu par la page d'accueil)
+    min_votes = leaderboard_min_votes(args)
+    count = build_leaderboard(mongo_db, min_votes, args.leaderboard_size)
+    print(f"\nclassement top_rated: {count} films (au moins {min_votes} votes)")
+
     # verification
     verify_migration(sqlite_conn, mongo_db)
 
@@ -321,7 +1127,10 @@ def main():
     print("etape 2/2: creation de movies_complete")
     print("="*60)
 
-    create_movies_complete(mongo_db)
+    if not create_movies_complete(mongo_db, sqlite_conn, args.enrich_chunk_size):
+        sqlite_conn.close()
+        mongo_client.close()
+        sys.exit(1)
 
     # afficher un exemple
     print("\nexemple de document dans movies_complete:")
@@ -340,6 +1149,18 @@ def main():
         print(json.dumps(display, indent=2, ensure_ascii=False))
     print("-" * 60)
 
+    refresh_stats_tables(sqlite_conn)
+
+    # voisins precalcules de la page detail, recalcules sur les nouvelles collections
+    print("\nindex de similarite (similar_movies)...")
+    report = build_similarity(mongo_db, sqlite_conn)
+    elapsed = report['load_seconds'] + report['compute_seconds'] + report['write_seconds']
+    print(f"  {report['movies']} films en {elapsed:.2f}s")
+
+    # invalide les caches de l'application (resultats et catalogue des collections)
+    version = bump_dataset_version()
+    print(f"\nversion du jeu de donnees: {version}")
+
     print("\nimport termine avec succes!")
 
     # fermer les connexions
@@ -3,12 +3,32 @@ script d'initialisation du replica set mongodb
 execute ce script apres avoir demarre les 3 noeuds
 """
 
+import sys
+from pathlib import Path
+
 from pymongo import MongoClient
-import time
+
+# movies.services.readiness (sans django)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from movies.services.readiness import ReadinessTimeout, members_ready, parse_address, reachable, wait_for
+
+
+HOSTS = ['localhost:27017', 'localhost:27018', 'localhost:27019']
+
+# echeances des attentes (secondes): l'attente s'arrete des que la condition est vraie
+START_TIMEOUT = 30
+ELECTION_TIMEOUT = 60
+
 
 def init_replica_set():
     """initialise le replica set avec 3 membres"""
     try:
+        # chaque noeud doit repondre avant replSetInitiate
+        for host in HOSTS:
+            waited = wait_for(host, reachable(parse_address(host)), START_TIMEOUT, directConnection=True)
+            print(f"{host} joignable ({waited:.1f}s)")
+
         # connexion directe au noeud sans replica set
         client = MongoClient('localhost', 27017,
                            directConnection=True,
@@ -17,9 +37,10 @@ def init_replica_set():
         config = {
             '_id': 'rs0',
             'members': [
-                {'_id': 0, 'host': 'localhost:27017'},
-                {'_id': 1, 'host': 'localhost:27018'},
-                {'_id': 2, 'host': 'localhost:27019'}
+                # etiquettes lues par les tag_sets de MONGODB_SETTINGS['read_routing']
+                {'_id': 0, 'host': 'localhost:27017', 'tags': {'workload': 'web'}},
+                {'_id': 1, 'host': 'localhost:27018', 'tags': {'workload': 'web'}},
+                {'_id': 2, 'host': 'localhost:27019', 'tags': {'workload': 'analytics'}}
             ]
         }
 
@@ -27,8 +48,10 @@ def init_replica_set():
         result = client.admin.command('replSetInitiate', config)
         print(f"resultat: {result}")
 
-        print("\nattente de l'election du primary (10 secondes)...")
-        time.sleep(10)
+        # primary elu et deux secondaires: evenements de topologie, sans pause fixe
+        print("\nattente de l'election du primary et des secondaires...")
+        waited = wait_for(','.join(HOSTS), members_ready(len(HOSTS)), ELECTION_TIMEOUT, replica_set='rs0')
+        print(f"replica set pret en {waited:.1f}s")
 
         status = client.admin.command('replSetGetStatus')
         print("\nstatut du replica set:")
@@ -38,8 +61,10 @@ def init_replica_set():
         client.close()
         print("\nreplica set initialise avec succes")
 
+    except ReadinessTimeout as e:
+        raise SystemExit(f"replica set pas pret: {e}")
     except Exception as e:
-        print(f"erreur lors de l'initialisation: {e}")
+        raise SystemExit(f"erreur lors de l'initialisation: {e}")
 
 if __name__ == '__main__':
     init_replica_set()
@@ -0,0 +1,561 @@
+"""
+benchmark de failover du replica set, vu par les clients
+lance un replica set jetable (processus mongod locaux), envoie une charge continue de
+lectures et d'ecritures a debit regle, arrete et relance des membres selon un scenario,
+et mesure les latences percues par operation (histogrammes, centiles), les erreurs, le
+temps jusqu'a la premiere ecriture reussie apres chaque panne et les ecritures rejouees
+(retryable writes); le rapport json se compare d'une execution a l'autre
+
+usage:
+    python scripts/phase3_replica/benchmark_failover.py [--duration 60] [--readers 8] [--writers 4]
+    python scripts/phase3_replica/benchmark_failover.py --scenario kill-primary@15 restart@35 --json rapport.json
+    python scripts/phase3_replica/benchmark_failover.py --retry-writes off --rate 100
+
+actions du scenario (action@secondes depuis le debut de la mesure):
+    kill-primary    SIGKILL du primary (panne franche)
+    stop-primary    SIGTERM du primary (arret propre: il se retire avant de s'arreter)
+    kill-secondary  SIGKILL d'un secondaire
+    stepdown        replSetStepDown sur le primary (bascule sans arret)
+    restart         relance les membres arretes
+"""
+
+import argparse
+import bisect
+import json
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from pymongo import MongoClient, ReadPreference, monitoring
+from pymongo.errors import ConnectionFailure, PyMongoError
+from pymongo.write_concern import WriteConcern
+
+# movies.services.readiness (sans django)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from movies.services.readiness import (
+    ReadinessTimeout, members_ready, parse_address, primary_address, reachable, wait_for, watch
+)
+
+
+REPLICA_SET = 'rsbench'
+DATABASE = 'failover_bench'
+COLLECTION = 'events'
+
+DEFAULT_SCENARIO = ['kill-primary@15', 'restart@35']
+ACTIONS = ['kill-primary', 'stop-primary', 'kill-secondary', 'stepdown', 'restart']
+
+# bornes superieures des classes de l'histogramme des latences (ms)
+HISTOGRAM_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+
+WRITE_COMMANDS = {'insert', 'update', 'delete', 'findAndModify'}
+
+
+class Member:
+    """un processus mongod du replica set jetable"""
+
+    def __init__(self, index, port, workdir, mongod, replica_set):
+        self.index = index
+        self.port = port
+        self.dbpath = Path(workdir) / f"db-{index}"
+        self.logpath = Path(workdir) / f"mongod-{index}.log"
+        self.mongod = mongod
+        self.replica_set = replica_set
+        self.process = None
+
+    @property
+    def host(self):
+        return f"localhost:{self.port}"
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """lance mongod (les donnees du dbpath sont conservees d'un lancement a l'autre)"""
+        self.dbpath.mkdir(parents=True, exist_ok=True)
+        self.process = subprocess.Popen(
+            [self.mongod, '--replSet', self.replica_set, '--port', str(self.port),
+             '--dbpath', str(self.dbpath), '--bind_ip', 'localhost',
+             '--logpath', str(self.logpath), '--logappend'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT
+        )
+
+    def stop(self, sig=signal.SIGTERM, timeout=30):
+        """arrete le processus (SIGKILL si SIGTERM ne suffit pas)"""
+        if not self.running:
+            return
+        self.process.send_signal(sig)
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class Cluster:
+    """replica set de n membres lances par le benchmark"""
+
+    def __init__(self, args, workdir):
+        self.replica_set = args.replica_set
+        self.election_timeout = args.election_timeout
+        self.members = [
+            Member(i, args.base_port + i, workdir, args.mongod, args.replica_set)
+            for i in range(args.members)
+        ]
+        self.control = None
+        self.watcher = None
+
+    @property
+    def hosts(self):
+        return ','.join(member.host for member in self.members)
+
+    def member(self, address):
+        """membre d'une adresse (host, port)"""
+        return next((m for m in self.members if m.port == address[1]), None)
+
+    def start(self):
+        """lance les membres, initialise le replica set et attend le primary"""
+        for member in self.members:
+            member.start()
+        for member in self.members:
+            try:
+                wait_for(member.host, reachable(parse_address(member.host)), 60, directConnection=True)
+            except ReadinessTimeout:
+                raise SystemExit(f"mongod {member.host} ne repond pas (voir {member.logpath})")
+
+        seed = MongoClient(self.members[0].host, directConnection=True)
+        try:
+            seed.admin.command('replSetInitiate', {
+                '_id': self.replica_set,
+                'members': [{'_id': m.index, 'host': m.host} for m in self.members],
+                'settings': {'electionTimeoutMillis': self.election_timeout},
+            })
+        finally:
+            seed.close()
+
+        # client de controle observe: primary courant sans aller-retour vers le replica set
+        self.control, self.watcher = watch(self.hosts, self.replica_set, serverSelectionTimeoutMS=1000)
+        try:
+            self.watcher.wait(members_ready(len(self.members)), 120)
+        except ReadinessTimeout as e:
+            raise SystemExit(f"replica set pas pret: {e}")
+
+    def primary_address(self):
+        """adresse (host, port) du primary courant (None pendant une election)"""
+        return primary_address(self.watcher.description)
+
+    def primary(self):
+        """membre primary courant (None pendant une election)"""
+        address = self.primary_address()
+        return self.member(address) if address else None
+
+    def apply(self, action):
+        """
+        execute une action du scenario
+
+        returns:
+            adresse du membre vise (ou None)
+        """
+        if action == 'restart':
+            stopped = [m for m in self.members if not m.running]
+            for member in stopped:
+                member.start()
+            return ','.join(m.host for m in stopped) or None
+
+        if action == 'kill-secondary':
+            primary = self.primary()
+            candidates = [m for m in self.members if m.running and m is not primary]
+            if not candidates:
+                return None
+            target = random.choice(candidates)
+            target.stop(signal.SIGKILL)
+            return target.host
+
+        target = self.primary()
+        if target is None:
+            return None
+        if action == 'stepdown':
+            client = MongoClient(target.host, directConnection=True)
+            try:
+                client.admin.command('replSetStepDown', 60)
+            except ConnectionFailure:
+                # le primary ferme les connexions en quittant son role
+                pass
+            finally:
+                client.close()
+        else:
+            target.stop(signal.SIGKILL if action == 'kill-primary' else signal.SIGTERM)
+        return target.host
+
+    def stop(self):
+        """arrete tous les membres"""
+        if self.control is not None:
+            self.control.close()
+        for member in self.members:
+            member.stop()
+
+
+class OperationStats:
+    """latences, erreurs et frise par seconde d'un type d'operation"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = Counter()
+        self.timeline = defaultdict(Counter)
+        self.completions = []
+
+    def record(self, start, end, origin, error=None):
+        """enregistre une operation (start et end en secondes monotones)"""
+        second = int(end - origin)
+        with self.lock:
+            if error is None:
+                self.latencies.append((end - start) * 1000)
+                self.completions.append(end)
+                self.timeline[second]['ok'] += 1
+            else:
+                self.errors[type(error).__name__] += 1
+                self.timeline[second]['error'] += 1
+
+    def first_success_after(self, moment):
+        """duree (ms) entre un instant et la premiere operation reussie qui le suit"""
+        with self.lock:
+            completions = sorted(self.completions)
+        index = bisect.bisect_right(completions, moment)
+        if index == len(completions):
+            return None
+        return round((completions[index] - moment) * 1000, 1)
+
+    def report(self):
+        """resume: nombre, centiles, histogramme, erreurs et frise"""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            errors = dict(self.errors)
+            timeline = {second: dict(counts) for second, counts in sorted(self.timeline.items())}
+
+        histogram = Counter()
+        for ms in latencies:
+            index = bisect.bisect_left(HISTOGRAM_BOUNDS, ms)
+            label = f"<={HISTOGRAM_BOUNDS[index]}" if index < len(HISTOGRAM_BOUNDS) else f">{HISTOGRAM_BOUNDS[-1]}"
+            histogram[label] += 1
+
+        return {
+            'ok': len(latencies),
+            'errors': sum(errors.values()),
+            'error_types': errors,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'p999_ms': percentile(latencies, 99.9),
+            'max_ms': round(latencies[-1], 2) if latencies else None,
+            # classes dans l'ordre des bornes (les classes vides sont omises)
+            'histogram': {label: histogram[label] for label in histogram_labels() if histogram[label]},
+            'timeline': timeline,
+        }
+
+
+def histogram_labels():
+    return [f"<={bound}" for bound in HISTOGRAM_BOUNDS] + [f">{HISTOGRAM_BOUNDS[-1]}"]
+
+
+def percentile(values, p):
+    """percentile p (0-100) d'une liste deja triee"""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return round(values[index], 2)
+
+
+class RetryRecorder(monitoring.CommandListener):
+    """
+    ecritures rejouees par le driver (retryable writes): une commande d'ecriture en echec
+    suivie d'une nouvelle tentative de la meme operation (meme operation_id)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._pending = {}
+        self.counts = Counter()
+
+    def started(self, event):
+        if event.command_name in WRITE_COMMANDS:
+            with self.lock:
+                if event.operation_id in self._pending:
+                    self.counts['retried'] += 1
+
+    def succeeded(self, event):
+        if event.command_name in WRITE_COMMANDS:
+            with self.lock:
+                if self._pending.pop(event.operation_id, None) is not None:
+                    self.counts['recovered'] += 1
+
+    def failed(self, event):
+        if event.command_name in WRITE_COMMANDS:
+            with self.lock:
+                self.counts['command_failures'] += 1
+                self._pending[event.operation_id] = event.failure
+
+
+class PrimaryRecorder(monitoring.TopologyListener):
+    """changements de primary vus par le driver (adresse, instant)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.changes = []
+
+    def opened(self, event):
+        pass
+
+    def closed(self, event):
+        pass
+
+    def description_changed(self, event):
+        primary = primary_address(event.new_description)
+        with self.lock:
+            if not self.changes or self.changes[-1][1] != primary:
+                self.changes.append((time.monotonic(), primary))
+
+    def first_primary_after(self, moment, previous=None):
+        """duree (ms) entre un instant et le premier primary (different de previous) qui le suit"""
+        with self.lock:
+            changes = list(self.changes)
+        for at, primary in changes:
+            if at >= moment and primary is not None and primary != previous:
+                return round((at - moment) * 1000, 1)
+        return None
+
+
+def paced(rate, stop_at):
+    """instants de depart a rate operations/s (0: sans limite) jusqu'a stop_at"""
+    interval = 1.0 / rate if rate else 0.0
+    next_at = time.monotonic()
+    while True:
+        now = time.monotonic()
+        if now >= stop_at:
+            return
+        if next_at > now:
+            time.sleep(min(next_at - now, stop_at - now))
+        # retard d'une panne: pas de rafale de rattrapage au-dela d'une seconde
+        next_at = max(next_at + interval, time.monotonic() - 1.0)
+        yield
+
+
+def reader(collection, ids, rate, stop_at, stats, origin):
+    """lectures de documents par _id"""
+    for _ in paced(rate, stop_at):
+        start = time.monotonic()
+        try:
+            collection.find_one({'_id': random.choice(ids)})
+        except PyMongoError as e:
+            stats.record(start, time.monotonic(), origin, e)
+        else:
+            stats.record(start, time.monotonic(), origin)
+
+
+def writer(collection, rate, stop_at, stats, origin):
+    """insertions et mises a jour (une sur deux)"""
+    sequence = 0
+    for _ in paced(rate, stop_at):
+        sequence += 1
+        start = time.monotonic()
+        try:
+            if sequence % 2:
+                collection.insert_one({'writer': threading.get_ident(), 'seq': sequence, 'at': time.time()})
+            else:
+                collection.update_one({'_id': 0}, {'$inc': {'counter': 1}}, upsert=True)
+        except PyMongoError as e:
+            stats.record(start, time.monotonic(), origin, e)
+        else:
+            stats.record(start, time.monotonic(), origin)
+
+
+def parse_scenario(steps):
+    """['kill-primary@15', ...] -> [(15.0, 'kill-primary'), ...] trie par instant"""
+    scenario = []
+    for step in steps:
+        action, _, at = step.partition('@')
+        if action not in ACTIONS or not at:
+            raise SystemExit(f"etape invalide: {step} (attendu action@secondes, actions: {', '.join(ACTIONS)})")
+        scenario.append((float(at), action))
+    return sorted(scenario)
+
+
+def run(args, cluster):
+    """charge, scenario et mesures"""
+    seed = MongoClient(cluster.hosts, replicaSet=cluster.replica_set)
+    try:
+        collection = seed[args.database][COLLECTION]
+        collection.drop()
+        collection.insert_many([{'_id': i, 'payload': 'x' * 200} for i in range(1, args.docs + 1)])
+    finally:
+        seed.close()
+    ids = list(range(1, args.docs + 1))
+
+    retry_modes = {'on': [True], 'off': [False], 'both': [True, False]}[args.retry_writes]
+    primaries = PrimaryRecorder()
+    clients = {}
+    recorders = {}
+    for retry in retry_modes:
+        name = 'retry_on' if retry else 'retry_off'
+        recorders[name] = RetryRecorder()
+        clients[name] = MongoClient(
+            cluster.hosts, replicaSet=cluster.replica_set,
+            retryWrites=retry, retryReads=True,
+            serverSelectionTimeoutMS=args.selection_timeout,
+            event_listeners=[recorders[name], primaries]
+        )
+
+    stats = {'read': OperationStats()}
+    stats.update({f"write_{name}": OperationStats() for name in clients})
+    read_preference = getattr(ReadPreference, args.read_preference)
+
+    origin = time.monotonic()
+    stop_at = origin + args.duration
+    threads = []
+    first_client = next(iter(clients.values()))
+    reads = first_client[args.database].get_collection(COLLECTION, read_preference=read_preference)
+    for _ in range(args.readers):
+        threads.append(threading.Thread(target=reader, args=(reads, ids, args.rate, stop_at, stats['read'], origin)))
+    w = int(args.write_concern) if args.write_concern.isdigit() else args.write_concern
+    for name, client in clients.items():
+        writes = client[args.database].get_collection(COLLECTION, write_concern=WriteConcern(w=w))
+        for _ in range(args.writers):
+            threads.append(threading.Thread(target=writer, args=(writes, args.rate, stop_at, stats[f"write_{name}"], origin)))
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    events = []
+    for at, action in parse_scenario(args.scenario):
+        delay = origin + at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        previous = cluster.primary_address()
+        moment = time.monotonic()
+        target = cluster.apply(action)
+        print(f"  t={moment - origin:5.1f}s {action} {target or '(aucun membre)'}")
+        events.append({'action': action, 'member': target, 'moment': moment, 'previous_primary': previous})
+
+    for thread in threads:
+        thread.join()
+    for client in clients.values():
+        client.close()
+
+    # mesures par evenement: nouveau primary vu par le driver, premiere ecriture reussie
+    report_events = []
+    for event in events:
+        previous = event['previous_primary'] if event['action'] != 'restart' else None
+        report_events.append({
+            'action': event['action'],
+            'member': event['member'],
+            'at_s': round(event['moment'] - origin, 2),
+            'time_to_primary_ms': primaries.first_primary_after(event['moment'], previous),
+            'time_to_first_write_ms': {
+                name.replace('write_', ''): operation.first_success_after(event['moment'])
+                for name, operation in stats.items() if name.startswith('write_')
+            },
+        })
+
+    return {
+        'operations': {name: operation.report() for name, operation in stats.items()},
+        'retryable_writes': {name: dict(recorder.counts) for name, recorder in recorders.items()},
+        'events': report_events,
+    }
+
+
+def print_summary(report):
+    """tableau des latences et des evenements"""
+    print("\n" + "="*78)
+    print(f"{'operation':<16} {'ok':>8} {'erreurs':>8} {'p50':>8} {'p99':>9} {'p99.9':>9} {'max':>9}")
+    for name, result in report['operations'].items():
+        cells = [result[key] if result[key] is not None else '-' for key in ('p50_ms', 'p99_ms', 'p999_ms', 'max_ms')]
+        print(f"{name:<16} {result['ok']:>8} {result['errors']:>8} {cells[0]:>8} {cells[1]:>9} {cells[2]:>9} {cells[3]:>9}")
+
+    for name, counts in report['retryable_writes'].items():
+        print(f"\n{name}: {counts.get('retried', 0)} ecritures rejouees, "
+              f"{counts.get('recovered', 0)} reussies apres rejeu")
+
+    print("\nevenements (ms)")
+    for event in report['events']:
+        writes = ', '.join(f"{name} {ms}" for name, ms in event['time_to_first_write_ms'].items())
+        print(f"  t={event['at_s']:5.1f}s {event['action']:<15} primary {event['time_to_primary_ms']}  "
+              f"premiere ecriture: {writes}")
+
+
+def main():
+    """fonction principale"""
+    parser = argparse.ArgumentParser(description="latences percues par les clients pendant un failover")
+    parser.add_argument('--mongod', default='mongod', help='executable mongod')
+    parser.add_argument('--members', type=int, default=3)
+    parser.add_argument('--base-port', type=int, default=28017,
+                        help='port du premier membre (distinct du replica set rs0 de l\'application)')
+    parser.add_argument('--replica-set', default=REPLICA_SET)
+    parser.add_argument('--database', default=DATABASE)
+    parser.add_argument('--workdir', help='repertoire des dbpath et journaux (temporaire par defaut)')
+    parser.add_argument('--keep', action='store_true', help='conserve le repertoire de travail')
+    parser.add_argument('--election-timeout', type=int, default=10000, help='electionTimeoutMillis (ms)')
+    parser.add_argument('--docs', type=int, default=10000, help='documents lus par la charge')
+    parser.add_argument('--readers', type=int, default=8, help='threads de lecture')
+    parser.add_argument('--writers', type=int, default=4, help='threads d\'ecriture par client')
+    parser.add_argument('--rate', type=float, default=50, help='operations/s par thread (0: sans limite)')
+    parser.add_argument('--duration', type=float, default=60, help='duree de la mesure (secondes)')
+    parser.add_argument('--scenario', nargs='+', default=DEFAULT_SCENARIO,
+                        help='etapes action@secondes (kill-primary, stop-primary, kill-secondary, stepdown, restart)')
+    parser.add_argument('--read-preference', default='PRIMARY_PREFERRED',
+                        choices=['PRIMARY', 'PRIMARY_PREFERRED', 'SECONDARY', 'SECONDARY_PREFERRED', 'NEAREST'])
+    parser.add_argument('--write-concern', default='majority', help="w des ecritures ('majority' ou 1)")
+    parser.add_argument('--retry-writes', choices=['on', 'off', 'both'], default='both',
+                        help='clients d\'ecriture avec ou sans retryWrites (both: les deux en parallele)')
+    parser.add_argument('--selection-timeout', type=int, default=30000, help='serverSelectionTimeoutMS (ms)')
+    parser.add_argument('--json', help='ecrit le rapport dans ce fichier')
+    args = parser.parse_args()
+
+    if shutil.which(args.mongod) is None and not Path(args.mongod).exists():
+        raise SystemExit(f"executable introuvable: {args.mongod}")
+    scenario = parse_scenario(args.scenario)
+    if scenario and scenario[-1][0] >= args.duration:
+        raise SystemExit("la derniere etape du scenario doit preceder la fin de la mesure")
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix='failover-bench-'))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    print("\nbenchmark de failover")
+    print("="*78)
+    print(f"  {args.members} membres sur les ports {args.base_port}-{args.base_port + args.members - 1}, "
+          f"repertoire {workdir}")
+    print(f"  {args.readers} lecteurs, {args.writers} ecrivains par client, {args.rate or 'max'} op/s par thread, "
+          f"{args.duration:.0f}s")
+
+    cluster = Cluster(args, workdir)
+    try:
+        cluster.start()
+        print(f"  primary initial: {cluster.primary().host}\n")
+        report = run(args, cluster)
+    finally:
+        cluster.stop()
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report['config'] = {
+        key: getattr(args, key) for key in (
+            'members', 'election_timeout', 'readers', 'writers', 'rate', 'duration', 'scenario',
+            'read_preference', 'write_concern', 'retry_writes', 'selection_timeout'
+        )
+    }
+    print_summary(report)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, default=str))
+        print(f"\nrapport ecrit dans {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+benchmark du routage des lectures sur le replica set rs0
+envoie la meme charge de lectures (fiche film, liste, classement) avec plusieurs
+preferences de lecture et compare le debit, les latences et la repartition des
+commandes entre les trois membres
+
+usage:
+    python scripts/phase3_replica/benchmark_read_routing.py [--threads 32] [--duration 20]
+    python scripts/phase3_replica/benchmark_read_routing.py --modes primary secondaryPreferred --json rapport.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from pymongo import MongoClient, monitoring
+
+# movies.services.read_routing (sans django)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from movies.services.read_routing import read_preference
+
+
+HOSTS = 'localhost:27017,localhost:27018,localhost:27019'
+REPLICA_SET = 'rs0'
+DATABASE = 'imdb'
+
+# preferences comparees (memes options que MONGODB_SETTINGS['read_routing'])
+MODES = {
+    'primary': {'mode': 'primary'},
+    'primaryPreferred': {'mode': 'primaryPreferred'},
+    'secondaryPreferred': {'mode': 'secondaryPreferred', 'max_staleness': 120},
+    'secondary': {'mode': 'secondary', 'max_staleness': 120},
+    'nearest': {'mode': 'nearest'},
+}
+DEFAULT_MODES = ['primary', 'secondaryPreferred', 'nearest']
+
+
+class MemberCounter(monitoring.CommandListener):
+    """compte les commandes de lecture servies par chaque membre"""
+
+    READ_COMMANDS = {'find', 'aggregate', 'getMore', 'count'}
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name in self.READ_COMMANDS:
+            host, port = event.connection_id
+            with self.lock:
+                self.counts[f"{host}:{port}"] += 1
+
+    def failed(self, event):
+        pass
+
+
+def sample_ids(db, size):
+    """identifiants de films tires une fois pour les lectures de fiche"""
+    return [doc['_id'] for doc in db.movies_complete.aggregate([
+        {'$sample': {'size': size}}, {'$project': {'_id': 1}}
+    ])]
+
+
+def operations(db, ids):
+    """lectures de la charge (memes requetes que MongoService)"""
+    movies = db.movies_complete
+
+    def detail():
+        movies.find_one({'_id': random.choice(ids)})
+
+    def listing():
+        list(movies.find({}, {'title': 1, 'year': 1, 'rating': 1})
+             .sort('year', -1).skip(random.randrange(0, 2000, 20)).limit(20))
+
+    def top():
+        list(db.top_rated.find({}).sort([('rating', -1), ('numVotes', -1), ('_id', 1)]).limit(10))
+
+    def genre():
+        list(movies.find({'genres': random.choice(['Drama', 'Comedy', 'Action', 'Documentary'])},
+                         {'title': 1, 'year': 1}).limit(20))
+
+    return [detail, listing, top, genre]
+
+
+def worker(ops, stop_at, latencies, errors):
+    """boucle de lectures jusqu'a la fin de la mesure"""
+    while time.monotonic() < stop_at:
+        op = random.choice(ops)
+        start = time.perf_counter()
+        try:
+            op()
+        except Exception:
+            errors.append(op.__name__)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def percentile(values, p):
+    """percentile p (0-100) d'une liste deja triee"""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_mode(name, spec, args, ids):
+    """mesure une preference de lecture"""
+    counter = MemberCounter()
+    client = MongoClient(args.hosts, replicaSet=args.replica_set, event_listeners=[counter])
+    try:
+        db = client.get_database(args.database, read_preference=read_preference(spec))
+        ops = operations(db, ids)
+
+        # chauffe (connexions et caches des membres)
+        worker(ops, time.monotonic() + args.warmup, [], [])
+        counter.counts.clear()
+
+        latencies, errors = [], []
+        stop_at = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(target=worker, args=(ops, stop_at, latencies, errors))
+            for _ in range(args.threads)
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+        members = dict(counter.counts)
+    finally:
+        client.close()
+
+    latencies.sort()
+    total = sum(members.values()) or 1
+    return {
+        'spec': spec,
+        'operations': len(latencies),
+        'errors': len(errors),
+        'ops_per_s': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(latencies, 50) or 0, 2),
+        'p99_ms': round(percentile(latencies, 99) or 0, 2),
+        'members': members,
+        'member_share': {member: round(count / total, 3) for member, count in sorted(members.items())},
+    }
+
+
+def member_roles(args):
+    """etat (PRIMARY/SECONDARY) de chaque membre"""
+    client = MongoClient(args.hosts, replicaSet=args.replica_set, serverSelectionTimeoutMS=5000)
+    try:
+        status = client.admin.command('replSetGetStatus')
+        return {m['name']: m['stateStr'] for m in status['members']}
+    finally:
+        client.close()
+
+
+def main():
+    """fonction principale"""
+    parser = argparse.ArgumentParser(description="debit des lectures selon la preference de lecture")
+    parser.add_argument('--hosts', default=HOSTS, help='membres du replica set')
+    parser.add_argument('--replica-set', default=REPLICA_SET)
+    parser.add_argument('--database', default=DATABASE)
+    parser.add_argument('--modes', nargs='+', default=DEFAULT_MODES, choices=sorted(MODES),
+                        help='preferences comparees')
+    parser.add_argument('--threads', type=int, default=32, help='threads de lecture concurrents')
+    parser.add_argument('--duration', type=int, default=20, help='duree de la mesure par mode (secondes)')
+    parser.add_argument('--warmup', type=int, default=3, help='duree de la chauffe par mode (secondes)')
+    parser.add_argument('--json', help='ecrit le rapport dans ce fichier')
+    args = parser.parse_args()
+
+    print("\nbenchmark du routage des lectures")
+    print("="*60)
+
+    roles = member_roles(args)
+    for member, role in sorted(roles.items()):
+        print(f"  {member}: {role}")
+
+    client = MongoClient(args.hosts, replicaSet=args.replica_set)
+    ids = sample_ids(client[args.database], 2000)
+    client.close()
+    if not ids:
+        raise SystemExit("movies_complete est vide: lancer scripts/import_from_sqlite.py")
+
+    report = {'threads': args.threads, 'duration': args.duration, 'roles': roles, 'modes': {}}
+    for name in args.modes:
+        print(f"\n{name}: {args.threads} threads pendant {args.duration}s...")
+        result = run_mode(name, MODES[name], args, ids)
+        report['modes'][name] = result
+        print(f"  {result['ops_per_s']} lectures/s, {result['errors']} erreurs, "
+              f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms")
+        for member, share in result['member_share'].items():
+            print(f"    {member} ({roles.get(member, '?')}): {share:.0%}")
+
+    baseline = report['modes'].get('primary', {}).get('ops_per_s')
+    print("\n" + "="*60)
+    print(f"{'mode':<20} {'lectures/s':>12} {'membres':>8} {'vs primary':>11}")
+    for name, result in report['modes'].items():
+        ratio = f"{result['ops_per_s'] / baseline:.2f}x" if baseline else '-'
+        print(f"{name:<20} {result['ops_per_s']:>12} {len(result['members']):>8} {ratio:>11}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"rapport ecrit dans {args.json}")
+
+
+if __name__ == '__main__':
+    main()
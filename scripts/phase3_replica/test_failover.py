@@ -1,22 +1,185 @@
 """
 script de tests de tolerance aux pannes du replica set
-teste les 7 scenarios demandes dans le tp
+teste les 7 scenarios demandes dans le tp, plus la panne totale (disjoncteur)
+pendant chaque panne, les lectures de l'application (MongoService) sont chronometrees
+et comparees a des seuils: le script se termine en erreur si une assertion echoue
+
+les pannes sont provoquees par le script, sans intervention (comme Cluster.apply de
+benchmark_failover.py): un membre est arrete par la commande shutdown et relance avec la
+ligne de commande releve au debut (getCmdLineOpts), depuis la racine du projet. les membres
+de rs0 doivent donc tourner sur cette machine
+
+usage: python scripts/phase3_replica/test_failover.py
 """
 
-from pymongo import MongoClient
-from pymongo.errors import AutoReconnect, ServerSelectionTimeoutError
+from pymongo import MongoClient, ReadPreference
+from pymongo.errors import ConnectionFailure
+import os
+import random
+import subprocess
+import sys
 import time
 from datetime import datetime
+from pathlib import Path
+
+# movies.services.readiness (sans django) et MongoService (django, charge par get_service)
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from movies.services.circuit_breaker import is_degraded
+from movies.services.readiness import (
+    ReadinessTimeout, caught_up, format_address, has_primary, members_ready, new_primary,
+    primary_address, primary_lost, watch
+)
+
+HOSTS = 'localhost:27017,localhost:27018,localhost:27019'
+
+# echeances des attentes d'etat (secondes): l'attente s'arrete des que l'etat est atteint
+REPLICATION_TIMEOUT = 30
+ELECTION_TIMEOUT = 60
+RESYNC_TIMEOUT = 120
+
+# seuils des assertions de latence (ms, 95e centile par appel de service)
+READ_LATENCY_MS = 500           # lectures routees vers les membres restants
+SHORT_CIRCUIT_LATENCY_MS = 50   # appels servis par le disjoncteur ouvert
+
+# film lu par l'appel de fiche
+MOVIE_ID = 'tt0111161'
+
+# appels de service chronometres (lectures de la page d'accueil, des listes et de la fiche)
+SERVICE_CALLS = [
+    ('liste', lambda service: service.get_movies(limit=20)),
+    ('recherche', lambda service: service.search_movies('star', 10)),
+    ('statistiques', lambda service: service.get_statistics()),
+    ('fiche', lambda service: service.get_movie_by_id(MOVIE_ID)),
+]
+
+FAILURES = []
 
 def get_client(port=None):
     """connexion au replica set ou a un noeud specifique"""
     if port:
         return MongoClient(f'localhost:{port}', serverSelectionTimeoutMS=5000)
     else:
-        return MongoClient('localhost:27017,localhost:27018,localhost:27019',
+        return MongoClient(HOSTS,
                          replicaSet='rs0',
                          serverSelectionTimeoutMS=5000)
 
+class ReplicaSet:
+    """membres de rs0 arretes et relances par le script"""
+
+    def __init__(self, hosts=HOSTS):
+        self.hosts = hosts.split(',')
+        self.argv = {}
+        self.stopped = []
+
+    def record(self):
+        """releve la ligne de commande de chaque membre (tous doivent etre joignables)"""
+        for host in self.hosts:
+            client = MongoClient(host, directConnection=True, serverSelectionTimeoutMS=5000)
+            try:
+                self.argv[host] = client.admin.command('getCmdLineOpts')['argv']
+            finally:
+                client.close()
+
+    def primary(self):
+        """adresse 'host:port' du primary courant (None pendant une election)"""
+        client = get_client()
+        try:
+            return client.admin.command('hello', read_preference=ReadPreference.SECONDARY_PREFERRED).get('primary')
+        finally:
+            client.close()
+
+    def stop(self, host):
+        """arrete un membre (shutdown force: pas d'attente des secondaires)"""
+        client = MongoClient(host, directConnection=True, serverSelectionTimeoutMS=5000)
+        try:
+            client.admin.command('shutdown', force=True)
+        except ConnectionFailure:
+            # le membre ferme la connexion en s'arretant
+            pass
+        finally:
+            client.close()
+        self.stopped.append(host)
+        print(f"  membre arrete: {host}")
+
+    def apply(self, action):
+        """
+        execute une action: stop-primary, stop-secondary, stop-all ou restart
+
+        returns:
+            adresses des membres vises
+        """
+        running = [host for host in self.hosts if host not in self.stopped]
+        if action == 'restart':
+            started = self.stopped
+            for host in started:
+                # nouvelle session: le membre survit a la fin du script
+                subprocess.Popen(self.argv[host], cwd=ROOT, stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.STDOUT, start_new_session=True)
+                print(f"  membre relance: {host}")
+            self.stopped = []
+            return started
+
+        if action == 'stop-all':
+            targets = running
+        else:
+            primary = self.primary()
+            if action == 'stop-primary':
+                targets = [primary] if primary in running else []
+            else:
+                secondaries = [host for host in running if host != primary]
+                targets = [random.choice(secondaries)] if secondaries else []
+        for host in targets:
+            self.stop(host)
+        return targets
+
+def get_service():
+    """MongoService de l'application et son disjoncteur (django charge au premier appel)"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from movies.services.mongo_service import MongoService, get_breaker
+    return MongoService, get_breaker()
+
+def check(condition, message):
+    """enregistre une assertion (le script echoue a la fin si l'une est fausse)"""
+    print(f"  [{'ok' if condition else 'ECHEC'}] {message}")
+    if not condition:
+        FAILURES.append(message)
+
+def percentile(values, q):
+    """centile q (0-1) d'une liste de latences"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def measure_service_calls(rounds=10):
+    """
+    chronometre les appels de service
+
+    returns:
+        dictionnaire {appel: (95e centile en ms, dernier resultat)}
+    """
+    service, _ = get_service()
+    results = {}
+    for name, call in SERVICE_CALLS:
+        latencies = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            value = call(service)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[name] = (percentile(latencies, 0.95), value)
+    return results
+
+def assert_reads_served(label):
+    """les lectures passent par les membres restants, sans ouvrir le disjoncteur"""
+    print(f"\nlectures de l'application ({label}):")
+    _, breaker = get_service()
+    for name, (p95, value) in measure_service_calls().items():
+        check(p95 <= READ_LATENCY_MS, f"{name}: p95 {p95:.1f} ms <= {READ_LATENCY_MS} ms")
+        check(not (isinstance(value, dict) and 'error' in value), f"{name}: resultat sans erreur")
+    check(breaker.state == 'closed', f"disjoncteur ferme (etat: {breaker.state})")
+
 def print_section(title):
     """affiche un titre de section"""
     print("\n" + "="*70)
@@ -76,7 +239,7 @@ def test_2_write_and_replication():
     print_section("TEST 2: ECRITURE ET REPLICATION")
 
     try:
-        client = get_client()
+        client, watcher = watch(HOSTS, 'rs0', serverSelectionTimeoutMS=5000)
         db = client['imdb']
         test_coll = db['test_replication']
 
@@ -90,12 +253,16 @@ def test_2_write_and_replication():
         ]
 
         print("\ninsertion de 10 documents de test...")
-        result = test_coll.insert_many(docs)
+        with client.start_session() as session:
+            result = test_coll.insert_many(docs, session=session)
+            optime = session.operation_time
         print(f"  {len(result.inserted_ids)} documents inseres")
 
-        # attente de la replication
-        print("\nattente de la replication (3 secondes)...")
-        time.sleep(3)
+        # attente de la replication: optime de l'insertion applique par chaque secondaire
+        print("\nattente de la replication...")
+        start = time.time()
+        watcher.wait(caught_up(optime), REPLICATION_TIMEOUT)
+        print(f"  secondaires a jour en {time.time() - start:.2f}s")
 
         # verification sur chaque noeud
         print("\nverification de la replication sur chaque noeud:")
@@ -116,52 +283,56 @@ def test_2_write_and_replication():
     except Exception as e:
         print(f"erreur: {e}")
 
-def test_3_primary_failure():
+def test_3_primary_failure(members):
     """test 3: panne du primary"""
     print_section("TEST 3: PANNE DU PRIMARY")
 
-    print("\nce test necessite que vous arrietiez manuellement le primary")
-    print("1. identifiez le primary avec le test 1")
-    print("2. arretez le processus mongod du primary (ctrl+c)")
-    print("3. appuyez sur entree pour continuer le test")
+    client, watcher = watch(HOSTS, 'rs0')
+    try:
+        previous = primary_address(watcher.wait(has_primary(), ELECTION_TIMEOUT))
+        print(f"\narret du primary ({format_address(previous)})")
+        members.stop(format_address(previous))
+
+        # l'election est chronometree depuis la perte du primary vue par le driver
+        watcher.wait(primary_lost(previous), ELECTION_TIMEOUT)
+        elapsed = measure_failover_time(watcher, previous)
+    except ReadinessTimeout as e:
+        print(f"\nerreur: {e}")
+        return None
+    finally:
+        client.close()
 
-    input("\nappuyez sur entree quand le primary est arrete...")
+    assert_reads_served("primary arrete")
+    return elapsed
 
-    return measure_failover_time()
+def measure_failover_time(watcher=None, previous=None):
+    """
+    mesure le temps d'election d'un nouveau primary (evenements de topologie)
 
-def measure_failover_time():
-    """mesure le temps d'election d'un nouveau primary"""
+    args:
+        watcher: observateur d'un client deja ouvert (sinon un client est ouvert pour la mesure)
+        previous: adresse (host, port) de l'ancien primary
+    """
     print("\nmesure du temps d'election...")
 
-    start_time = time.time()
-    max_wait = 60
-    elected = False
-
-    while (time.time() - start_time) < max_wait:
-        try:
-            client = get_client()
-            status = client.admin.command('replSetGetStatus')
-
-            # cherche un nouveau primary
-            for member in status['members']:
-                if member['stateStr'] == 'PRIMARY':
-                    elapsed = time.time() - start_time
-                    print(f"\nnouveau primary elu: {member['name']}")
-                    print(f"temps d'election: {elapsed:.2f} secondes")
-                    elected = True
-                    client.close()
-                    return elapsed
+    client = None
+    if watcher is None:
+        client, watcher = watch(HOSTS, 'rs0')
 
+    start_time = time.time()
+    try:
+        description = watcher.wait(new_primary(previous), ELECTION_TIMEOUT)
+    except ReadinessTimeout:
+        print(f"\npas de nouveau primary apres {ELECTION_TIMEOUT} secondes")
+        return None
+    finally:
+        if client is not None:
             client.close()
 
-        except Exception as e:
-            pass
-
-        time.sleep(0.5)
-
-    if not elected:
-        print(f"\npas de nouveau primary apres {max_wait} secondes")
-        return None
+    elapsed = time.time() - start_time
+    print(f"\nnouveau primary elu: {format_address(primary_address(description))}")
+    print(f"temps d'election: {elapsed:.2f} secondes")
+    return elapsed
 
 def test_4_new_primary():
     """test 4: verification du nouveau primary"""
@@ -209,18 +380,23 @@ def test_5_read_operations():
     except Exception as e:
         print(f"erreur: {e}")
 
-def test_6_reconnection():
+def test_6_reconnection(members):
     """test 6: reconnexion du noeud arrete"""
     print_section("TEST 6: RECONNEXION")
 
-    print("\nce test necessite de relancer le noeud arrete")
-    print("1. relancez le processus mongod du noeud arrete")
-    print("2. appuyez sur entree pour continuer")
+    print("\nrelance du noeud arrete")
+    members.apply('restart')
 
-    input("\nappuyez sur entree quand le noeud est relance...")
-
-    print("\nattente de la resynchronisation (10 secondes)...")
-    time.sleep(10)
+    print("\nattente de la resynchronisation...")
+    client, watcher = watch(HOSTS, 'rs0')
+    try:
+        start = time.time()
+        watcher.wait(members_ready(3), RESYNC_TIMEOUT)
+        print(f"  3 membres prets en {time.time() - start:.1f}s")
+    except ReadinessTimeout as e:
+        print(f"  {e}")
+    finally:
+        client.close()
 
     try:
         client = get_client()
@@ -237,22 +413,30 @@ def test_6_reconnection():
     except Exception as e:
         print(f"erreur: {e}")
 
-def test_7_double_failure():
+def test_7_double_failure(members):
     """test 7: panne de 2 noeuds"""
     print_section("TEST 7: DOUBLE PANNE")
 
-    print("\nce test necessite d'arreter 2 noeuds sur 3")
-    print("1. identifiez 2 noeuds a arreter")
-    print("2. arretez les 2 processus mongod")
-    print("3. appuyez sur entree pour continuer")
-
-    input("\nappuyez sur entree quand 2 noeuds sont arretes...")
+    client, watcher = watch(HOSTS, 'rs0')
+    try:
+        previous = primary_address(watcher.wait(has_primary(), ELECTION_TIMEOUT))
+        print("\narret de 2 noeuds sur 3 (les secondaires)")
+        members.apply('stop-secondary')
+        members.apply('stop-secondary')
+
+        # le primary restant, sans majorite, redevient secondaire
+        watcher.wait(primary_lost(previous), ELECTION_TIMEOUT)
+    except ReadinessTimeout as e:
+        print(f"  {e}")
+    finally:
+        client.close()
 
     print("\ntest de connexion au replica set...")
 
+    client = get_client()
     try:
-        client = get_client()
-        status = client.admin.command('replSetGetStatus')
+        # plus de primary: le statut est lu sur le secondaire restant
+        status = client.admin.command('replSetGetStatus', read_preference=ReadPreference.SECONDARY_PREFERRED)
 
         active_nodes = sum(1 for m in status['members'] if m.get('health', 0) == 1)
         print(f"\nnoeuds actifs: {active_nodes}/3")
@@ -263,36 +447,86 @@ def test_7_double_failure():
             print("  - ecritures impossibles")
             print("  - lectures possibles sur les secondaires avec readPreference")
 
-        client.close()
-
     except Exception as e:
         print(f"\nerreur de connexion: {e}")
         print("\nresultat: le replica set est indisponible")
         print("  - pas de majorite (besoin de 2/3 noeuds)")
         print("  - pas de primary elu")
-        print("  - ecritures et lectures impossibles en mode normal")
+    finally:
+        client.close()
+
+    # lectures routees vers le secondaire restant (preferences secondaryPreferred/primaryPreferred)
+    assert_reads_served("deux noeuds arretes")
+
+def test_8_total_failure(members):
+    """test 8: panne totale, lectures servies par le disjoncteur"""
+    print_section("TEST 8: PANNE TOTALE (DISJONCTEUR)")
+
+    print("\narret du dernier noeud")
+    members.apply('stop-all')
+
+    service, breaker = get_service()
+
+    # les premiers appels attendent serverSelectionTimeoutMS puis ouvrent le circuit
+    print(f"\nouverture du disjoncteur ({breaker.failure_threshold} echecs consecutifs)...")
+    start = time.time()
+    for _ in range(breaker.failure_threshold):
+        service.get_movies(limit=20)
+    print(f"  {time.time() - start:.1f}s avant ouverture")
+    check(breaker.state != 'closed', f"disjoncteur ouvert (etat: {breaker.state})")
+
+    print("\nlectures de l'application (circuit ouvert):")
+    for name, (p95, value) in measure_service_calls().items():
+        check(p95 <= SHORT_CIRCUIT_LATENCY_MS, f"{name}: p95 {p95:.1f} ms <= {SHORT_CIRCUIT_LATENCY_MS} ms")
+    # derniere valeur connue (tests precedents) ou chemin degrade sqlite: les deux sont des replis
+    fallbacks = breaker.snapshot()['counters'].get('fallbacks', 0)
+    service.get_statistics()
+    check(is_degraded(), "statistiques servies par le disjoncteur (indicateur degrade)")
+    check(breaker.snapshot()['counters'].get('fallbacks', 0) > fallbacks, "repli compte par le disjoncteur")
+
+    print("\nrelance des 3 noeuds")
+    members.apply('restart')
+
+    # la sonde part sur l'evenement de topologie (ou apres reset_timeout)
+    start = time.time()
+    service.wait_until_ready(RESYNC_TIMEOUT)
+    closed = breaker.wait_closed(breaker.reset_timeout + 30)
+    check(closed, f"disjoncteur referme par la sonde en {time.time() - start:.1f}s (etat: {breaker.state})")
+
+    snapshot = service.get_breaker_stats()
+    print(f"\ntransitions: {snapshot['transitions']}")
+    print(f"compteurs: {snapshot['counters']}")
 
 def run_all_tests():
-    """execute tous les tests de maniere interactive"""
+    """execute tous les tests, pannes provoquees par le script"""
     print("="*70)
     print(" TESTS DE TOLERANCE AUX PANNES - REPLICA SET MONGODB")
     print("="*70)
 
-    print("\nce script va executer 7 tests de maniere interactive")
-    print("certains tests necessitent des actions manuelles")
+    print("\nce script va executer 8 tests, en arretant et relancant lui-meme les membres de rs0")
 
-    input("\nappuyez sur entree pour commencer...")
-
-    # tests automatiques
     primary, secondaries = test_1_initial_state()
+
+    members = ReplicaSet()
+    try:
+        members.record()
+    except Exception as e:
+        print(f"\nerreur: ligne de commande des membres illisible ({e})")
+        sys.exit(1)
+
     test_2_write_and_replication()
 
-    # tests manuels
-    failover_time = test_3_primary_failure()
-    test_4_new_primary()
-    test_5_read_operations()
-    test_6_reconnection()
-    test_7_double_failure()
+    try:
+        failover_time = test_3_primary_failure(members)
+        test_4_new_primary()
+        test_5_read_operations()
+        test_6_reconnection(members)
+        test_7_double_failure(members)
+        test_8_total_failure(members)
+    finally:
+        # un test interrompu ne laisse pas de membre arrete
+        if members.stopped:
+            members.apply('restart')
 
     # resume
     print_section("RESUME DES TESTS")
@@ -304,6 +538,13 @@ def run_all_tests():
     print("  5. operations de lecture: ok")
     print("  6. reconnexion: ok")
     print("  7. double panne: ok")
+    print("  8. panne totale: ok" if not FAILURES else "  8. panne totale: voir les assertions")
+
+    if FAILURES:
+        print(f"\n{len(FAILURES)} assertions en echec:")
+        for message in FAILURES:
+            print(f"  - {message}")
+        sys.exit(1)
 
     print("\ntous les tests sont termines")
 